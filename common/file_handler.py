@@ -1,13 +1,191 @@
+#-*- coding: utf-8 -*-
+"""
+numeric text files (csv, mathematica exports).
+
+the numbers may be separated by commas, semicolons, whitespace
+and braces, so a mathematica table {{1.,2.5*^-3},{2.,1.1*^-2}}
+is read the same way as a csv file. the mathematica exponent
+notation a*^b is read as aeb.
+
+    data = load_data_file('measurement.csv', dimension=2, skip_header=1)
+
+empty fields (1,,2 or a trailing comma 1,2,) raise a ValueError
+since they cannot be told apart once the separators collapse.
+a comma next to a brace separates lists and is fine.
+
+the file is parsed in chunks into a float32 array. the result
+is stored in a .npy sidecar next to the file (see sidecar_path)
+which is keyed by the size and mtime of the file. later loads
+only open the sidecar as memory map.
+
+:author: Nicolas 'keksnicoh' Heimann
+"""
+import numpy as np
+import os
 import re
 
-def import_data_file(file_path, seperator=','):
-    pattern = re.compile('[^0-9.*-^+^/]+')
-    with open(file_path, 'r') as data_file:
-        data = data_file.read().replace("^", "**").split(seperator)
-        data_set = range(len(data))
-        for i, data_point in enumerate(data):
-            data_set[i] = eval(pattern.sub('', data_point))
-        return data_set
-    return None
+CHUNK_SIZE = 2**22
+
+# bytes which separate numbers. they are replaced by spaces.
+_SEPARATORS = b',;{}[]()\t\r\n\x0b\x0c'
+_TRANSLATION = bytes(bytearray(
+    ord(' ') if i in bytearray(_SEPARATORS) else i for i in range(256)))
+_SIDECAR = re.compile(r'^\.\d+-\d+(-h\d+)?\.npy$')
+
+# byte classes of the empty field check
+_NUMBER, _FIELD, _LINE, _OPEN, _CLOSE, _BLANK = range(6)
+_CLASSES = np.zeros(256, dtype=np.int8)
+_CLASSES[bytearray(b',;')] = _FIELD
+_CLASSES[bytearray(b'\r\n')] = _LINE
+_CLASSES[bytearray(b'{[(')] = _OPEN
+_CLASSES[bytearray(b'}])')] = _CLOSE
+_CLASSES[bytearray(b' \t\x0b\x0c')] = _BLANK
+
+class _EmptyFields(object):
+    """
+    finds empty fields in the raw chunks of a file. the last
+    two byte classes are carried over so fields which span
+    two chunks are found as well.
+    """
+    def __init__(self):
+        self._carry = np.array([_LINE, _LINE], dtype=np.int8)
+
+    def __call__(self, raw, at_end=False):
+        classes = _CLASSES[np.frombuffer(raw, dtype=np.uint8)]
+        classes = np.concatenate((self._carry, classes[classes != _BLANK]))
+        if at_end:
+            classes = np.append(classes, np.int8(_LINE))
+        self._carry = classes[-2:]
+
+        before, field, after = classes[:-2], classes[1:-1] == _FIELD, classes[2:]
+        empty_before = (before == _FIELD) | (before == _LINE) | (before == _OPEN)
+        empty_after = ((after == _LINE) | (after == _CLOSE)) & (before != _CLOSE)
+        return bool(np.any(field & (empty_before | empty_after)))
+
+def _numbers(chunk, file_path=None):
+    """
+    numbers of a chunk whose separators are already replaced
+    """
+    try:
+        return np.array(chunk.replace(b'*^', b'e').split(), dtype=np.float64)
+    except ValueError:
+        for token in chunk.split():
+            try:
+                float(token.replace(b'*^', b'e'))
+            except ValueError:
+                raise ValueError('file {} contains the non numeric value "{}". use skip_header to skip header lines.'.format(
+                    file_path, token.decode('latin-1')))
+        raise
+
+def _check_fields(empty_fields, raw, file_path, at_end=False):
+    if empty_fields(raw, at_end):
+        raise ValueError('file {} contains empty fields'.format(file_path))
 
+def parse_data_file(file_path, chunk_size=CHUNK_SIZE, skip_header=0):
+    """
+    parses all numbers of a file into a flat float32 array.
+    the first skip_header lines are skipped. the array is
+    preallocated by the number density of the first chunk
+    and grows if the estimate was too small.
+    """
+    size = os.path.getsize(file_path)
+    data = np.empty(0, dtype=np.float32)
+    length = 0
+    rest = b''
+    empty_fields = _EmptyFields()
+
+    with open(file_path, 'rb') as data_file:
+        for i in range(skip_header):
+            data_file.readline()
+
+        while True:
+            raw = data_file.read(chunk_size)
+            _check_fields(empty_fields, raw, file_path, at_end=not raw)
+            chunk = raw.translate(_TRANSLATION)
+            if not chunk and not rest:
+                break
+
+            # a number may continue in the next chunk. at the
+            # end of the file the rest is the last number.
+            at_end = len(chunk) == 0
+            chunk = rest + chunk
+            cut = len(chunk) if at_end else chunk.rfind(b' ')
+            chunk, rest = chunk[:cut+1], chunk[cut+1:]
+
+            numbers = _numbers(chunk, file_path)
+            if length + len(numbers) > len(data):
+                if not len(data):
+                    estimate = int(1.1*len(numbers)*size/len(chunk)) + 1
+                else:
+                    estimate = 2*len(data)
+                data = np.resize(data, max(estimate, length + len(numbers)))
+
+            data[length:length+len(numbers)] = numbers
+            length += len(numbers)
+
+    return data[:length].copy() if length < len(data) else data
+
+def sidecar_path(file_path, skip_header=0):
+    """
+    path of the .npy sidecar of the current
+    version (size and mtime) of a file
+    """
+    stat = os.stat(file_path)
+    header = '-h{}'.format(skip_header) if skip_header else ''
+    return '{}.{}-{}{}.npy'.format(file_path, stat.st_size, int(stat.st_mtime*1e6), header)
+
+def _write_sidecar(file_path, path, data):
+    """
+    replaces outdated sidecars. the cache is skipped if
+    the directory is not writable.
+    """
+    temporary = path + '.tmp'
+    try:
+        with open(temporary, 'wb') as sidecar:
+            np.save(sidecar, data)
+        os.rename(temporary, path)
+    except (IOError, OSError):
+        return
+
+    directory, name = os.path.split(os.path.abspath(file_path))
+    for other in os.listdir(directory):
+        outdated = os.path.join(directory, other)
+        if other.startswith(name) and _SIDECAR.match(other[len(name):]) \
+           and outdated != os.path.abspath(path):
+            try:
+                os.remove(outdated)
+            except OSError:
+                pass
+
+def load_data_file(file_path, dimension=1, cache=True, skip_header=0):
+    """
+    returns the numbers of a file as (n, dimension) float32
+    array. with cache=True the array is a read only memory
+    map of the sidecar.
+    """
+    path = sidecar_path(file_path, skip_header)
+    if cache and os.path.exists(path):
+        data = np.load(path, mmap_mode='r')
+    else:
+        data = parse_data_file(file_path, skip_header=skip_header)
+        if cache:
+            _write_sidecar(file_path, path, data)
+
+    if len(data) % dimension:
+        raise ValueError('file {} contains {} numbers which cannot be split into rows of dimension {}'.format(
+            file_path, len(data), dimension))
+    return data.reshape((len(data)//dimension, dimension))
+
+def import_data_file(file_path, seperator=','):
+    """
+    flat float32 array of all numbers in a file. the
+    numbers may be separated by seperator in addition
+    to the separators of parse_data_file.
+    """
+    if seperator.encode('latin-1') in _SEPARATORS + b' ':
+        return parse_data_file(file_path)
 
+    with open(file_path, 'rb') as data_file:
+        content = data_file.read().replace(seperator.encode('latin-1'), b',')
+    _check_fields(_EmptyFields(), content, file_path, at_end=True)
+    return _numbers(content.translate(_TRANSLATION), file_path).astype(np.float32)
@@ -4,19 +4,139 @@
 from .controller import Controller
 from .util import CommandQueue, signal
 from .camera import Camera2d
+from .buffer import UPLOAD_COUNTER, ALLOCATION_COUNTER
 
 from OpenGL.GL import *
 from gllib.glfw import *
 from termcolor import colored
+from time import sleep, time
+from collections import OrderedDict
+import numpy as np
 import logging
 import sys
 
+class FrameCounter():
+    """
+    counts the rendered and the skipped window frames.
+    in idle mode a frame is skipped if the scene of the
+    window has not changed.
+    """
+    def __init__(self):
+        self.rendered = 0
+        self.skipped = 0
+
+    def count(self, rendered):
+        if rendered:
+            self.rendered += 1
+        else:
+            self.skipped += 1
+
+    @property
+    def skip_ratio(self):
+        total = self.rendered + self.skipped
+        return float(self.skipped)/total if total else 0.0
+
+FRAME_COUNTER = FrameCounter()
+
+class FrameHistogram():
+    """
+    histogram of the frame times of a window. the bins are
+    spaced logarithmically from 0.1ms to 1s, the first and
+    the last bin count the frames outside of this range.
+
+    ..code:
+        times = window.frame_times
+        print(times.mean, times.percentile(95), times.max)
+    """
+    EDGES = np.logspace(-4, 0, 41)
+
+    def __init__(self):
+        self.counts = np.zeros(len(self.EDGES)+1, dtype=np.int64)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[np.searchsorted(self.EDGES, seconds, side='right')] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    @property
+    def mean(self):
+        return self.total/self.count if self.count else 0.0
+
+    def percentile(self, q):
+        """
+        upper bin edge (seconds) below which q percent of
+        the frame times are
+        """
+        if not self.count:
+            return 0.0
+        index = np.searchsorted(np.cumsum(self.counts), q/100.0*self.count)
+        return min(self.EDGES[index], self.max) if index < len(self.EDGES) else self.max
+
+    def reset(self):
+        self.__init__()
+
+class FrameScheduler():
+    """
+    decides which windows are cycled. a window with a target
+    fps (GlWindow.fps) is cycled once its frame interval has
+    passed since it was rendered the last time, others are
+    cycled in every loop. a heavy window therefore does not
+    force the other windows to its frame rate.
+
+    after a window was cycled its deferred work (GlWindow.defer)
+    is done as long as the frame budget of the window allows.
+    """
+    def due(self, window, now):
+        return window.fps is None or now >= window.next_frame_time
+
+    def timeout(self, windows, now, timeout):
+        """
+        seconds until the next window which is waiting
+        for its frame interval is due, at most timeout
+        """
+        for window in windows:
+            if window.has_deferred_work() and self.due(window, now):
+                return 0
+            if window.fps is not None and window.next_frame_time > now:
+                timeout = min(timeout, window.next_frame_time - now)
+        return timeout
+
+    def cycle(self, window, idle=False):
+        """
+        cycles the window and does its deferred work.
+        returns whether the window has rendered.
+        """
+        start = time()
+        window.frame_start = start
+        rendered = window.cycle(idle=idle)
+        if rendered:
+            window.frame_times.add(time() - start)
+            if window.fps is not None:
+                # keep the pace unless the window fell behind
+                window.next_frame_time += 1.0/window.fps
+                if window.next_frame_time < start:
+                    window.next_frame_time = start + 1.0/window.fps
+        window.run_deferred()
+        window.frame_start = None
+        return rendered
+
 class GlApplication():
 
     WINDOW_CURRENT = None
 
     DEBUG = False
 
+    """
+    seconds to wait for events in idle mode before the
+    windows are checked again (e.g. for data which was
+    loaded in background).
+    """
+    IDLE_TIMEOUT = 0.1
+
     """
     allows to register a framebuffer on binding.
     this enabled to reactivate last active framebuffers.
@@ -25,12 +145,22 @@ class GlApplication():
 
     """
     initializes opengl & glfw. handles glfw windows
-    and route events to windows
+    and route events to windows.
+
+    with idle=True a window is only rendered if its scene has
+    changed (see Controller.needs_render). if no window was
+    rendered the application waits for events up to
+    IDLE_TIMEOUT seconds instead of polling.
+
+    the windows are cycled by a FrameScheduler (see GlWindow
+    fps and budget).
     """
-    def __init__(self):
+    def __init__(self, idle=False):
         """general window configuration"""
         self.exit     = False
         self.windows  = []
+        self.idle     = idle
+        self.scheduler = FrameScheduler()
 
         GlApplication._dbg("init GLFW", '...')
         self.initGlfw()
@@ -68,9 +198,13 @@ class GlApplication():
 
         pos_x = 50
         pos_y = 150
+        # all windows share the gl objects of the first one, so
+        # the linked programs of PROGRAMS are valid in every window.
+        share = None
         for window in self.windows:
             GlApplication._dbg('initialize glfw window', '...')
-            window.init_glfw()
+            window.init_glfw(share)
+            share = share or window._glfw_window
             window.set_position(pos_x, pos_y)
             pos_x += window.width + 10
 
@@ -94,21 +228,80 @@ class GlApplication():
             self.init()
 
         # main cycle
+        rendered = True
         while self.active():
-            glfwPollEvents()
-            for window in self.windows:
-                window.make_context()
-                if window.active():
-                    window.event_queue()
-                    window.cycle()
-                else:
+            # wait if no window has rendered (idle or not due)
+            if not rendered:
+                self.wait_events(self.scheduler.timeout(self.windows, time(), self.IDLE_TIMEOUT))
+            else:
+                glfwPollEvents()
+
+            rendered = False
+            for window in list(self.windows):
+                if not window.active():
+                    window.make_context()
                     GlApplication._dbg('close window', '...')
                     window.destroy()
                     self.windows.remove(window)
                     GlApplication._dbg('window closed', 'OK')
+                elif self.scheduler.due(window, time()):
+                    window.make_context()
+                    window.event_queue()
+                    window_rendered = self.scheduler.cycle(window, idle=self.idle)
+                    FRAME_COUNTER.count(window_rendered)
+                    rendered = rendered or window_rendered
+
+            if rendered:
+                UPLOAD_COUNTER.next_frame()
+                ALLOCATION_COUNTER.next_frame()
 
         self.terminate()
 
+    def wait_events(self, timeout=None):
+        """
+        waits for events up to timeout seconds
+        (IDLE_TIMEOUT by default)
+        """
+        timeout = self.IDLE_TIMEOUT if timeout is None else timeout
+        if glfwWaitEventsTimeout is not None:
+            glfwWaitEventsTimeout(timeout)
+        else:
+            glfwPollEvents()
+            sleep(timeout)
+
+    @classmethod
+    def defer(cls, key, function, *args):
+        """
+        defers expensive work of the current window (e.g.
+        rebuilding a texture) until its frame is rendered.
+        it is done as long as the frame budget allows, a later
+        call with the same key replaces the deferred call.
+        without a current window the work is done at once.
+        """
+        if cls.WINDOW_CURRENT is None or not hasattr(cls.WINDOW_CURRENT, 'defer'):
+            function(*args)
+        else:
+            cls.WINDOW_CURRENT.defer(key, function, *args)
+
+    @classmethod
+    def within_budget(cls):
+        """
+        whether the current window has time left in its frame
+        budget. expensive work which can be continued in the
+        next frame should stop if not.
+        """
+        return cls.WINDOW_CURRENT is None or not hasattr(cls.WINDOW_CURRENT, 'within_budget') \
+            or cls.WINDOW_CURRENT.within_budget()
+
+    @classmethod
+    def wake(cls):
+        """
+        stops waiting for events. may be invoked by other
+        threads when new data is available.
+        """
+        if glfwPostEmptyEvent is not None:
+            glfwPostEmptyEvent()
+
     def initGlfw(self):
         """initialize glfw"""
         if not glfwInit():
@@ -147,15 +340,24 @@ class GlWindow():
     into the given controller. a GlWindow does not render something,
     it is the adapter between a Controller and Glfw.
     """
-    def __init__(self, width, height, title='no title', x=None, y=None):
+    def __init__(self, width, height, title='no title', x=None, y=None, fps=None, budget=None):
         """
-        basic state initialization.
+        basic state initialization. fps is the target frame
+        rate of the window (None: every loop), budget the time
+        in seconds a frame may take including deferred work
+        (None: unlimited).
         """
         self.width = width
         self.height = height
         self.title = title
         self.x = x
         self.y = y
+        self.fps = fps
+        self.budget = budget
+        self.frame_times = FrameHistogram()
+        self.frame_start = None
+        self.next_frame_time = 0.0
+        self._deferred = OrderedDict()
 
         self.controller = Controller(Camera2d((width, height)))
         self.event_queue = CommandQueue()
@@ -167,11 +369,12 @@ class GlWindow():
         self._keyboard_active = set()
         self._keyboard_pressed = set()
 
-    def init_glfw(self):
+    def init_glfw(self, share=None):
         """
-        glfw initialization.
+        glfw initialization. the context shares its gl
+        objects with the glfw window share.
         """
-        self._glfw_window = glfwCreateWindow(self.width, self.height, self.title)
+        self._glfw_window = glfwCreateWindow(self.width, self.height, self.title, share=share)
         if not self._glfw_window:
             raise RuntimeError('glfw.CreateWindow() error')
         self._glfw_initialized = True
@@ -204,6 +407,7 @@ class GlWindow():
     def mouse_callback(self, win, button, action, mod):
         print(win, button, action, mod)
         self.controller.on_mouse(win, button, action, mod)
+        self.controller.invalidate()
     def set_controller(self, controller):
         """
         sets a controller. if controller has no camera
@@ -242,14 +446,40 @@ class GlWindow():
         glfwMakeContextCurrent(self._glfw_window)
         GlApplication.WINDOW_CURRENT = self
 
-    def cycle(self):
-
-        self.controller.cycle(**{
+    def cycle(self, idle=False):
+        """
+        cycles the controller. returns whether it rendered
+        """
+        rendered = self.controller.cycle(**{
             'keyboard_active': self._keyboard_active,
             'keyboard_pressed': self._keyboard_pressed,
             'cursor': glfwGetCursorPos(self._glfw_window),
+            'idle': idle,
         })
         self._keyboard_pressed = set()
+        return rendered
+
+    def defer(self, key, function, *args):
+        self._deferred.pop(key, None)
+        self._deferred[key] = (function, args)
+
+    def has_deferred_work(self):
+        return len(self._deferred) > 0
+
+    def within_budget(self):
+        return self.budget is None or self.frame_start is None \
+            or time() - self.frame_start < self.budget
+
+    def run_deferred(self):
+        """
+        does deferred work while the frame budget allows,
+        at least one call so there is always progress.
+        """
+        done = False
+        while self._deferred and (not done or self.within_budget()):
+            key, (function, args) = self._deferred.popitem(last=False)
+            function(*args)
+            done = True
 
     def destroy(self):
         self.controller.on_destroy()
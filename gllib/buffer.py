@@ -8,17 +8,203 @@ XXX
 :author: Nicolas 'keksnicoh' Heimann 
 """
 from OpenGL.GL import *
+import numpy as np
+from time import time
+from ctypes import c_void_p
+
+class TransferCounter():
+    """
+    counts the bytes which are uploaded to the gpu.
+    next_frame() is invoked by GlApplication after each
+    cycle so last_frame holds the bytes of the last frame.
+    """
+    def __init__(self):
+        self.total = 0
+        self.uploads = 0
+        self.frame = 0
+        self.last_frame = 0
+
+    def count(self, nbytes):
+        self.total += nbytes
+        self.frame += nbytes
+        self.uploads += 1
+
+    def next_frame(self):
+        self.last_frame = self.frame
+        self.frame = 0
+
+UPLOAD_COUNTER = TransferCounter()
+
+class AllocationCounter():
+    """
+    counts the created gl objects (buffers, vertex arrays,
+    textures, framebuffers, shaders and programs) by kind.
+    like TransferCounter, last_frame holds the objects which
+    were created in the last frame. after initialization a
+    steady state frame should create none.
+    """
+    def __init__(self):
+        self.total = 0
+        self.kinds = {}
+        self.frame = 0
+        self.last_frame = 0
+
+    def count(self, kind, n=1):
+        self.total += n
+        self.frame += n
+        self.kinds[kind] = self.kinds.get(kind, 0) + n
+
+    def next_frame(self):
+        self.last_frame = self.frame
+        self.frame = 0
+
+ALLOCATION_COUNTER = AllocationCounter()
+
+# streaming modes for buffers which are rewritten every frame
+STREAM_ORPHAN = 'orphan'
+STREAM_ROUND_ROBIN = 'round_robin'
+
+class BufferRing():
+    """
+    round robin of buffer ids guarded by fences.
+
+    when the ring advances, a fence is inserted behind all
+    commands issued so far (the draws from the current buffer).
+    the next buffer is only returned after its fence was
+    signaled, so the cpu never writes into a buffer which the
+    gpu still reads from. stalls counts how often the cpu had
+    to wait.
+    """
+    FENCE_TIMEOUT = 1000000000 # ns
+
+    def __init__(self, gl_vbo_ids):
+        self.gl_vbo_ids = list(gl_vbo_ids)
+        self.fences = [None]*len(self.gl_vbo_ids)
+        self.index = 0
+        self.stalls = 0
+
+    def __len__(self):
+        return len(self.gl_vbo_ids)
+
+    @property
+    def current(self):
+        return self.gl_vbo_ids[self.index]
+
+    def advance(self):
+        """
+        fences the current buffer and moves to the next one.
+        returns the index of the next buffer.
+        """
+        self.fences[self.index] = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        self.index = (self.index + 1) % len(self.gl_vbo_ids)
+
+        fence = self.fences[self.index]
+        if fence is not None:
+            if glClientWaitSync(fence, 0, 0) == GL_TIMEOUT_EXPIRED:
+                self.stalls += 1
+                glClientWaitSync(fence, GL_SYNC_FLUSH_COMMANDS_BIT, self.FENCE_TIMEOUT)
+            glDeleteSync(fence)
+            self.fences[self.index] = None
+
+        return self.index
+
+def coalesce_ranges(ranges):
+    """
+    sorts [start, stop) ranges and merges overlapping
+    or adjacent ones.
+    """
+    merged = []
+    for start, stop in sorted(tuple(r) for r in ranges):
+        if len(merged) and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        elif stop > start:
+            merged.append((start, stop))
+    return merged
+
+# vertex attribute types for glVertexAttribPointer
+GL_TYPES = {
+    np.dtype(np.float32): GL_FLOAT,
+    np.dtype(np.int8):    GL_BYTE,
+    np.dtype(np.uint8):   GL_UNSIGNED_BYTE,
+    np.dtype(np.int16):   GL_SHORT,
+    np.dtype(np.uint16):  GL_UNSIGNED_SHORT,
+    np.dtype(np.int32):   GL_INT,
+    np.dtype(np.uint32):  GL_UNSIGNED_INT,
+}
+
 class VertexBuffer():
     """
     representation of a buffer
+
+    the components may have any dtype of GL_TYPES. integer
+    components are converted to float by the gpu when they are
+    read by the vertex shader. if normalized is True they are
+    mapped to [0,1] (unsigned) or [-1,1] (signed).
+
+    streaming modes for buffers which are rewritten every frame:
+    
+      STREAM_ORPHAN       each upload orphans the storage by
+                          glBufferData(None) so the driver can hand
+                          out new memory instead of waiting for
+                          pending draws. partial updates upload the
+                          whole data since orphaning discards it.
+      STREAM_ROUND_ROBIN  buffers vbos are written in turn, guarded
+                          by fences (see BufferRing). gl_vbo_id
+                          changes after each upload. dirty ranges
+                          are remembered per buffer so each buffer
+                          only receives what it has missed.
+
+    interleaved buffers: dtype may be a structured dtype (one
+    record per vertex, dimension 1). field(name) returns the
+    description of one field as vertex attribute: the same vbo
+    read with the record size as stride from the field offset.
+
+    ..code:
+        buffer = VertexBuffer.from_numpy(records)
+        VertexArray({
+            'position': buffer.field('position'),
+            'size': buffer.field('size'),
+        }, program.attributes)
+
+    instanced attributes: with divisor=n the attribute advances
+    once every n instances of glDrawArraysInstanced instead of
+    once per vertex.
     """
     _FLT32 = 4
-    def __init__(self, length=None, dimension=None, gl_vbo_id=None):
+    def __init__(self, length=None, dimension=None, gl_vbo_id=None, streaming=None, buffers=3, dtype=np.float32, normalized=False,
+        stride=0, byte_offset=0, divisor=0):
         self.length = length 
         self.dimension = dimension 
         self.usage = GL_STATIC_DRAW
         self.nbytes = None 
 
+        self.dtype = np.dtype(dtype)
+        if self.dtype.fields is not None:
+            self.gl_type = None
+        elif self.dtype in GL_TYPES:
+            self.gl_type = GL_TYPES[self.dtype]
+        else:
+            raise ValueError('unsupported vertex dtype {}. supported dtypes: {} or structured dtypes'.format(
+                self.dtype, ', '.join(str(t) for t in GL_TYPES)))
+        self.itemsize = self.dtype.itemsize
+        self.normalized = normalized
+        # attribute layout within the vbo in bytes
+        self.stride = stride
+        self.byte_offset = byte_offset
+        # instanced attributes advance once per divisor instances
+        self.divisor = divisor
+
+        if streaming not in (None, STREAM_ORPHAN, STREAM_ROUND_ROBIN):
+            raise ValueError('unknown streaming mode "{}"'.format(streaming))
+        if streaming == STREAM_ROUND_ROBIN and gl_vbo_id is not None:
+            raise ValueError('round robin streaming cannot wrap an existing vbo')
+        self.streaming = streaming
+        self.buffers = buffers
+        self.ring = None
+        self._ring_dirty = None
+        if streaming is not None:
+            self.usage = GL_STREAM_DRAW
+
         if gl_vbo_id is not None:
             self._gl_vbo_id = gl_vbo_id
         else:
@@ -26,44 +212,308 @@ class VertexBuffer():
 
         self.gl_buffer_length = 0
         self.gl_initialized = False
+        self.data = None
+        self._dirty = []
+
     @classmethod
-    def from_numpy(cls, np_data):
+    def from_numpy(cls, np_data, streaming=None, normalized=False):
         """
         creates a corresponding vbo from 
         a given numpy array
         """
-        if np_data.shape[1] is None:
-            raise ValueError('numpy array must have 2d shape. given shape: {}'.format(np_data))
+        if np_data.dtype.fields is not None and len(np_data.shape) == 1:
+            np_data = np_data.reshape((np_data.shape[0], 1))
+        if len(np_data.shape) < 2:
+            raise ValueError('numpy array must have 2d shape. given shape: {}'.format(np_data.shape))
                 
-        vertex_buffer = VertexBuffer(*np_data.shape[0:2])
+        vertex_buffer = VertexBuffer(*np_data.shape[0:2], streaming=streaming,
+            dtype=np_data.dtype, normalized=normalized)
         vertex_buffer.buffer_data(np_data)
         return vertex_buffer
 
+    def field(self, name, normalized=None, divisor=None):
+        """
+        vertex buffer description of field name of a structured
+        buffer. the field must have a dtype of GL_TYPES and at
+        most 4 components.
+        """
+        if self.dtype.fields is None or name not in self.dtype.fields:
+            raise ValueError('VertexBuffer with dtype={} has no field "{}"'.format(self.dtype, name))
+
+        field_dtype, byte_offset = self.dtype.fields[name][0:2]
+        dimension = int(np.prod(field_dtype.shape)) if field_dtype.shape else 1
+        if dimension > 4:
+            raise ValueError('field "{}" has {} components but vertex attributes have at most 4'.format(
+                name, dimension))
+
+        return VertexBuffer(self.length, dimension,
+            gl_vbo_id=self.gl_vbo_id,
+            dtype=field_dtype.base,
+            normalized=self.normalized if normalized is None else normalized,
+            stride=self.dtype.itemsize,
+            byte_offset=byte_offset,
+            divisor=self.divisor if divisor is None else divisor)
+
     @property
     def gl_vbo_id(self):
         if not self.gl_initialized:
             self.gl_init()
 
+        if self.ring is not None:
+            return self.ring.current
         return self._gl_vbo_id
 
     def gl_init(self):
-        if self._gl_vbo_id is None:
+        if self.streaming == STREAM_ROUND_ROBIN:
+            self.ring = BufferRing(glGenBuffers(1) for i in range(self.buffers))
+            ALLOCATION_COUNTER.count('buffer', self.buffers)
+            self._ring_dirty = [[] for i in range(self.buffers)]
+            self._gl_vbo_id = self.ring.current
+        elif self._gl_vbo_id is None:
             self._gl_vbo_id = glGenBuffers(1)
+            ALLOCATION_COUNTER.count('buffer')
         self.gl_initialized = True
 
     def buffer_data(self, data=None):
+        """
+        uploads the whole data. the existing storage is reused
+        by glBufferSubData as long as data does not exceed it,
+        otherwise new storage is allocated by glBufferData.
+        """
+        if data.dtype != self.dtype:
+            raise ValueError('data has dtype={} but VertexBuffer has dtype={}'.format(data.dtype, self.dtype))
+
         self.data = data
+        if len(data.shape) > 1:
+            self.length = data.shape[0]
+        self._dirty = []
+
+        if self.streaming == STREAM_ROUND_ROBIN:
+            if not self.gl_initialized:
+                self.gl_init()
+            if self.length > self.gl_buffer_length:
+                self._allocate_ring()
+            for dirty in self._ring_dirty:
+                dirty[:] = [(0, self.length)]
+            self._upload_ring()
+            return
+
+        data = np.ascontiguousarray(data)
         glBindBuffer(GL_ARRAY_BUFFER, self.gl_vbo_id)
-        glBufferData(GL_ARRAY_BUFFER, self.dimension*self.length*self._FLT32, data.flatten(), self.usage)
+        if self.streaming == STREAM_ORPHAN:
+            self.gl_buffer_length = max(self.length, self.gl_buffer_length)
+            glBufferData(GL_ARRAY_BUFFER, self.dimension*self.gl_buffer_length*self.itemsize, None, self.usage)
+            glBufferSubData(GL_ARRAY_BUFFER, 0, data.nbytes, data)
+        elif 0 < self.length <= self.gl_buffer_length:
+            glBufferSubData(GL_ARRAY_BUFFER, 0, data.nbytes, data)
+        else:
+            glBufferData(GL_ARRAY_BUFFER, self.dimension*self.length*self.itemsize, data, self.usage)
+            self.gl_buffer_length = self.length
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+        UPLOAD_COUNTER.count(data.nbytes)
+
+    def _allocate_ring(self):
+        for gl_vbo_id in self.ring.gl_vbo_ids:
+            glBindBuffer(GL_ARRAY_BUFFER, gl_vbo_id)
+            glBufferData(GL_ARRAY_BUFFER, self.dimension*self.length*self.itemsize, None, self.usage)
         glBindBuffer(GL_ARRAY_BUFFER, 0)
         self.gl_buffer_length = self.length
 
+    def _upload_ring(self):
+        """
+        advances the ring and uploads all ranges the
+        next buffer has missed.
+        """
+        index = self.ring.advance()
+        for start, stop in coalesce_ranges(self._ring_dirty[index]):
+            self.buffer_sub_data(self.data[start:stop], start)
+        self._ring_dirty[index] = []
+
+    def allocate(self, length=None):
+        """
+        allocates the buffer storage for length verticies
+        without uploading any data.
+        """
+        if length is not None:
+            self.length = length
+        if self.streaming == STREAM_ROUND_ROBIN:
+            if not self.gl_initialized:
+                self.gl_init()
+            self._allocate_ring()
+            return
+        glBindBuffer(GL_ARRAY_BUFFER, self.gl_vbo_id)
+        glBufferData(GL_ARRAY_BUFFER, self.dimension*self.length*self.itemsize, None, self.usage)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.gl_buffer_length = self.length
+
+    def buffer_sub_data(self, data, offset=0):
+        """
+        uploads data into the allready allocated storage
+        starting at vertex offset. only data.nbytes will be
+        transfered.
+        """
+        if offset + data.shape[0] > self.gl_buffer_length:
+            raise ValueError('buffer_sub_data out of range: {}+{} verticies exceed buffer length {}'.format(
+                offset, data.shape[0], self.gl_buffer_length))
+
+        data = np.ascontiguousarray(data)
+        glBindBuffer(GL_ARRAY_BUFFER, self.gl_vbo_id)
+        glBufferSubData(GL_ARRAY_BUFFER, offset*self.dimension*self.itemsize, data.nbytes, data)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        UPLOAD_COUNTER.count(data.nbytes)
+
+    def mark_dirty(self, start, stop):
+        """
+        marks verticies [start, stop) of self.data as modified.
+        the ranges are uploaded on the next flush().
+        """
+        self._dirty.append((max(0, int(start)), min(int(stop), self.length)))
+
+    def flush(self):
+        """
+        coalesces all dirty ranges and uploads them
+        by glBufferSubData.
+        """
+        if not len(self._dirty):
+            return
+
+        if self.streaming == STREAM_ORPHAN:
+            self.buffer_data(self.data)
+            return
+
+        merged = coalesce_ranges(self._dirty)
+        self._dirty = []
+
+        if self.streaming == STREAM_ROUND_ROBIN:
+            for dirty in self._ring_dirty:
+                dirty += merged
+            self._upload_ring()
+            return
+
+        for start, stop in merged:
+            self.buffer_sub_data(self.data[start:stop], start)
+
     def bind(self):
         glBindBuffer(GL_ARRAY_BUFFER, self.gl_vbo_id)
   
     def unbind(self):
         glBindBuffer(GL_ARRAY_BUFFER, 0)
 
+class ReadbackFuture():
+    """
+    pending result of AsyncReadback.read(). done() polls the
+    fence without blocking, result() blocks if the copy has
+    not finished yet.
+    """
+    def __init__(self, readback, staging, fence, nbytes, dtype, shape):
+        self.issued = time()
+        self.resolved = None
+        self._readback = readback
+        self._staging = staging
+        self._fence = fence
+        self._nbytes = nbytes
+        self._dtype = dtype
+        self._shape = shape
+        self._data = None
+
+    def done(self):
+        if self._data is None:
+            if glClientWaitSync(self._fence, GL_SYNC_FLUSH_COMMANDS_BIT, 0) == GL_TIMEOUT_EXPIRED:
+                return False
+            self._resolve()
+        return True
+
+    def result(self):
+        if not self.done():
+            start = time()
+            glClientWaitSync(self._fence, GL_SYNC_FLUSH_COMMANDS_BIT, self._readback.FENCE_TIMEOUT)
+            self._readback.stall_time += time() - start
+            self._readback.stalls += 1
+            self._resolve()
+        return self._data
+
+    @property
+    def latency(self):
+        """
+        seconds from read() until the data was available
+        """
+        if self.resolved is None:
+            return None
+        return self.resolved - self.issued
+
+    def _resolve(self):
+        glDeleteSync(self._fence)
+        glBindBuffer(GL_COPY_READ_BUFFER, self._staging[0])
+        data = glGetBufferSubData(GL_COPY_READ_BUFFER, 0, self._nbytes)
+        glBindBuffer(GL_COPY_READ_BUFFER, 0)
+
+        self._data = np.array(data.view(self._dtype).reshape(self._shape))
+        self.resolved = time()
+        self._readback.release(self._staging)
+        self._readback.latency = self.latency
+
+class AsyncReadback():
+    """
+    asynchronous readback of buffer objects.
+
+    read() copies the requested range by glCopyBufferSubData
+    into a staging buffer and inserts a fence. the returned
+    ReadbackFuture resolves when the gpu has finished the copy,
+    usually within the next frame. so glGetBufferSubData never
+    waits for pending draws.
+
+    latency holds the seconds of the last resolved readback,
+    stall_time the total seconds result() had to block.
+    """
+    FENCE_TIMEOUT = 1000000000 # ns
+    # staging buffers kept for reuse
+    MAX_POOL = 4
+
+    def __init__(self):
+        self.latency = None
+        self.stall_time = 0.0
+        self.stalls = 0
+        self.reads = 0
+        self._pool = []
+
+    def read(self, gl_vbo_id, nbytes, dtype, shape, offset=0):
+        staging = self.acquire(nbytes)
+
+        glBindBuffer(GL_COPY_READ_BUFFER, gl_vbo_id)
+        glBindBuffer(GL_COPY_WRITE_BUFFER, staging[0])
+        glCopyBufferSubData(GL_COPY_READ_BUFFER, GL_COPY_WRITE_BUFFER, offset, 0, nbytes)
+        glBindBuffer(GL_COPY_WRITE_BUFFER, 0)
+        glBindBuffer(GL_COPY_READ_BUFFER, 0)
+
+        fence = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        self.reads += 1
+        return ReadbackFuture(self, staging, fence, nbytes, np.dtype(dtype), shape)
+
+    def acquire(self, nbytes):
+        """
+        returns a (gl_buffer_id, nbytes) staging buffer
+        with at least nbytes capacity
+        """
+        for i, staging in enumerate(self._pool):
+            if staging[1] >= nbytes:
+                return self._pool.pop(i)
+
+        staging = (glGenBuffers(1), nbytes)
+        ALLOCATION_COUNTER.count('buffer')
+        glBindBuffer(GL_COPY_WRITE_BUFFER, staging[0])
+        glBufferData(GL_COPY_WRITE_BUFFER, nbytes, None, GL_STREAM_READ)
+        glBindBuffer(GL_COPY_WRITE_BUFFER, 0)
+        return staging
+
+    def release(self, staging):
+        self._pool.append(staging)
+        if len(self._pool) > self.MAX_POOL:
+            self._pool.sort(key=lambda staging: staging[1])
+            glDeleteBuffers(1, [self._pool.pop(0)[0]])
+
+READBACK = AsyncReadback()
+
 class VertexArray():
     def __init__(self, attributes, enable_attributes=None):
         self.attributes = attributes
@@ -72,15 +522,72 @@ class VertexArray():
             self.enable_attributes(enable_attributes)
     def init_gl(self):
         self.gl_vao_id = glGenVertexArrays(1)
+        ALLOCATION_COUNTER.count('vertex_array')
     def enable_attributes(self, program_attributes):
         glBindVertexArray(self.gl_vao_id)
-        for i, (name, buffer) in enumerate(self.attributes.items()):
+        for name, buffer in self.attributes.items():
+            location = program_attributes[name]
+            if location < 0:
+                # declared but not used by the program
+                continue
             buffer.bind()
-            glVertexAttribPointer(program_attributes[name], buffer.dimension, GL_FLOAT, GL_FALSE, 0, None)
-            glEnableVertexAttribArray(i)
+            glVertexAttribPointer(location, buffer.dimension, buffer.gl_type,
+                GL_TRUE if buffer.normalized else GL_FALSE, buffer.stride,
+                c_void_p(buffer.byte_offset) if buffer.byte_offset else None)
+            if buffer.divisor:
+                glVertexAttribDivisor(location, buffer.divisor)
+            glEnableVertexAttribArray(location)
         glBindVertexArray(0)
     def bind(self):
         glBindVertexArray(self.gl_vao_id)
     def unbind(self):
         glBindVertexArray(0)
-        
\ No newline at end of file
+        
+class UniformBuffer():
+    """
+    uniform buffer object of a std140 uniform block. the
+    block is described by a structured dtype whose fields
+    match the std140 offsets (e.g. mat4 fields only).
+
+    update() changes the values on the host, bind() uploads
+    them by one glBufferSubData if they have changed and binds
+    the buffer to the binding point of the block (see
+    shader.UNIFORM_BLOCK_BINDINGS).
+
+    ..code:
+        camera = UniformBuffer(PLOT_CAMERA_DTYPE, UNIFORM_BLOCK_BINDINGS['plot_camera'])
+        camera.update(mat_camera=plot_cam, mat_outer_camera=outer_cam)
+        camera.bind()
+    """
+    def __init__(self, dtype, binding):
+        self.data = np.zeros(1, dtype=dtype)
+        self.binding = binding
+        self.gl_buffer_id = None
+        self._dirty = True
+
+    def gl_init(self):
+        self.gl_buffer_id = glGenBuffers(1)
+        ALLOCATION_COUNTER.count('buffer')
+        glBindBuffer(GL_UNIFORM_BUFFER, self.gl_buffer_id)
+        glBufferData(GL_UNIFORM_BUFFER, self.data.nbytes, None, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_UNIFORM_BUFFER, 0)
+
+    def update(self, **values):
+        for name, value in values.items():
+            value = np.asarray(value, dtype=self.data.dtype[name].base).reshape(self.data.dtype[name].shape)
+            if not np.array_equal(self.data[name][0], value):
+                self.data[name][0] = value
+                self._dirty = True
+
+    def bind(self):
+        if self.gl_buffer_id is None:
+            self.gl_init()
+
+        if self._dirty:
+            glBindBuffer(GL_UNIFORM_BUFFER, self.gl_buffer_id)
+            glBufferSubData(GL_UNIFORM_BUFFER, 0, self.data.nbytes, self.data)
+            glBindBuffer(GL_UNIFORM_BUFFER, 0)
+            UPLOAD_COUNTER.count(self.data.nbytes)
+            self._dirty = False
+
+        glBindBufferBase(GL_UNIFORM_BUFFER, self.binding, self.gl_buffer_id)
@@ -27,6 +27,10 @@ class Controller():
         self.initialized      = False
         self.host_controller  = None
         self.cursor = (0,0)
+        # the scene has changed since the last rendering
+        self.dirty            = True
+        # the current cycle skips unchanged scenes
+        self.idle             = False
         self.on_pre_render.append(self.clear_gl)
 
     def init(self):
@@ -34,9 +38,34 @@ class Controller():
         self.camera.on_change_matrix.append(self.camera_updated)
         self.initialized = True
     def camera_updated(self, camera):
+        self.invalidate()
         if self.host_controller is None:
             self.cycle()
 
+    def invalidate(self):
+        """
+        marks the scene as changed so the next cycle renders
+        it (also in idle mode). the host controller is marked
+        as well since it renders this controller.
+        """
+        self.dirty = True
+        if self.host_controller is not None:
+            self.host_controller.invalidate()
+
+    def needs_render(self):
+        """
+        whether the next cycle has to render. subclasses
+        check their own state (e.g. pending graph data).
+
+        a scene is dirty after invalidate(): camera changes,
+        keyboard, cursor and mouse input. the Plotter also
+        renders if the version of a graph domain changed or a
+        graph, domain or widget has_pending_updates(). so a
+        domain which changes its data must increment version or
+        implement has_pending_updates().
+        """
+        return self.dirty
+
     def clear_gl(self):
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
 
@@ -47,19 +76,49 @@ class Controller():
     def cycle(self,
         keyboard_active=set(),
         keyboard_pressed=set(),
-        cursor=(0,0)):
+        cursor=(0,0),
+        idle=False):
+        """
+        one frame. with idle=True the rendering is skipped if
+        the scene has not changed (see needs_render), the
+        on_pre_cycle listeners and input events are processed
+        anyway. returns whether the frame was rendered.
+        """
+        self.idle = idle
+        self.pre_cycle(keyboard_active, keyboard_pressed, cursor)
 
+        rendered = not idle or self.needs_render()
+        if rendered:
+            self.render_cycle()
+
+        self.post_cycle()
+        return rendered
+
+    def pre_cycle(self,
+        keyboard_active=set(),
+        keyboard_pressed=set(),
+        cursor=(0,0)):
+        """
+        processes on_pre_cycle listeners and input. input
+        marks the scene as changed.
+        """
         self.on_pre_cycle(self)
         if len(keyboard_pressed) or len(keyboard_active):
             self.on_keyboard(keyboard_active, keyboard_pressed)
+            self.invalidate()
 
         if self.cursor != cursor:
             self.on_cursor(cursor)
             self.cursor = cursor
+            self.invalidate()
 
+    def post_cycle(self):
+        self.on_post_cycle()
 
+    def render_cycle(self):
+        # changes while rendering are rendered next cycle
+        self.dirty = False
         self.on_pre_render()
         self.run()
         self.on_post_render()
-        self.on_post_cycle()
 
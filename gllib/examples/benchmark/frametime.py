@@ -0,0 +1,82 @@
+#-*- coding: utf-8 -*-
+"""
+frame time measurement helper for the benchmark examples.
+
+a FrameTimer is attached to a plotter. it forces the plotter
+to rerender its graphs on every cycle and measures the time of
+each cycle (glFinish included so the gpu work is measured too).
+after warmup+frames cycles the on_done callback is invoked with
+the collected frame times in seconds.
+
+    timer = FrameTimer(plotter, frames=200, on_done=report)
+
+with finish=False no glFinish is issued and the time between two
+cycles is measured instead. this keeps the cpu and gpu pipelined
+so stalls on buffers which are still in use become visible.
+"""
+from OpenGL.GL import glFinish
+from time import time
+import numpy as np
+
+class FrameTimer():
+    def __init__(self, plotter, frames=200, warmup=20, on_done=None, on_frame=None, finish=True):
+        self.plotter = plotter
+        self.finish = finish
+        self.frames = frames
+        self.warmup = warmup
+        self.on_done = on_done
+        self.on_frame = on_frame
+        self.times = []
+        self._count = 0
+        self._start = None
+        self.done = False
+
+        plotter.on_pre_cycle.append(self.pre_cycle)
+        plotter.on_post_cycle.append(self.post_cycle)
+
+    def reset(self):
+        self.times = []
+        self._count = 0
+        self._start = None
+        self.done = False
+
+    def pre_cycle(self, plotter):
+        if not self.finish and self._start is not None and not self.done:
+            self._record(time() - self._start)
+            if self.done:
+                return
+
+        if self.on_frame is not None:
+            self.on_frame(self._count)
+        self.plotter.render_graphs = True
+        if self.finish:
+            glFinish()
+        self._start = time()
+
+    def post_cycle(self):
+        if not self.finish or self._start is None or self.done:
+            return
+
+        glFinish()
+        self._record(time() - self._start)
+
+    def _record(self, dt):
+        if self._count >= self.warmup:
+            self.times.append(dt)
+        self._count += 1
+
+        if len(self.times) >= self.frames:
+            self.done = True
+            if self.on_done is not None:
+                self.on_done(np.array(self.times))
+
+def summary(name, times):
+    """
+    returns a single table row with mean, median and p95 in ms
+    """
+    ms = 1000.0*np.asarray(times)
+    return '{:<32} {:>9.3f} {:>9.3f} {:>9.3f}'.format(
+        name, np.mean(ms), np.median(ms), np.percentile(ms, 95))
+
+def summary_header():
+    return '{:<32} {:>9} {:>9} {:>9}'.format('', 'mean ms', 'median ms', 'p95 ms')
@@ -0,0 +1,48 @@
+#-*- coding: utf-8 -*-
+"""
+compares frame time of a zoomed out line plot with
+NumpyDomain(lod=True) against the full resolution path.
+
+    python -m gllib.examples.benchmark.lod [nsamples]
+
+both graphs plot the same noisy trace. first the full resolution
+graph is measured, then the lod graph. the plot shows the whole
+trace so the pyramid level is choosen from the plot frame width.
+"""
+from gllib.plot.domain import NumpyDomain
+from gllib.plot.graph import Line2d
+from gllib.plot.app import plot2d
+from gllib.examples.benchmark.frametime import FrameTimer, summary, summary_header
+
+import numpy as np
+import sys
+
+NSAMPLES = int(sys.argv[1]) if len(sys.argv) > 1 else 5000000
+
+def plot_main(plotter):
+    x = np.linspace(0, 100, NSAMPLES, dtype=np.float32)
+    y = (np.sin(x) + 0.1*np.random.randn(NSAMPLES)).astype(np.float32)
+    data = np.column_stack((x, y))
+
+    full = Line2d(NumpyDomain(data), width=1)
+    lod = Line2d(NumpyDomain(data, lod=True), width=1, draw_lines=False)
+    plotter.graphs['full'] = full
+    plotter.graphs['lod'] = lod
+
+    results = []
+    def done(times):
+        results.append(times)
+        if len(results) == 1:
+            lod.domains[0].lod.wait()
+            full.draw_lines = False
+            lod.draw_lines = True
+            timer.reset()
+        else:
+            print(summary_header())
+            print(summary('full resolution ({} verticies)'.format(NSAMPLES), results[0]))
+            print(summary('lod level {} ({} verticies)'.format(lod.domains[0].lod_level, len(lod.domains[0])), results[1]))
+            plotter.on_pre_cycle.remove(timer.pre_cycle)
+
+    timer = FrameTimer(plotter, frames=100, on_done=done)
+
+plot2d(plot_main, axis=[100, 3], origin=[0, -1.5])
@@ -0,0 +1,77 @@
+#-*- coding: utf-8 -*-
+"""
+compares frame time of many series drawn as one Line2d per
+series against a single MultiLine2d.
+
+    python -m gllib.examples.benchmark.multiseries [samples] [series ...]
+
+for each number of series first the Line2d graphs (one program
+pair, one vao and one draw call each) and then the MultiLine2d
+(one program, one instanced draw call) are measured. Line2d is
+skipped above MAX_LINE2D series since compiling the programs
+alone takes minutes there.
+"""
+from gllib.plot.domain import NumpyDomain
+from gllib.plot.graph import Line2d
+from gllib.plot.series import MultiLine2d
+from gllib.plot.app import plot2d
+from gllib.examples.benchmark.frametime import FrameTimer, summary, summary_header
+
+from time import time
+import numpy as np
+import sys
+
+SAMPLES = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+SERIES = [int(a) for a in sys.argv[2:]] or [10, 100, 1000, 10000]
+MAX_LINE2D = 1000
+
+def create_data(nseries):
+    x = np.linspace(0, 10, SAMPLES, dtype=np.float32)
+    y = np.sin(x[None, :] + np.random.rand(nseries, 1)*10) + 0.1*np.random.randn(nseries, SAMPLES)
+    # stack the series over the plot height
+    return x, (y/nseries + np.linspace(0, 10, nseries)[:, None]).astype(np.float32)
+
+def line2d_graphs(nseries):
+    x, y = create_data(nseries)
+    return dict(('series{}'.format(i), Line2d(NumpyDomain(np.column_stack((x, y[i]))), cull=False))
+        for i in range(nseries))
+
+def multi_graphs(nseries):
+    x, y = create_data(nseries)
+    return {'series': MultiLine2d(y, x=x)}
+
+def plot_main(plotter):
+    runs = []
+    for nseries in SERIES:
+        if nseries <= MAX_LINE2D:
+            runs.append(('{} x Line2d'.format(nseries), line2d_graphs, nseries))
+        runs.append(('MultiLine2d {} series'.format(nseries), multi_graphs, nseries))
+
+    results = []
+    def start(run, init=True):
+        name, create, nseries = run
+        started = time()
+        plotter.graphs.clear()
+        plotter.graphs.update(create(nseries))
+        if init:
+            # the plotter initializes the graphs of the first run itself
+            plotter.init_graphs()
+            print('{}: init {:.3f}s'.format(name, time() - started))
+
+    def done(times):
+        results.append((runs[len(results)][0], times))
+        if len(results) < len(runs):
+            start(runs[len(results)])
+            timer.reset()
+        else:
+            print('')
+            print('{} samples per series'.format(SAMPLES))
+            print(summary_header())
+            for name, times in results:
+                print(summary(name, times))
+            plotter.on_pre_cycle.remove(timer.pre_cycle)
+
+    start(runs[0], init=False)
+    timer = FrameTimer(plotter, frames=100, on_done=done)
+
+plot2d(plot_main, axis=[10, 11], origin=[0, -0.5])
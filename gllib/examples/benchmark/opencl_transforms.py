@@ -0,0 +1,81 @@
+#-*- coding: utf-8 -*-
+"""
+compares the opencl transformations of gllib.plot.domain.opencl
+(used by OpenCLDomain) against the numpy/scipy transformations
+of gllib.plot.domain.util (used by PythonDomain).
+
+    python -m gllib.examples.benchmark.opencl_transforms [nsamples ...]
+
+no opengl context is required. the device is chosen by
+pyopencl.create_some_context, e.g. for pocl:
+
+    PYOPENCL_CTX=portable python -m gllib.examples.benchmark.opencl_transforms
+
+"staged" is the host staging path of OpenCLDomain (copy to
+the device, run, copy back). "device" only runs the kernels
+on buffers which are already on the device, which is the cost
+of the gl sharing path.
+"""
+from gllib.plot.domain import util, opencl
+from gllib.examples.benchmark.frametime import summary, summary_header
+
+from time import time
+import pyopencl as cl
+import numpy as np
+import sys
+
+SIZES = [int(float(a)) for a in sys.argv[1:]] or [1000000, 10000000, 100000000]
+REPEAT = 3
+
+def measure(transformation, data):
+    times = []
+    for i in range(REPEAT):
+        start = time()
+        transformation(data)
+        times.append(time() - start)
+    return times
+
+def device_only(queue, transformation):
+    def _run(data):
+        n, dimension = data.shape
+        size = transformation.output_length(n)*transformation.output_dimension(dimension)*4
+        src = cl.Buffer(queue.context, cl.mem_flags.READ_ONLY | cl.mem_flags.COPY_HOST_PTR, hostbuf=data)
+        dst = cl.Buffer(queue.context, cl.mem_flags.WRITE_ONLY, max(4, size))
+        queue.finish()
+
+        times = []
+        for i in range(REPEAT):
+            start = time()
+            transformation.enqueue(queue, src, dst, n, dimension)
+            queue.finish()
+            times.append(time() - start)
+        return times
+    return _run
+
+if __name__ == '__main__':
+    ctx = cl.create_some_context(interactive=False)
+    queue = cl.CommandQueue(ctx)
+    print('device: {}'.format(ctx.devices[0].name))
+
+    rows = [
+        ('total_mean', util.total_mean(), opencl.TotalMean()),
+        ('moving_avarage', util.moving_avarage(50), opencl.MovingAverage(50)),
+        ('map', util.domain_mapper(lambda row: (row[0], 2*row[1] + 1), vectorized=True), opencl.MapExpression('y = 2.0f*y + 1.0f')),
+        ('fft1d', util.fft1d(), opencl.FFTMagnitude()),
+        ('psd', util.psd(), opencl.FFTMagnitude(power=True)),
+    ]
+
+    for nsamples in SIZES:
+        x = np.arange(nsamples, dtype=np.float32)*0.001
+        data = np.column_stack((x, np.sin(x) + 0.1*np.random.randn(nsamples))).astype(np.float32)
+
+        print('')
+        print('{} samples, {} runs each'.format(nsamples, REPEAT))
+        print(summary_header())
+        for name, python_transformation, cl_transformation in rows:
+            # warmup: builds the kernels
+            cl_transformation(queue, data[:16])
+
+            print(summary(name + ' python', measure(python_transformation, data)))
+            print(summary(name + ' staged', measure(lambda d: cl_transformation(queue, d), data)))
+            print(summary(name + ' device', device_only(queue, cl_transformation)(data)))
@@ -0,0 +1,66 @@
+#-*- coding: utf-8 -*-
+"""
+vertex counts and visual error of the RealAxis samplings.
+
+    python -m gllib.examples.benchmark.realaxis [width ...]
+
+no opengl context is required. the kernels are evaluated by
+numpy at the samples RealAxis would create for a plot frame
+of the given pixel width (height 600):
+
+  fixed 1000   the former sampling (1000 samples on any frame)
+  uniform      samples_per_pixel=2
+  adaptive     uniform + refinement (refine=True, tolerance=0.5)
+
+the error is the maximum and mean vertical distance in pixels
+between the drawn polyline and the kernel evaluated at 64
+points per pixel.
+"""
+from gllib.plot.domain import RealAxis
+
+import numpy as np
+import sys
+
+WIDTHS = [int(a) for a in sys.argv[1:]] or [400, 1920, 3840]
+HEIGHT = 600
+
+# name, kernel, visible x-range, visible y-range
+KERNELS = [
+    ('sin(x)', np.sin, 10.0, 2.2),
+    ('sin(50x)', lambda x: np.sin(50*x), 10.0, 2.2),
+    ('chirp sin(x^2)', lambda x: np.sin(x*x), 30.0, 2.2),
+    ('spike exp(-x^2/1e-4)', lambda x: np.exp(-(x-5)**2/1e-4), 10.0, 1.2),
+]
+
+def visual_error(kernel, samples, x_range, y_range, width):
+    """
+    (max, mean) vertical pixel error of the polyline
+    """
+    t = np.linspace(0, 1, 64*width)
+    polyline = np.interp(t, samples, kernel(x_range*samples))
+    error = np.abs(polyline - kernel(x_range*t))*HEIGHT/y_range
+    return np.max(error), np.mean(error)
+
+def adaptive_samples(axis, kernel, x_range, y_range, width):
+    samples = axis.uniform_samples(axis.sample_count(width))
+    # positions in pixels
+    positions = np.column_stack((samples*width, kernel(x_range*samples)*HEIGHT/y_range))
+    return axis.refine_samples(positions)
+
+if __name__ == '__main__':
+    print('{:<22} {:>6} {:<10} {:>9} {:>10} {:>10}'.format(
+        'kernel', 'width', 'sampling', 'vertices', 'max px', 'mean px'))
+    for name, kernel, x_range, y_range in KERNELS:
+        for width in WIDTHS:
+            uniform = RealAxis()
+            adaptive = RealAxis(refine=True)
+            samplings = [
+                ('fixed', RealAxis(length=1000).uniform_samples(1000)),
+                ('uniform', uniform.uniform_samples(uniform.sample_count(width))),
+                ('adaptive', adaptive_samples(adaptive, kernel, x_range, y_range, width)),
+            ]
+            for sampling, samples in samplings:
+                max_error, mean_error = visual_error(kernel, samples, x_range, y_range, width)
+                print('{:<22} {:>6} {:<10} {:>9} {:>10.3f} {:>10.4f}'.format(
+                    name, width, sampling, len(samples), max_error, mean_error))
+        print('')
@@ -0,0 +1,88 @@
+#-*- coding: utf-8 -*-
+"""
+upload throughput of live data: NumpyDomain (full glBufferData
+of the whole history on every data change) against
+RingBufferDomain (glBufferSubData of the appended chunk only).
+
+    python -m gllib.examples.benchmark.ringbuffer [capacity] [chunk]
+
+for each frame a chunk of new samples is generated and pushed into
+the domain. the upload time (including glFinish) and the frame time
+are reported for both domains.
+"""
+from gllib.plot.domain import NumpyDomain, RingBufferDomain
+from gllib.plot.graph import Line2d
+from gllib.plot.app import plot2d
+from gllib.examples.benchmark.frametime import FrameTimer, summary, summary_header
+
+from OpenGL.GL import glFinish
+from time import time
+import numpy as np
+import sys
+
+CAPACITY = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+CHUNK = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+class Source():
+    """
+    generates a continuous sine signal chunk by chunk
+    """
+    def __init__(self):
+        self.t = 0
+
+    def __call__(self, n):
+        t = self.t + np.arange(n, dtype=np.float32)
+        self.t += n
+        return np.column_stack((t, np.sin(0.001*t))).astype(np.float32)
+
+def plot_main(plotter):
+    source = Source()
+    history = source(CAPACITY)
+    numpy_domain = NumpyDomain(history)
+    ring_domain = RingBufferDomain(CAPACITY, dimension=2)
+    ring_domain.append(history)
+
+    numpy_graph = Line2d(numpy_domain)
+    ring_graph = Line2d(ring_domain, draw_lines=False)
+    plotter.graphs['numpy'] = numpy_graph
+    plotter.graphs['ring'] = ring_graph
+
+    uploads = []
+    results = []
+
+    def upload_numpy(frame):
+        chunk = source(CHUNK)
+        start = time()
+        numpy_domain.data = np.concatenate((numpy_domain.data[CHUNK:], chunk))
+        glFinish()
+        uploads.append(time() - start)
+
+    def upload_ring(frame):
+        chunk = source(CHUNK)
+        start = time()
+        ring_domain.append(chunk)
+        ring_domain.gl_vbo_id # flushes pending uploads
+        glFinish()
+        uploads.append(time() - start)
+
+    def done(times):
+        results.append((list(uploads), times))
+        del uploads[:]
+        if len(results) == 1:
+            numpy_graph.draw_lines = False
+            ring_graph.draw_lines = True
+            timer.on_frame = upload_ring
+            timer.reset()
+        else:
+            chunk_mb = CHUNK*2*4/1e6
+            print('capacity={} chunk={} ({:.3f} MB new data per frame)'.format(CAPACITY, CHUNK, chunk_mb))
+            print(summary_header())
+            for name, (upload_times, frame_times) in zip(('NumpyDomain', 'RingBufferDomain'), results):
+                print(summary(name + ' upload', upload_times))
+                print(summary(name + ' frame', frame_times))
+                print('{:<32} {:>9.1f} MB/s'.format(name + ' new data', chunk_mb/np.mean(upload_times)))
+            plotter.on_pre_cycle.remove(timer.pre_cycle)
+
+    timer = FrameTimer(plotter, frames=200, on_done=done, on_frame=upload_numpy)
+
+plot2d(plot_main, axis=[CAPACITY, 2.5], origin=[0, -1.25])
@@ -0,0 +1,75 @@
+#-*- coding: utf-8 -*-
+"""
+frame time of a domain which is rewritten every frame:
+GL_STATIC_DRAW (glBufferSubData into storage which may still
+be read by the last draw) against the streaming modes
+STREAM_ORPHAN and STREAM_ROUND_ROBIN.
+
+    python -m gllib.examples.benchmark.streaming [nsamples]
+
+to measure under mesa llvmpipe:
+
+    LIBGL_ALWAYS_SOFTWARE=1 GALLIUM_DRIVER=llvmpipe \\
+        python -m gllib.examples.benchmark.streaming
+
+each mode plots the same animated trace. the modes are measured
+one after another without glFinish (see FrameTimer finish=False)
+so an upload may have to wait for the draw of the last frame.
+the upload time and the time between two frames are reported.
+"""
+from gllib.plot.domain import NumpyDomain
+from gllib.plot.graph import Line2d
+from gllib.plot.app import plot2d
+from gllib.buffer import STREAM_ORPHAN, STREAM_ROUND_ROBIN
+from gllib.examples.benchmark.frametime import FrameTimer, summary, summary_header
+
+from time import time
+import numpy as np
+import sys
+
+NSAMPLES = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+MODES = [
+    ('GL_STATIC_DRAW', None),
+    ('STREAM_ORPHAN', STREAM_ORPHAN),
+    ('STREAM_ROUND_ROBIN', STREAM_ROUND_ROBIN),
+]
+
+def plot_main(plotter):
+    x = np.linspace(0, 100, NSAMPLES, dtype=np.float32)
+    def trace(frame):
+        return np.column_stack((x, np.sin(x + 0.05*frame))).astype(np.float32)
+
+    graphs = []
+    for i, (name, streaming) in enumerate(MODES):
+        graph = Line2d(NumpyDomain(trace(0), streaming=streaming), draw_lines=i == 0)
+        plotter.graphs[name] = graph
+        graphs.append(graph)
+
+    uploads = []
+    results = []
+
+    def upload(frame):
+        domain = graphs[len(results)].domains[0]
+        data = trace(frame)
+        start = time()
+        domain.data = data
+        uploads.append(time() - start)
+
+    def done(times):
+        results.append((list(uploads), times))
+        del uploads[:]
+        if len(results) < len(MODES):
+            graphs[len(results)-1].draw_lines = False
+            graphs[len(results)].draw_lines = True
+            timer.reset()
+        else:
+            print('{} verticies rewritten each frame'.format(NSAMPLES))
+            print(summary_header())
+            for (name, streaming), (upload_times, frame_times) in zip(MODES, results):
+                print(summary(name + ' upload', upload_times))
+                print(summary(name + ' frame', frame_times))
+            plotter.on_pre_cycle.remove(timer.pre_cycle)
+
+    timer = FrameTimer(plotter, frames=200, on_done=done, on_frame=upload, finish=False)
+
+plot2d(plot_main, axis=[100, 2.5], origin=[0, -1.25])
@@ -0,0 +1,81 @@
+#-*- coding: utf-8 -*-
+"""
+compares the vectorized transformations of gllib.plot.domain.util
+against the former per sample python loops.
+
+    python -m gllib.examples.benchmark.transforms [nsamples]
+
+no opengl context is required. the loop implementations below
+are the ones util.py had before it was vectorized.
+"""
+from gllib.plot.domain import util
+from gllib.examples.benchmark.frametime import summary, summary_header
+
+from time import time
+import numpy as np
+import sys
+
+NSAMPLES = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+REPEAT = 3
+
+def loop_total_mean(data):
+    mean_data = np.zeros_like(data)
+    for i, point in enumerate(data):
+        if i == 0:
+            mean_data[i][0] = 0
+            mean_data[i][1] = 0
+        else:
+            time_step = data[i][0] - data[i-1][0]
+            mean_data[i][0] = time_step*i
+            mean_data[i][1] = float(i)/(i+1.0)*mean_data[i-1][1] + 1.0/(i+1.0)*data[i][1];
+    return mean_data
+
+def loop_moving_avarage(data, nsamples=50):
+    mean_data = np.zeros_like(data)
+    for i, point in enumerate(data):
+        if i == 0:
+            mean_data[i][0] = 0
+            mean_data[i][1] = 0
+        else:
+            time_step = data[i][0] - data[i-1][0]
+            mean_data[i][0] = time_step*i
+            mean_data[i][1] = mean_data[i-1][1] + data[i][1]/nsamples - mean_data[max(0,i-nsamples)][1]/nsamples;
+    return mean_data
+
+def loop_domain_mapper(data, mapper):
+    new_data = np.zeros_like(data)
+    for i, row in enumerate(data):
+        new_data[i] = mapper(row)
+    return new_data
+
+def measure(transformation, data):
+    times = []
+    for i in range(REPEAT):
+        start = time()
+        transformation(data)
+        times.append(time() - start)
+    return times
+
+if __name__ == '__main__':
+    x = np.arange(NSAMPLES, dtype=np.float32)*0.001
+    data = np.column_stack((x, np.sin(x) + 0.1*np.random.randn(NSAMPLES))).astype(np.float32)
+    mapper = lambda row: (row[0], 2*row[1] + 1)
+
+    rows = [
+        ('total_mean loop', loop_total_mean),
+        ('total_mean', util.total_mean()),
+        ('moving_avarage loop', loop_moving_avarage),
+        ('moving_avarage', util.moving_avarage(50)),
+        ('domain_mapper loop', lambda d: loop_domain_mapper(d, mapper)),
+        ('domain_mapper', util.domain_mapper(mapper, vectorized=True)),
+        ('ema', util.ema(0.1)),
+        ('variance', util.variance()),
+        ('moving_variance', util.moving_variance(50)),
+        ('decimate', util.decimate(10)),
+        ('diff', util.diff()),
+    ]
+
+    print('{} samples, {} runs each'.format(NSAMPLES, REPEAT))
+    print(summary_header())
+    for name, transformation in rows:
+        print(summary(name, measure(transformation, data)))
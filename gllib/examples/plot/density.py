@@ -0,0 +1,32 @@
+#-*- coding: utf-8 -*-
+"""
+density plot of 10M points: three overlapping gaussian
+clusters drawn as histogram equalized density image.
+
+:author: Nicolas 'keksnicoh' Heimann
+"""
+from gllib.plot.app import plot2d
+from gllib.plot.domain import NumpyDomain
+from gllib.plot.density import Density2d
+from gllib.plot.color.schemes import ColorMap
+import numpy as np
+
+POINTS = 10**7
+
+color_scheme = ColorMap('IDL_Hardcandy', colorrange=[0, 1])
+
+def plot_main(plotter):
+    centers = np.array([(-1.0, 0.0), (1.0, 0.5), (0.0, -1.0)], dtype=np.float32)
+    cluster = np.random.randint(0, len(centers), POINTS)
+    points = centers[cluster] + np.random.randn(POINTS, 2).astype(np.float32)*[0.6, 0.3]
+
+    plotter.graphs['clusters'] = Density2d(NumpyDomain(points.astype(np.float32)),
+        scale='eq_hist',
+        color_scheme=color_scheme)
+
+plot2d(plot_main, axis=[6, 6], origin=[3, 3],
+    title='density of 10M points',
+    xlabel='x',
+    ylabel='y',
+    colorlegend=color_scheme
+)
@@ -0,0 +1,50 @@
+#-*- coding: utf-8 -*-
+"""
+scrolling spectrogram of a live signal (a chirp with noise).
+each frame appends new samples, only the spectra of the new
+segments are uploaded into the circular texture.
+
+:author: Nicolas 'keksnicoh' Heimann
+"""
+from gllib.plot.app import plot2d
+from gllib.plot.domain import RingBufferDomain
+from gllib.plot.domain.transformation import SpectrogramDomain
+from gllib.plot.field import Field
+from gllib.plot.color.schemes import ColorMap
+import numpy as np
+
+SAMPLE_RATE = 8000.0
+CHUNK = 256
+NPERSEG = 512
+COLUMNS = 512
+
+color_scheme = ColorMap('IDL_Hardcandy', colorrange=[-100, -20])
+
+def plot_main(plotter):
+    live = RingBufferDomain(2**16, dimension=1)
+    spectrogram = SpectrogramDomain(live, nperseg=NPERSEG, overlap=0.75, columns=COLUMNS, sample_rate=SAMPLE_RATE)
+
+    # time axis: seconds shown by the texture
+    duration = COLUMNS*spectrogram.transformation.step/SAMPLE_RATE
+    plotter.graphs['spectrogram'] = Field(spectrogram,
+        top_left=(0, SAMPLE_RATE/2),
+        bottom_right=(duration, 0),
+        color_scheme=color_scheme)
+
+    state = {'t': 0, 'phase': 0.0}
+    def append(controller):
+        t = (state['t'] + np.arange(CHUNK))/SAMPLE_RATE
+        state['t'] += CHUNK
+        frequency = 1000 + 800*np.sin(0.5*t)
+        phase = state['phase'] + 2*np.pi*np.cumsum(frequency)/SAMPLE_RATE
+        state['phase'] = phase[-1]
+        signal = np.sin(phase) + 0.1*np.random.randn(CHUNK)
+        live.append(signal.astype(np.float32).reshape(-1, 1))
+    plotter.on_pre_cycle.append(append)
+
+plot2d(plot_main, axis=[COLUMNS*NPERSEG/4/SAMPLE_RATE, SAMPLE_RATE/2], origin=[0, 0],
+    title='spectrogram',
+    xlabel='t [s]',
+    ylabel='f [Hz]',
+    colorlegend=color_scheme
+)
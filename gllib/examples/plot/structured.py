@@ -0,0 +1,32 @@
+#-*- coding: utf-8 -*-
+"""
+scatter plot of a StructuredDomain. position and color
+of each point are fields of one numpy structured array
+which is uploaded as one interleaved vbo.
+
+:author: Nicolas 'keksnicoh' Heimann
+"""
+from gllib.plot.domain import StructuredDomain
+from gllib.plot.graph import Line2d
+from gllib.plot.app import plot2d
+
+import numpy as np
+
+def plot_main(plotter):
+    n = 5000
+    points = np.zeros(n, dtype=[
+        ('position', np.float32, (2,)),
+        ('color', np.uint8, (4,)),
+    ])
+    points['position'][:, 0] = np.random.uniform(0, 10, n)
+    points['position'][:, 1] = np.sin(points['position'][:, 0]) + np.random.normal(0, 0.2, n)
+    points['color'][:, 0] = np.linspace(0, 255, n)
+    points['color'][:, 2] = np.linspace(255, 0, n)
+    points['color'][:, 3] = 255
+
+    domain = StructuredDomain(points, normalized=['color'])
+    plotter.graphs['scatter'] = Line2d(domain, draw_lines=False, draw_dots=True, dotsize=2,
+        data_layout=('d0.position.x', 'd0.position.y'),
+        kernel='point_color = d0_color;')
+
+plot2d(plot_main, axis=[10, 4], origin=[0, -2])
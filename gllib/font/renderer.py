@@ -19,6 +19,7 @@ XXX
 from gllib.shader import Shader, Program
 from gllib.helper import load_lib_file, resource_path
 from gllib.vertex import BufferObject
+from gllib.buffer import ALLOCATION_COUNTER
 import os
 import re
 
@@ -580,6 +581,7 @@ class FontRenderer():
             glyphatlas[i] = glyphdata
 
         self.texture_id = glGenTextures(1);
+        ALLOCATION_COUNTER.count('texture')
 
         glBindTexture(GL_TEXTURE_2D_ARRAY, self.texture_id);
         glTexImage3D(GL_TEXTURE_2D_ARRAY, 0, GL_R32F, glypthatlas_width, glyphatlas_height, glyphatlas.shape[0], 0, GL_RED, GL_FLOAT, glyphatlas);
@@ -597,6 +599,7 @@ class FontRenderer():
         # create vbo/vao
         self.buffer = BufferObject.empty(1, dtype=self.CHAR_DTYPE)
         self.vao = glGenVertexArrays(1)
+        ALLOCATION_COUNTER.count('vertex_array')
 
         # bind vao
         glBindVertexArray(self.vao)
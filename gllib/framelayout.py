@@ -27,6 +27,7 @@ class FramelayoutController(Controller):
             frame.screensize = [column.absolute_width, column.absolute_height]
             frame.capture_size = [column.absolute_width, column.absolute_height]
             frame.update_camera(self.camera)
+            column.controller.invalidate()
         self.cycle()
     def prepare(self):
         self._frames = []
@@ -118,16 +119,36 @@ class FramelayoutController(Controller):
 
 
 
+    def needs_render(self):
+        if Controller.needs_render(self):
+            return True
+        return any(column.controller.needs_render() for frame, column in self._frames or [])
+
+    def pre_cycle(self, *args, **kwargs):
+        Controller.pre_cycle(self, *args, **kwargs)
+        for frame, column in self._frames or []:
+            column.controller.idle = self.idle
+            column.controller.pre_cycle()
+
+    def post_cycle(self):
+        for frame, column in self._frames or []:
+            column.controller.post_cycle()
+        Controller.post_cycle(self)
+
     def run(self):
         if not self._prepared:
             self.prepare()
 
         glEnable(GL_BLEND);
         glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA);
-        
+
+        # the frames keep their texture. in idle mode a column
+        # is only rendered again if its scene has changed.
         for frame, column in self._frames:
+            if self.idle and frame.has_captured() and not column.controller.needs_render():
+                continue
             frame.use()
-            column.controller.cycle()
+            column.controller.render_cycle()
             frame.unuse()
         
         for frame, co in self._frames:
@@ -424,6 +424,16 @@ glfwGetWindowUserPointer       = _glfw.glfwGetWindowUserPointer
 glfwPollEvents                 = _glfw.glfwPollEvents
 glfwWaitEvents                 = _glfw.glfwWaitEvents
 
+# glfwWaitEventsTimeout requires glfw 3.2, glfwPostEmptyEvent 3.1.
+# None if the library is older.
+glfwWaitEventsTimeout          = None
+glfwPostEmptyEvent             = None
+if hasattr(_glfw, 'glfwWaitEventsTimeout'):
+    glfwWaitEventsTimeout          = _glfw.glfwWaitEventsTimeout
+    glfwWaitEventsTimeout.argtypes = [c_double]
+if hasattr(_glfw, 'glfwPostEmptyEvent'):
+    glfwPostEmptyEvent             = _glfw.glfwPostEmptyEvent
+
 # --- Input -------------------------------------------------------------------
 glfwGetInputMode               = _glfw.glfwGetInputMode
 glfwSetInputMode               = _glfw.glfwSetInputMode
@@ -0,0 +1,13 @@
+/**
+ * fragment shader for density accumulation. every
+ * fragment counts one hit in the red channel.
+ * @author Nicolas 'keksnicoh' Heimann
+ */
+#version /*{$VERSION$}*/
+
+out             vec4 output_color;
+
+void main()
+{
+    output_color = vec4(1, 0, 0, 1);
+}
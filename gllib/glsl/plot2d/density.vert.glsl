@@ -0,0 +1,22 @@
+/**
+ * vertex shader for density accumulation. each point
+ * (or line vertex) is transformed into camera space,
+ * the fragments are summed up by additive blending.
+ * @author Nicolas 'keksnicoh' Heimann
+ */
+#version /*{$VERSION$}*/
+
+in          vec2 vertex_position;
+
+uniform     mat3 trans;
+
+// cameras of the plotter (see graph.plot_camera_buffer)
+layout (std140) uniform plot_camera {
+    mat4 mat_camera;
+    mat4 mat_outer_camera;
+};
+
+void main() {
+    vec3 d = trans * vec3(vertex_position, 1);
+    gl_Position = mat_camera * vec4(d.xy, 0, 1);
+}
@@ -0,0 +1,42 @@
+/**
+ * density mapping fragment shader. maps the accumulated
+ * counts into [0,1] (linear, log or histogram equalized)
+ * and passes them as fragment_color.r to the color kernel.
+ * need to be precompiled by mustache template language.
+ * @author Nicolas 'keksnicoh' Heimann
+ */
+#version /*{$VERSION$}*/
+
+in vec2 x;
+out vec4 fragment_color;
+uniform sampler2D counts;
+uniform sampler2D equalization;
+uniform int equalization_bins;
+uniform float max_count = 1;
+uniform int scale;
+uniform vec4 color;
+
+{{{UNIFORMS}}}
+{{{FUNCTIONS}}}
+
+void main() {
+    float count = texture(counts, x).r;
+    if (count < 0.5) {
+        discard;
+    }
+
+    float value;
+    if (scale == 0) {
+        value = count/max_count;
+    }
+    else {
+        value = log(1+count)/log(1+max_count);
+        if (scale == 2) {
+            float bin = value*(equalization_bins-1);
+            value = texture(equalization, vec2((bin+0.5)/equalization_bins, 0.5)).r;
+        }
+    }
+
+    fragment_color = vec4(value, 0, 0, 1);
+    {{{COLOR_KERNEL}}};
+}
@@ -0,0 +1,15 @@
+/**
+ * density mapping vertex shader. the plane covers the
+ * whole plot frame so no camera is required.
+ * @author Nicolas 'keksnicoh' Heimann
+ */
+#version /*{$VERSION$}*/
+
+in vec2 vertex_position;
+in vec2 texture_position;
+out vec2 x;
+
+void main() {
+    x = texture_position;
+    gl_Position = vec4(vertex_position, 0, 1);
+}
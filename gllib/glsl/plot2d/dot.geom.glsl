@@ -16,8 +16,11 @@ out             vec2 coord;
 in              vec4 fragment_color[1];
 uniform         vec2 initial_plane_scaling = vec2(1,1);  
 
-uniform mat4 mat_outer_camera;
-uniform         mat4 mat_camera;
+// cameras of the plotter (see graph.plot_camera_buffer)
+layout (std140) uniform plot_camera {
+    mat4 mat_camera;
+    mat4 mat_outer_camera;
+};
 uniform float width;
 
 void main(void)
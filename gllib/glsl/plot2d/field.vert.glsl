@@ -4,9 +4,12 @@ in vec2 vertex_position;
 in vec2 texture_position;
 out vec2 x;
 uniform mat3 mat_domain;
-uniform mat4 mat_outer_camera;
 
-uniform mat4 mat_camera;
+// cameras of the plotter (see graph.plot_camera_buffer)
+layout (std140) uniform plot_camera {
+    mat4 mat_camera;
+    mat4 mat_outer_camera;
+};
 uniform float zoom;
 void main() {
     x = texture_position;
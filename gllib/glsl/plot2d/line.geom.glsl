@@ -15,8 +15,11 @@ out             vec4 color;
 out             vec2 coord;
 in              vec4 fragment_color[4];
 
-uniform         mat4 mat_camera;
-uniform         mat4 mat_outer_camera;
+// cameras of the plotter (see graph.plot_camera_buffer)
+layout (std140) uniform plot_camera {
+    mat4 mat_camera;
+    mat4 mat_outer_camera;
+};
 
 uniform         float width = .25;
 
@@ -0,0 +1,25 @@
+/**
+ * vertex shader for instanced multi series plotting.
+ * each instance is one series. the y values of all series
+ * are read from a buffer texture (series after series),
+ * x is shared by all series.
+ * the line geometry shader transforms into camera space.
+ * @author Nicolas 'keksnicoh' Heimann
+ */
+#version /*{$VERSION$}*/
+
+in          float x_value;
+in          vec4 series_color;
+in          vec2 series_offset;
+in          float series_index;
+
+out         vec4 fragment_color;
+
+uniform     samplerBuffer y_values;
+uniform     int samples;
+
+void main() {
+    float y = texelFetch(y_values, int(series_index)*samples + gl_VertexID).r;
+    fragment_color = series_color;
+    gl_Position = vec4(x_value + series_offset.x, y + series_offset.y, 0, 1);
+}
@@ -1,4 +1,5 @@
 from OpenGL.GL import *
+from gllib.buffer import ALLOCATION_COUNTER
 
 def simple_texture(size, format=GL_RGBA, internalFormat=None, parameters=[
     (GL_TEXTURE_MAG_FILTER, GL_LINEAR),
@@ -9,6 +10,7 @@ def simple_texture(size, format=GL_RGBA, internalFormat=None, parameters=[
     returns its gl_id
     """
     id = glGenTextures(1);
+    ALLOCATION_COUNTER.count('texture')
 
     if internalFormat is None:
         internalFormat = format
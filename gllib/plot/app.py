@@ -21,9 +21,9 @@ class ScreenshotKeyboardHandler():
             im = ImageGrab.grab(bbox=(pos[0] + x_offset, pos[1] + y_offset, size[0] + pos[0] + x_offset, size[1] + pos[1] + y_offset - 4))
             im.save(self.file_name)
 
-def plot2d(f, width=600, height=600, dark=False, screenshot_file_name=None, **kwargs):
+def plot2d(f, width=600, height=600, dark=False, screenshot_file_name=None, idle=False, **kwargs):
     window = GlWindow(width, height, 'plot')
-    app = GlApplication()
+    app = GlApplication(idle=idle)
     app.windows.append(window)
     if not 'color_scheme' in kwargs:
         kwargs['color_scheme']=DEFAULT_COLORS if not dark else BLA_COLORS
@@ -35,9 +35,9 @@ def plot2d(f, width=600, height=600, dark=False, screenshot_file_name=None, **kw
     app.run()
 
 
-def plot2dRows(f, plotters, width=600, height=600, dark=False):
+def plot2dRows(f, plotters, width=600, height=600, dark=False, idle=False):
     window = GlWindow(width, height, '2 cool quads 4 yolo')
-    app = GlApplication()
+    app = GlApplication(idle=idle)
     app.windows.append(window)
     if dark:
         for plotterargs in plotters:
@@ -51,9 +51,9 @@ def plot2dRows(f, plotters, width=600, height=600, dark=False):
 
     app.run()
 
-def plot2dColumns(f, plotters, width=600, height=600, dark=False):
+def plot2dColumns(f, plotters, width=600, height=600, dark=False, idle=False):
     window = GlWindow(width, height, '2 cool quads 4 yolo')
-    app = GlApplication()
+    app = GlApplication(idle=idle)
     app.windows.append(window)
     if dark:
         for plotterargs in plotters:
@@ -72,9 +72,9 @@ def plot2dColumns(f, plotters, width=600, height=600, dark=False):
 
     app.run()
 
-def plot2dCustom(f, plotters, fake=None, width=600, height=600, window_title='', **kwargs):
+def plot2dCustom(f, plotters, fake=None, width=600, height=600, window_title='', idle=False, **kwargs):
     window = GlWindow(width, height, window_title)
-    app = GlApplication()
+    app = GlApplication(idle=idle)
     app.windows.append(window)
 
     controller = FramelayoutController(plotters)
@@ -89,13 +89,13 @@ def plot2dCustom(f, plotters, fake=None, width=600, height=600, window_title='',
 
 
 
-def plot2dMulti(fs, **kwargs):
+def plot2dMulti(fs, idle=False, **kwargs):
 
     windows = []
     for x in xrange(len(fs)):
         windows.append(GlWindow(600, 600, 'Number %d' % x))
 
-    app = GlApplication()
+    app = GlApplication(idle=idle)
 
     plotters = []
     for window in windows:
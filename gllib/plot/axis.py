@@ -4,7 +4,7 @@ from gllib.shader import *
 from gllib.helper import load_lib_file, resource_path
 from OpenGL.GL import *
 from gllib.renderer.font import FontRenderer, AbsoluteLayout, Text
-from gllib.buffer import VertexArray, VertexBuffer
+from gllib.buffer import VertexArray, VertexBuffer, ALLOCATION_COUNTER
 
 from PIL import ImageFont
 import numpy
@@ -57,11 +57,11 @@ class Fixed():
         self.init_shader()
 
     def init_shader(self):
-        self.program = Program()
-        self.program.shaders.append(Shader(GL_VERTEX_SHADER, load_lib_file('glsl/plot2d/axis/marker_y.vert.glsl')))
-        self.program.shaders.append(Shader(GL_GEOMETRY_SHADER, load_lib_file('glsl/plot2d/axis/marker_y.geom.glsl')))
-        self.program.shaders.append(Shader(GL_FRAGMENT_SHADER, load_lib_file('glsl/plot2d/axis/marker.frag.glsl')))
-        self.program.link()
+        self.program = PROGRAMS.program([
+            Shader(GL_VERTEX_SHADER, load_lib_file('glsl/plot2d/axis/marker_y.vert.glsl')),
+            Shader(GL_GEOMETRY_SHADER, load_lib_file('glsl/plot2d/axis/marker_y.geom.glsl')),
+            Shader(GL_FRAGMENT_SHADER, load_lib_file('glsl/plot2d/axis/marker.frag.glsl')),
+        ])
 
         self.program.uniform('color', self.linecolor)
 
@@ -194,15 +194,10 @@ class Scale():
         """
         initializes shader
         """
-        axis_program = Program()
         vertex_shader = Shader(GL_VERTEX_SHADER, load_lib_file('glsl/plot2d/axis/marker_{}.vert.glsl'.format('x' if self._axis == 0 else 'y')))
         geometry_shader = Shader(GL_GEOMETRY_SHADER, load_lib_file('glsl/plot2d/axis/marker_{}.geom.glsl'.format('x' if self._axis == 0 else 'y')))
         fragment_shader = Shader(GL_FRAGMENT_SHADER, load_lib_file('glsl/plot2d/axis/marker.frag.glsl'))
-        axis_program.shaders.append(vertex_shader)
-        axis_program.shaders.append(geometry_shader)
-        axis_program.shaders.append(fragment_shader)
-        axis_program.link()
-        self.axis_program = axis_program
+        self.axis_program = PROGRAMS.program([vertex_shader, geometry_shader, fragment_shader])
 
         self.axis_program.use()
         #self.axis_program.uniform('mat_modelview', numpy.array([1,0,0,0, 0,1,0,0, 0,0,1,0, 0,0,0,1], dtype=numpy.float32))
@@ -295,6 +290,8 @@ class Scale():
 
         self.vao = glGenVertexArrays(1)
         vbo = glGenBuffers(1)
+        ALLOCATION_COUNTER.count('vertex_array')
+        ALLOCATION_COUNTER.count('buffer')
 
         glBindBuffer(GL_ARRAY_BUFFER, vbo)
         glBufferData(GL_ARRAY_BUFFER, ArrayDatatype.arrayByteCount(data), data, GL_STATIC_DRAW)
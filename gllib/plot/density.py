@@ -0,0 +1,350 @@
+#-*- coding: utf-8 -*-
+"""
+density plotting.
+
+draws millions of points (or a long polyline) as density
+image instead of overplotted dots:
+
+    graph = Density2d(NumpyDomain(points), scale='eq_hist',
+        color_scheme=ColorMap('IDL_Hardcandy'))
+
+the hits of all points are accumulated into a float texture
+of the plot frame size by additive blending (one GL_POINTS or
+GL_LINE_STRIP draw without geometry shader). a fullscreen pass
+maps the counts through the color scheme:
+
+  linear    count/max
+  log       log(1+count)/log(1+max)
+  eq_hist   histogram equalized: the fraction of the covered
+            pixels with a lower count (on log scale)
+
+pixels without hits stay transparent. the color scheme gets
+the mapped value in [0,1] as fragment_color.r (like Field),
+by default the graph color is faded by the value.
+
+the accumulation is cached and only repeated when the view,
+the frame size or the domain data changes. the maximum and the
+histogram are computed from an asynchronous readback (see
+buffer.READBACK) of the counts, so after a view change the
+previous normalization is used until the readback arrives.
+
+:author: Nicolas 'keksnicoh' Heimann
+"""
+from gllib.shader import Shader, PROGRAMS
+from gllib.buffer import VertexArray, VertexBuffer, READBACK, ALLOCATION_COUNTER
+from gllib.helper import load_lib_file
+from gllib.application import GlApplication
+
+import pystache
+
+import numpy as np
+from OpenGL.GL import *
+from ctypes import c_void_p
+
+SCALES = {
+    'linear': 0,
+    'log': 1,
+    'eq_hist': 2,
+}
+
+class Density2d():
+    """
+    density plot of a 2d domain. mode is 'points' or 'lines'.
+    """
+    EQUALIZATION_BINS = 1024
+    COLOR_KERNEL = 'fragment_color = vec4(color.rgb, color.a*fragment_color.r);'
+
+    def __init__(self, domain, mode='points', scale='eq_hist', color_scheme=None, color=None, label=None):
+        if mode not in ('points', 'lines'):
+            raise ValueError('mode must be either "points" or "lines", given mode is "{}"'.format(mode))
+        if scale not in SCALES:
+            raise ValueError('unknown scale "{}". available scales: {}'.format(scale, ', '.join(SCALES)))
+        if domain.dimension != 2:
+            raise ValueError('Density2d requires a domain of dimension 2, given dimension is {}'.format(
+                domain.dimension))
+
+        self.domain = domain
+        self.mode = mode
+        self.scale = scale
+        self.color_scheme = color_scheme or Density2d.COLOR_KERNEL
+        self.color = color
+        self.label = label
+        self.draw_lines = mode == 'lines'
+        self.draw_dots = mode == 'points'
+        self.initialized = False
+        self.program = None
+        self.map_program = None
+        self.max_count = None
+        # accumulation texture, its framebuffer and
+        # the pixel pack buffer of the readback
+        self._counts_texture = None
+        self._equalization_texture = None
+        self._framebuffer_id = None
+        self._pack_buffer = None
+        self._frame_size = None
+        self._vertex_arrays = {}
+        self._plane = None
+        self._plot_cam = None
+        self._transformation = None
+        # the accumulation is repeated when the key changes.
+        # generation counts the accumulations.
+        self._key = None
+        self._generation = 0
+        self._statistics_generation = 0
+        self._readback = None
+
+    def init(self):
+        """
+        creates the programs, the textures and the framebuffer
+        """
+        self._compile_glsl_programs()
+
+        self._counts_texture = self._create_texture()
+        self._equalization_texture = self._create_texture(GL_LINEAR)
+        glBindTexture(GL_TEXTURE_2D, self._equalization_texture)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_R32F, self.EQUALIZATION_BINS, 1, 0, GL_RED, GL_FLOAT,
+            np.linspace(0, 1, self.EQUALIZATION_BINS).astype(np.float32))
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+        self._framebuffer_id = glGenFramebuffers(1)
+        ALLOCATION_COUNTER.count('framebuffer')
+        self._pack_buffer = glGenBuffers(1)
+        ALLOCATION_COUNTER.count('buffer')
+
+        # fullscreen plane of the mapping pass
+        self._plane = VertexArray({
+            'vertex_position': VertexBuffer.from_numpy(np.array([
+                -1, 1, -1, -1, 1, -1, 1, -1, 1, 1, -1, 1], dtype=np.float32).reshape(6, 2)),
+            'texture_position': VertexBuffer.from_numpy(np.array([
+                0, 1, 0, 0, 1, 0, 1, 0, 1, 1, 0, 1], dtype=np.float32).reshape(6, 2)),
+        }, self.map_program.attributes)
+
+        self.map_program.uniform('counts', 0)
+        self.map_program.uniform('equalization', 1)
+        self.map_program.uniform('equalization_bins', self.EQUALIZATION_BINS)
+        self.map_program.uniform('scale', SCALES[self.scale])
+        self.map_program.uniform('color', self.color or [0,0,0,1])
+        self._update_color_scheme()
+        self.initialized = True
+
+    def _create_texture(self, texture_filter=GL_NEAREST):
+        texture = glGenTextures(1)
+        ALLOCATION_COUNTER.count('texture')
+        glBindTexture(GL_TEXTURE_2D, texture)
+        glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, texture_filter)
+        glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, texture_filter)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        return texture
+
+    def _compile_glsl_programs(self):
+        glsl_functions = ''
+        if hasattr(self.color_scheme, 'glsl_functions'):
+            glsl_functions += '\n/*COLOR_SCHEME FUNCTIONS*/\n'
+            glsl_functions += self.color_scheme.glsl_functions
+
+        glsl_uniforms = []
+        if hasattr(self.color_scheme, 'glsl_uniforms'):
+            glsl_uniforms.append('/*COLOR_SCHEME UNIFORMS*/')
+            glsl_uniforms += ['uniform {} {};'.format(t, n) for t, n in self.color_scheme.glsl_uniforms]
+
+        frag_src = pystache.render(load_lib_file('glsl/plot2d/density_map.frag.glsl'), {
+            'UNIFORMS'    : '\n'.join(glsl_uniforms),
+            'FUNCTIONS'   : glsl_functions,
+            'COLOR_KERNEL': str(self.color_scheme),
+        })
+
+        self.program = PROGRAMS.program([
+            Shader(GL_VERTEX_SHADER, load_lib_file('glsl/plot2d/density.vert.glsl')),
+            Shader(GL_FRAGMENT_SHADER, load_lib_file('glsl/plot2d/density.frag.glsl')),
+        ])
+        self.map_program = PROGRAMS.program([
+            Shader(GL_VERTEX_SHADER, load_lib_file('glsl/plot2d/density_map.vert.glsl')),
+            Shader(GL_FRAGMENT_SHADER, frag_src),
+        ])
+
+    def _update_color_scheme(self):
+        if hasattr(self.color_scheme, 'get_uniform_data'):
+            for uniform in self.color_scheme.get_uniform_data().items():
+                self.map_program.uniform(*uniform)
+
+    def update_plotmeta(self, plot_cam, outer_cam, axis, origin):
+        self._plot_cam = np.asarray(plot_cam, dtype=np.float32)
+        self._transformation = np.asarray(self.domain.get_transformation_matrix(
+            axis=(axis[0], axis[1]),
+            origin=(origin[0], origin[1]),
+        ), dtype=np.float32)
+        # the camera is set by the plot_camera uniform block,
+        # plot_cam is only part of the accumulation key.
+        self.program.uniform('trans', self._transformation)
+        self._update_color_scheme()
+
+    def has_pending_updates(self):
+        return (self._readback is not None
+            or self._statistics_generation != self._generation
+            or (hasattr(self.domain, 'has_pending_updates') and self.domain.has_pending_updates()))
+
+    def _accumulation_key(self):
+        """
+        everything the accumulated counts depend on
+        """
+        return (
+            self._plot_cam.tobytes() if self._plot_cam is not None else None,
+            self._transformation.tobytes() if self._transformation is not None else None,
+            self._frame_size,
+            self.domain.gl_vbo_id,
+            self.domain.offset,
+            len(self.domain),
+            getattr(self.domain, 'version', None),
+        )
+
+    def _vertex_array(self):
+        """
+        vao of the current domain vbo (domains may switch their vbo)
+        """
+        gl_vbo_id = self.domain.gl_vbo_id
+        if gl_vbo_id not in self._vertex_arrays:
+            self._vertex_arrays[gl_vbo_id] = VertexArray({
+                'vertex_position': VertexBuffer(
+                    dimension=2,
+                    gl_vbo_id=gl_vbo_id,
+                    dtype=getattr(self.domain, 'dtype', np.float32),
+                    normalized=getattr(self.domain, 'normalized', False)),
+            }, self.program.attributes)
+        return self._vertex_arrays[gl_vbo_id]
+
+    def _resize(self, frame_size):
+        """
+        reallocates the counts and the pack buffer for a new
+        frame size. the gl objects are kept.
+        """
+        width, height = frame_size
+        glBindTexture(GL_TEXTURE_2D, self._counts_texture)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_R32F, width, height, 0, GL_RED, GL_FLOAT, None)
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, self._framebuffer_id)
+        glFramebufferTexture2D(GL_DRAW_FRAMEBUFFER, GL_COLOR_ATTACHMENT0, GL_TEXTURE_2D, self._counts_texture, 0)
+        self._bind_active_framebuffer()
+
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self._pack_buffer)
+        glBufferData(GL_PIXEL_PACK_BUFFER, 4*width*height, None, GL_STREAM_READ)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        self._frame_size = (width, height)
+
+    def _bind_active_framebuffer(self):
+        if len(GlApplication.GL__ACTIVE_FRAMEBUFFER):
+            glBindFramebuffer(GL_DRAW_FRAMEBUFFER, GlApplication.GL__ACTIVE_FRAMEBUFFER[-1])
+        else:
+            glBindFramebuffer(GL_DRAW_FRAMEBUFFER, 0)
+
+    def _accumulate(self):
+        """
+        sums up the hits of all points into the counts texture
+        """
+        viewport = glGetIntegerv(GL_VIEWPORT)
+        clear_value = glGetFloatv(GL_COLOR_CLEAR_VALUE)
+
+        glBindFramebuffer(GL_DRAW_FRAMEBUFFER, self._framebuffer_id)
+        glViewport(0, 0, *self._frame_size)
+        glClearColor(0, 0, 0, 0)
+        glClear(GL_COLOR_BUFFER_BIT)
+
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_ONE, GL_ONE)
+        self.program.use()
+        vertex_array = self._vertex_array()
+        vertex_array.bind()
+        glDrawArrays(GL_POINTS if self.mode == 'points' else GL_LINE_STRIP, self.domain.offset, len(self.domain))
+        vertex_array.unbind()
+        self.program.unuse()
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+
+        self._bind_active_framebuffer()
+        glViewport(*viewport)
+        glClearColor(*clear_value)
+        self._generation += 1
+
+    def _read_counts(self):
+        """
+        packs the counts into the pack buffer and returns
+        a ReadbackFuture of them
+        """
+        width, height = self._frame_size
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, self._framebuffer_id)
+        glReadBuffer(GL_COLOR_ATTACHMENT0)
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, self._pack_buffer)
+        glReadPixels(0, 0, width, height, GL_RED, GL_FLOAT, c_void_p(0))
+        glBindBuffer(GL_PIXEL_PACK_BUFFER, 0)
+        glBindFramebuffer(GL_READ_FRAMEBUFFER, 0)
+        return READBACK.read(self._pack_buffer, 4*width*height, np.float32, (height, width))
+
+    def _update_statistics(self):
+        """
+        applies a finished readback and requests a new one if
+        the counts have changed since. the first statistics are
+        awaited since there is no normalization yet.
+        """
+        if self._readback is not None:
+            generation, future = self._readback
+            if not future.done() and self.max_count is not None:
+                return
+            self._readback = None
+            self._apply_statistics(future.result())
+            self._statistics_generation = generation
+
+        if self._statistics_generation != self._generation:
+            self._readback = (self._generation, self._read_counts())
+            if self.max_count is None:
+                self._update_statistics()
+
+    def _apply_statistics(self, counts):
+        hits = counts[counts > 0.5]
+        self.max_count = float(hits.max()) if len(hits) else 1.0
+        self.map_program.uniform('max_count', self.max_count)
+
+        if self.scale == 'eq_hist' and len(hits):
+            glBindTexture(GL_TEXTURE_2D, self._equalization_texture)
+            glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, self.EQUALIZATION_BINS, 1, GL_RED, GL_FLOAT,
+                equalization(hits, self.max_count, self.EQUALIZATION_BINS))
+            glBindTexture(GL_TEXTURE_2D, 0)
+
+    def render(self, plotter):
+        if not self.initialized:
+            self.init()
+
+        frame_size = tuple(plotter.plotframe_size)
+        if frame_size != self._frame_size:
+            self._resize(frame_size)
+
+        key = self._accumulation_key()
+        if key != self._key:
+            self._accumulate()
+            self._key = key
+        self._update_statistics()
+
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_2D, self._counts_texture)
+        glActiveTexture(GL_TEXTURE1)
+        glBindTexture(GL_TEXTURE_2D, self._equalization_texture)
+
+        self.map_program.use()
+        self._plane.bind()
+        glDrawArrays(GL_TRIANGLES, 0, 6)
+        self._plane.unbind()
+        self.map_program.unuse()
+
+        glBindTexture(GL_TEXTURE_2D, 0)
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+def equalization(hits, max_count, bins):
+    """
+    histogram equalization table of the counts hits > 0.
+    bin k stands for the count expm1(k/(bins-1)*log1p(max_count)),
+    its value is the fraction of hits with a count not above it.
+    """
+    position = np.log1p(hits)/np.log1p(max_count)*(bins-1)
+    histogram = np.bincount(np.minimum(np.ceil(position - 1e-6).astype(np.int64), bins-1), minlength=bins)
+    return (np.cumsum(histogram)/float(len(hits))).astype(np.float32)
@@ -31,13 +31,41 @@ from OpenGL.GL import *
 import numpy 
 from gllib.util import Event
 from gllib import texture
-from gllib.buffer import VertexBuffer
+from gllib.buffer import VertexBuffer, READBACK, ALLOCATION_COUNTER, STREAM_ORPHAN, STREAM_ROUND_ROBIN
+from gllib.plot.domain.lod import MinMaxPyramid
+from common.file_handler import load_data_file
 import numpy as np
+import threading
+import bisect
+from collections import OrderedDict
 
 def interval(a, b, steps):
     return NumpyDomain(np.arange(a, b, steps, dtype=np.float32))
 
 
+def _row_range(index, n):
+    """
+    returns the range [start, stop) of rows which are
+    affected by a numpy row index.
+    """
+    row_index = index[0] if type(index) is tuple else index
+    if type(row_index) is slice:
+        start, stop, step = row_index.indices(n)
+        if step < 0:
+            start, stop = stop+1, start+1
+        return start, stop
+    if np.isscalar(row_index):
+        start = int(row_index) % n
+        return start, start + 1
+
+    rows = np.asarray(row_index)
+    if rows.dtype == np.bool_:
+        rows = np.nonzero(rows)[0]
+    if not rows.size:
+        return 0, 0
+    rows = rows % n
+    return int(rows.min()), int(rows.max())+1
+
 class Domain():
     # XXX
     # - REFACTOR OLD API METHODS 
@@ -48,6 +76,7 @@ class Domain():
             shape = (shape, 1)
             
         vbo = glGenBuffers(1)
+        ALLOCATION_COUNTER.count('buffer')
         glBindBuffer(GL_ARRAY_BUFFER, vbo)
         glBufferData(GL_ARRAY_BUFFER, 4*shape[0]*shape[1], None, GL_STATIC_DRAW)
         glBindBuffer(GL_ARRAY_BUFFER, 0)
@@ -79,7 +108,8 @@ class Domain():
     def pull_data(self, offset=0, length=None):
         # XXX
         # - offset
-        bytes_per_vertex = self.dimension*4
+        dtype = np.dtype(getattr(self, 'dtype', np.float32))
+        bytes_per_vertex = self.dimension*dtype.itemsize
         max_length = len(self) - self.offset
         if length is None:
             length = max_length 
@@ -92,7 +122,24 @@ class Domain():
         data = glGetBufferSubData(GL_ARRAY_BUFFER, 0, size)
         glBindBuffer(GL_ARRAY_BUFFER, 0)
         
-        return data.view('<f4').reshape((length, self.dimension))
+        return data.view(dtype.newbyteorder('<')).reshape((length, self.dimension))
+
+    def pull_data_async(self, offset=0, length=None):
+        """
+        like pull_data but returns a gllib.buffer.ReadbackFuture
+        which resolves when the gpu has copied the data into a
+        staging buffer. see gllib.buffer.AsyncReadback
+        """
+        dtype = np.dtype(getattr(self, 'dtype', np.float32))
+        bytes_per_vertex = self.dimension*dtype.itemsize
+        max_length = len(self) - offset
+        if length is None:
+            length = max_length
+        else:
+            length = min(length, max_length)
+
+        return READBACK.read(self.gl_vbo_id, length*bytes_per_vertex,
+            dtype.newbyteorder('<'), (length, self.dimension), offset=offset*bytes_per_vertex)
 
 
 class FieldDomain():
@@ -154,7 +201,28 @@ class FieldDomain():
         return numpy.identity(3).flatten()
 
 class RealAxis(object):
-    def __init__(self, axis='x', interval=(0,1)):
+    """
+    samples of an interval which a glsl kernel is evaluated at.
+    the transformation matrix stretches the interval over the
+    visible region of the plot.
+
+    the number of samples follows the plot frame: samples_per_pixel
+    samples for each pixel along the axis (see update_frame). an
+    explicit length fixes the number of samples.
+
+    with refine=True the graph evaluates the kernel at the uniform
+    samples by transform feedback whenever the view changes and
+    passes the positions to apply_refinement(). samples are inserted
+    into the intervals where the polyline deviates more than tolerance
+    pixels from the curve (estimated by the second differences), at
+    most max_refine samples per interval.
+
+        Line2d(RealAxis(refine=True), kernel='y=sin(50*x);')
+    """
+    DEFAULT_LENGTH = 1000
+
+    def __init__(self, axis='x', interval=(0,1), length=None, samples_per_pixel=2,
+        max_length=2**20, refine=False, tolerance=0.5, max_refine=16):
         self.axis = axis
         self.interval = interval
         self._data = None
@@ -164,6 +232,21 @@ class RealAxis(object):
         self._vbo = None
         self._initialized = False
 
+        self._fixed_length = length
+        self.samples_per_pixel = samples_per_pixel
+        self.max_length = max_length
+        self.refine = refine
+        self.tolerance = tolerance
+        self.max_refine = max_refine
+
+        # number of uniform samples before refinement
+        self.base_length = None
+        self._view = None
+        # incremented on each new uniform sampling. a refinement
+        # of an older generation is outdated.
+        self._generation = 0
+        self._refine_pending = False
+
     def gl_init(self):
         if not self._initialized:
             self._init_data()
@@ -174,16 +257,108 @@ class RealAxis(object):
         """
         initialized numpy data
         """
-        data = np.arange(0, 1, 0.001, dtype=np.float32)
-        self.length = len(data)
-        self._data = data.reshape((self.length,1))
+        self._set_samples(self.uniform_samples(self._fixed_length or self.DEFAULT_LENGTH))
 
     def _init_vbo(self):
         """
         initialized vbo
         """
         self._vbo = VertexBuffer.from_numpy(self._data)
-    
+
+    def _set_samples(self, samples):
+        self.length = len(samples)
+        self._data = samples.astype(np.float32).reshape((self.length,1))
+        if self._vbo is not None:
+            self._vbo.buffer_data(self._data)
+
+    def sample_count(self, pixels):
+        """
+        number of uniform samples for a plot frame
+        with pixels along the axis
+        """
+        if self._fixed_length is not None:
+            return self._fixed_length
+        if not pixels:
+            return self.DEFAULT_LENGTH
+        return int(min(self.max_length, max(2, np.ceil(pixels*self.samples_per_pixel)+1)))
+
+    def uniform_samples(self, length):
+        return np.linspace(self.interval[0], self.interval[1], length)
+
+    def update_frame(self, frame_size, view):
+        """
+        resamples the interval if the plot frame was resized. with
+        refine=True any change of view (axis, origin) requests
+        a new refinement.
+        """
+        if not self._initialized:
+            return
+
+        pixels = frame_size[1] if self.axis == 'y' else frame_size[0]
+        length = self.sample_count(pixels)
+        if length == self.base_length and (not self.refine or view == self._view):
+            return
+
+        self._view = view
+        self.base_length = length
+        self._generation += 1
+        self._set_samples(self.uniform_samples(length))
+        self._refine_pending = self.refine
+
+    def refinement_request(self):
+        """
+        returns the generation of the uniform samples if they
+        wait for a refinement, None otherwise.
+        """
+        if not self._refine_pending:
+            return None
+        self._refine_pending = False
+        return self._generation
+
+    def refine_samples(self, positions):
+        """
+        inserts samples where the polyline through positions
+        (in pixels, one row for each uniform sample) deviates from
+        the curve. the chord error of an interval is about |P0-2P1+P2|/8
+        (P0, P1, P2 consecutive positions), k extra samples divide it
+        by (k+1)**2.
+        """
+        samples = self.uniform_samples(len(positions))
+        if len(positions) < 3:
+            return samples
+
+        second = positions[:-2] - 2*positions[1:-1] + positions[2:]
+        deviation = np.sqrt(np.sum(second*second, axis=1))/8
+        deviation[~np.isfinite(deviation)] = 0
+
+        # each interval takes the larger estimate of its neighbouring triples
+        error = np.zeros(len(positions)-1)
+        error[:-1] = deviation
+        error[1:] = np.maximum(error[1:], deviation)
+
+        extra = np.clip(np.ceil(np.sqrt(error/self.tolerance)) - 1, 0, self.max_refine).astype(np.int64)
+        budget = self.max_length - len(samples)
+        if extra.sum() > budget:
+            extra = np.floor(extra*float(max(0, budget))/extra.sum()).astype(np.int64)
+
+        counts = extra + 1
+        interval = np.repeat(np.arange(len(counts)), counts)
+        step = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        refined = samples[interval] + (samples[interval+1] - samples[interval])*step/counts[interval]
+        return np.append(refined, samples[-1])
+
+    def apply_refinement(self, generation, positions, units_per_pixel):
+        """
+        applies a refinement. positions are the kernel outputs
+        (x, y, 0, c) at the uniform samples of generation. the
+        last component is the color value, not a homogeneous w.
+        """
+        if generation != self._generation or len(positions) != self.base_length:
+            return
+
+        xy = np.asarray(positions, dtype=np.float64)[:, 0:2]
+        self._set_samples(self.refine_samples(xy/np.asarray(units_per_pixel, dtype=np.float64)))
+
     def get_transformation_matrix(self, axis, origin):
         """
         returns a matrix which transforms the domain 
@@ -217,6 +392,9 @@ class RealAxis(object):
     def pull_data(self):
         return Domain.pull_data(self)
 
+    def pull_data_async(self, offset=0, length=None):
+        return Domain.pull_data_async(self, offset, length)
+
 class NumpyDomain(Domain, object):
     """
     connect numpy array with opengl vbo
@@ -237,10 +415,57 @@ class NumpyDomain(Domain, object):
         # now the data was trasmitted to vbo
         # directly. 
 
+        domain.update(slice(10, 20), new_rows)
+        # only rows 10..19 are marked dirty. all dirty
+        # ranges are coalesced and uploaded once per
+        # frame by glBufferSubData.
+
+    level of detail: if lod=True the domain builds a min/max
+    decimation pyramid (see lod.MinMaxPyramid) in a background
+    thread. Line2d tells the domain which x-range is visible
+    and how many pixels the plot frame has. the domain then
+    switches to the coarsest level which still has about two
+    verticies per pixel. lod requires a sorted x-component
+    in d0.x and the y-component in d0.y.
+
+    ..code:
+        domain = NumpyDomain(fifty_million_samples, lod=True)
+
+    streaming: domains which are rewritten every frame can use
+    a streaming vbo (see gllib.buffer.VertexBuffer) to avoid
+    stalls on pending draws. Line2d keeps one vao per vbo so
+    switching buffers does not rebuild anything.
+
+    ..code:
+        domain = NumpyDomain(data, streaming=STREAM_ROUND_ROBIN)
+
+    integer samples: data may have any dtype of SUPPORTED_DTYPES.
+    the raw integers are uploaded as they are and converted by
+    glVertexAttribPointer. the physical value of a component is
+    raw*scale + value_offset which is applied by the trans_d
+    matrix in the vertex shader (see get_transformation_matrix).
+    scale and value_offset are scalars or one value per component.
+
+    ..code:
+        # 16bit adc with 0.5mV per digit, x in samples
+        domain = NumpyDomain(adc_int16, scale=(1.0, 0.0005))
+
     """
-    def __init__(self, data):
+    SUPPORTED_DTYPES = (np.float32, np.int16, np.uint16, np.int8, np.uint8)
+
+    def __init__(self, data, lod=False, streaming=None, scale=1.0, value_offset=0.0, normalized=False):
+        self.streaming = streaming
+        self.normalized = normalized
         self._vbo = None
-        
+        self._lod = None
+        self._lod_vbos = {}
+        self._lod_view_version = None
+        self.lod_level = 0
+        # incremented on each data change. caches like the
+        # sorted x-index are only valid for one version.
+        self.version = 0
+        self._x_index = None
+
         if len(data.shape) < 2:
             data = data.reshape((len(data),1))
 
@@ -248,37 +473,209 @@ class NumpyDomain(Domain, object):
         self.length = None
         self.offset = 0
 
+        self.scale = np.ones(self.dimension)*scale
+        self.value_offset = np.zeros(self.dimension)+value_offset
+        if self.dimension > 3 and np.any(self.value_offset != 0):
+            raise ValueError('value_offset requires domain dimension <= 3, given dimension is {}'.format(
+                self.dimension))
+
+        if lod:
+            if self.dimension < 2:
+                raise ValueError('lod requires domain dimension >= 2, given dimension is {}'.format(
+                    self.dimension))
+            self._lod = MinMaxPyramid(self._data)
+            self._lod.build_async()
+
+    @classmethod
+    def from_file(cls, file_path, dimension=2, cache=True, skip_header=0, **kwargs):
+        """
+        domain of a csv or mathematica export. the numbers are
+        read by common.file_handler.load_data_file, with cache=True
+        the data is a read only memory map of the .npy sidecar.
+
+        ..code:
+            domain = NumpyDomain.from_file('measurement.csv', lod=True)
+        """
+        return cls(load_data_file(file_path, dimension=dimension, cache=cache, skip_header=skip_header), **kwargs)
+
     @property
     def data(self):
         return self._data 
 
     def __len__(self):
+        if self.lod_level > 0:
+            return self._lod_vbos[self.lod_level][1].length
         return self.length or self._data.shape[0]
 
     @data.setter 
     def data(self, data):
-        if data.dtype != numpy.float32:
+        if data.dtype not in self.SUPPORTED_DTYPES:
             raise Exception(
-                'domain data has dtype={} but must have dtype=float32.'.format(
-                    data.dtype
+                'domain data has dtype={} but must have one of dtype={}.'.format(
+                    data.dtype, ', '.join(np.dtype(t).name for t in self.SUPPORTED_DTYPES)
                 )
             )
+        if self._vbo is not None and data.dtype != self._vbo.dtype:
+            raise ValueError('cannot change dtype {} of an initialized domain to {}'.format(
+                self._vbo.dtype, data.dtype))
         self._data = data
+        self.version += 1
         if self._vbo is not None: 
             self._vbo.buffer_data(self._data)
+        if self._lod is not None:
+            self._lod.data = data
+            self._lod.build_async()
 
     @property
     def dimension(self):
         return self._data.shape[1]
 
+    @property
+    def dtype(self):
+        return self._data.dtype
+
+    @property
+    def lod(self):
+        return self._lod
+
+    def get_transformation_matrix(self, axis, origin):
+        """
+        maps raw components to physical values:
+        raw*scale + value_offset
+        """
+        dim = self.dimension
+        if dim > 3:
+            return np.diag(self.scale[:4]).astype(np.float32).flatten()
+
+        matrix = np.identity(dim+1, dtype=np.float32)
+        matrix[:dim, :dim] = np.diag(self.scale)
+        matrix[:dim, dim] = self.value_offset
+        # column major
+        return matrix.T.flatten()
+
+    def _raw_x_range(self, x_range):
+        """
+        transforms a physical x-range into raw x values
+        """
+        raw = sorted((float(x) - self.value_offset[0])/self.scale[0] for x in x_range)
+        if self.normalized and self.dtype != np.float32:
+            # normalized integers are mapped to [0,1] or [-1,1]
+            raw = [x*np.iinfo(self.dtype).max for x in raw]
+        return raw
+
     @property
     def gl_vbo_id(self):
+        if self.lod_level > 0:
+            return self._lod_vbos[self.lod_level][1].gl_vbo_id
         if self._vbo is None: 
             self._init_vbo()
+        self._vbo.flush()
         return self._vbo.gl_vbo_id
 
+    def update_view(self, x_range, pixel_width):
+        """
+        chooses the lod level for the visible x_range. 
+        levels are uploaded lazy when they are required
+        the first time or when the pyramid was rebuild.
+        while the pyramid is building the last uploaded
+        level stays active.
+        """
+        if self._lod is None or pixel_width is None or self._lod.is_dirty():
+            return
+
+        self._lod_view_version = self._lod.version
+        data = self._data
+        span = abs(float(data[-1][0]) - float(data[0][0])) if data.shape[0] > 1 else 0
+        if span == 0:
+            return
+
+        x_range = self._raw_x_range(x_range)
+        visible_samples = data.shape[0]*float(x_range[1]-x_range[0])/span
+        level = self._lod.choose_level(visible_samples, pixel_width)
+        if level > 0:
+            version, vbo = self._lod_vbos.get(level, (None, None))
+            if version != self._lod.version:
+                level_data = self._lod.get_level(level)
+                if vbo is None:
+                    vbo = VertexBuffer.from_numpy(level_data, normalized=self.normalized)
+                else:
+                    vbo.length = level_data.shape[0]
+                    vbo.buffer_data(level_data)
+                self._lod_vbos[level] = (self._lod.version, vbo)
+
+        self.lod_level = level
+
+    def get_visible_range(self, x_range):
+        """
+        returns the (first, stop) vertex range of the current
+        vbo which covers x_range, including two verticies on each
+        side so the adjacency geometry still draws the segments
+        crossing the borders. returns None if the x-component
+        is not sorted.
+        """
+        x = self._get_x_index()
+        if x is None:
+            return None
+
+        x_range = self._raw_x_range(x_range)
+        first = np.searchsorted(x, x_range[0], side='left')
+        stop = np.searchsorted(x, x_range[1], side='right')
+        return max(0, int(first)-2), min(x.shape[0], int(stop)+2)
+
+    def _get_x_index(self):
+        """
+        contiguous copy of the sorted x-component of the current
+        vbo data. sortedness is checked once per data version.
+        """
+        key = (self.version, self.lod_level,
+            self._lod_vbos[self.lod_level][0] if self.lod_level > 0 else None)
+        if self._x_index is not None and self._x_index[0] == key:
+            return self._x_index[1]
+
+        if self._x_index is not None and self._x_index[0][0] == self.version and self._x_index[1] is None:
+            # raw data is not sorted. neither are its lod levels.
+            return None
+
+        data = self._data if self.lod_level == 0 else self._lod_vbos[self.lod_level][1].data
+        x = np.ascontiguousarray(data[:, 0])
+        if x.shape[0] > 1 and not np.all(x[1:] >= x[:-1]):
+            x = None
+        self._x_index = (key, x)
+        return x
+
+    def has_pending_updates(self):
+        """
+        a finished pyramid build was not taken into account yet
+        """
+        return self._lod is not None and not self._lod.is_dirty() \
+            and self._lod.version != self._lod_view_version
+
+    def update(self, index, values):
+        """
+        assigns values to data[index] and marks the
+        affected rows dirty. index can be anything numpy
+        accepts as row index (int, slice, index array, mask).
+        """
+        self._data[index] = values
+        self.mark_dirty(*_row_range(index, self._data.shape[0]))
+
+    def mark_dirty(self, start, stop):
+        """
+        marks rows [start, stop) as modified after data was
+        changed inplace. the rows are uploaded on the next
+        access of gl_vbo_id.
+        """
+        if stop <= start:
+            return
+        self.version += 1
+        if self._vbo is not None:
+            self._vbo.mark_dirty(start, stop)
+        if self._lod is not None:
+            self._lod.invalidate(start, stop)
+            self._lod.build_async()
+
     def _init_vbo(self):
-        self._vbo = VertexBuffer.from_numpy(self._data)
+        self._vbo = VertexBuffer.from_numpy(self._data, streaming=self.streaming, normalized=self.normalized)
          
 
     def pull_data(self):
@@ -287,3 +684,632 @@ class NumpyDomain(Domain, object):
 
 
 
+
+
+class StructuredDomain(Domain, object):
+    """
+    domain of a numpy structured array which is uploaded as one
+    interleaved vbo. each field is a vertex attribute (see
+    VertexBuffer.field) so a scatter with position, size and
+    color needs one vbo and one upload.
+
+    Line2d addresses the fields in its data_layout as
+    d<i>.<field> or d<i>.<field>.<xyzw> and declares the glsl
+    variables d<i>_<field> which may be used in kernels.
+
+    ..code:
+        points = np.zeros(n, dtype=[
+            ('position', np.float32, (2,)),
+            ('size', np.float32),
+            ('color', np.uint8, (4,)),
+        ])
+        domain = StructuredDomain(points, normalized=['color'])
+        graph = Line2d(domain, draw_lines=False, draw_dots=True,
+            data_layout=('d0.position.x', 'd0.position.y'),
+            kernel='point_color = d0_color')
+
+    fields must have a dtype of GL_TYPES and at most 4 components.
+    fields listed in normalized are mapped to [0,1] (unsigned) or
+    [-1,1] (signed) by the gpu.
+    """
+    def __init__(self, data, streaming=None, normalized=()):
+        if data.dtype.fields is None:
+            raise ValueError('StructuredDomain requires a structured dtype, given dtype is {}'.format(data.dtype))
+
+        self.streaming = streaming
+        self.normalized = tuple(normalized)
+        self.offset = 0
+        self.length = None
+        self.version = 0
+        self._vbo = None
+        self.data = data
+
+        for name in self.normalized:
+            if name not in data.dtype.fields:
+                raise ValueError('unknown normalized field "{}". fields: {}'.format(
+                    name, ', '.join(data.dtype.names)))
+
+    @property
+    def data(self):
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        data = data.reshape(-1)
+        if self._vbo is not None and data.dtype != self._vbo.dtype:
+            raise ValueError('cannot change dtype {} of an initialized domain to {}'.format(
+                self._vbo.dtype, data.dtype))
+        self._data = data
+        self.version += 1
+        if self._vbo is not None:
+            self._vbo.buffer_data(self._data)
+
+    def __len__(self):
+        return self.length or self._data.shape[0]
+
+    @property
+    def dimension(self):
+        return 1
+
+    @property
+    def dtype(self):
+        return self._data.dtype
+
+    @property
+    def fields(self):
+        """
+        list of (name, number of components)
+        """
+        fields = []
+        for name in self._data.dtype.names:
+            shape = self._data.dtype.fields[name][0].shape
+            fields.append((name, int(np.prod(shape)) if shape else 1))
+        return fields
+
+    @property
+    def gl_vbo_id(self):
+        if self._vbo is None:
+            self._vbo = VertexBuffer.from_numpy(self._data, streaming=self.streaming)
+        self._vbo.flush()
+        return self._vbo.gl_vbo_id
+
+    def get_attribute_buffers(self, gl_vbo_id=None):
+        """
+        list of (field name, VertexBuffer) of the
+        interleaved vbo gl_vbo_id.
+        """
+        buffer = VertexBuffer(len(self), 1,
+            gl_vbo_id=self.gl_vbo_id if gl_vbo_id is None else gl_vbo_id,
+            dtype=self._data.dtype)
+        return [(name, buffer.field(name, normalized=name in self.normalized))
+            for name, _ in self.fields]
+
+    def update(self, index, values, field=None):
+        """
+        assigns values to data[index] (or data[field][index])
+        and marks the affected records dirty.
+        """
+        if field is None:
+            self._data[index] = values
+        else:
+            self._data[field][index] = values
+        self.mark_dirty(*_row_range(index, self._data.shape[0]))
+
+    def mark_dirty(self, start, stop):
+        if stop <= start:
+            return
+        self.version += 1
+        if self._vbo is not None:
+            self._vbo.mark_dirty(start, stop)
+
+    def pull_data(self, offset=0, length=None):
+        return Domain.pull_data(self, offset, length).reshape(-1)
+
+class RingBufferDomain(Domain, object):
+    """
+    fixed capacity domain for live acquisition.
+
+    append() writes new samples behind the newest sample and
+    wraps around at capacity. only the new bytes are uploaded
+    by glBufferSubData so the upload cost per frame is
+    proportional to the new data and not to the history.
+
+    the vbo holds ADJACENCY_PADDING more verticies than capacity
+    which mirror the first verticies of the ring. this allows
+    Line2d to draw the ring as at most two contiguous ranges
+    (see get_draw_ranges) without a line crossing the seam
+    between the newest and the oldest sample.
+
+    ..code:
+        domain = RingBufferDomain(100000, dimension=2)
+        plotter.graphs['live'] = Line2d(domain)
+
+        # each frame
+        domain.append(np.column_stack((t, y)))
+
+    """
+    ADJACENCY_PADDING = 3
+
+    def __init__(self, capacity, dimension=2, streaming=None):
+        self.capacity = capacity
+        self.streaming = streaming
+        self.offset = 0
+        self.length = None
+        self.head = 0
+        self.count = 0
+        # incremented on each append
+        self.version = 0
+        # number of samples appended so far
+        self.total = 0
+
+        self._dimension = dimension
+        self._ring = np.zeros((capacity+self.ADJACENCY_PADDING, dimension), dtype=np.float32)
+        self._vbo = None
+
+    @property
+    def dimension(self):
+        return self._dimension
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def data(self):
+        """
+        returns a copy of the valid samples in chronological order
+        """
+        if self.count < self.capacity:
+            return self._ring[:self.count].copy()
+        return np.concatenate((self._ring[self.head:self.capacity], self._ring[:self.head]))
+
+    @property
+    def gl_vbo_id(self):
+        if self._vbo is None:
+            self._init_vbo()
+        self._vbo.flush()
+        return self._vbo.gl_vbo_id
+
+    def _init_vbo(self):
+        self._vbo = VertexBuffer(self.capacity+self.ADJACENCY_PADDING, self._dimension, streaming=self.streaming)
+        if self.streaming is None:
+            self._vbo.usage = GL_DYNAMIC_DRAW
+        self._vbo.buffer_data(self._ring)
+
+    def append(self, chunk):
+        """
+        appends a (n, dimension) chunk. if the chunk is larger
+        than the capacity only the last capacity rows are kept.
+        """
+        if chunk.dtype != np.float32:
+            raise Exception(
+                'domain data has dtype={} but must have dtype=float32.'.format(
+                    chunk.dtype
+                )
+            )
+        if len(chunk.shape) < 2:
+            chunk = chunk.reshape((len(chunk), 1))
+        if chunk.shape[1] != self._dimension:
+            raise ValueError('chunk has dimension {} but domain has dimension {}'.format(
+                chunk.shape[1], self._dimension))
+
+        if chunk.shape[0] > self.capacity:
+            chunk = chunk[-self.capacity:]
+
+        n = chunk.shape[0]
+        first = min(n, self.capacity - self.head)
+        self._write(self.head, chunk[:first])
+        if n > first:
+            self._write(0, chunk[first:])
+
+        self.head = (self.head + n) % self.capacity
+        self.count = min(self.capacity, self.count + n)
+        self.total += n
+        self.version += 1
+
+    def tail(self, since):
+        """
+        returns the samples appended after the first since samples
+        in chronological order. samples which were overwritten
+        in the meantime are lost.
+        """
+        n = min(self.total - since, self.count)
+        if n <= 0:
+            return self._ring[:0].copy()
+
+        start = (self.head - n) % self.capacity
+        if start < self.head:
+            return self._ring[start:self.head].copy()
+        return np.concatenate((self._ring[start:self.capacity], self._ring[:self.head]))
+
+    def clear(self):
+        """
+        removes all samples. the vbo is kept.
+        """
+        self.head = 0
+        self.count = 0
+        self.total = 0
+        self.version += 1
+
+    def _write(self, start, rows):
+        stop = start + rows.shape[0]
+        self._ring[start:stop] = rows
+        ranges = [(start, stop)]
+
+        # mirror the first verticies into the padding region
+        if start < self.ADJACENCY_PADDING:
+            mirror_stop = min(stop, self.ADJACENCY_PADDING)
+            self._ring[self.capacity+start:self.capacity+mirror_stop] = rows[:mirror_stop-start]
+            ranges.append((self.capacity+start, self.capacity+mirror_stop))
+
+        # without vbo the whole ring is uploaded on _init_vbo()
+        if self._vbo is not None:
+            for dirty in ranges:
+                self._vbo.mark_dirty(*dirty)
+
+    def get_draw_ranges(self):
+        """
+        returns (first, count) ranges in chronological order.
+        the first range continues over the seam into the
+        padding so the strip stays connected.
+        """
+        if self.count < self.capacity or self.head == 0:
+            return [(0, self.count)]
+
+        return [
+            (self.head, self.capacity - self.head + min(self.head, self.ADJACENCY_PADDING)),
+            (0, self.head),
+        ]
+
+    def pull_data(self, offset=0, length=None):
+        data = self.data[offset:]
+        if length is not None:
+            data = data[:length]
+        return data
+
+
+class MemmapDomain(Domain, object):
+    """
+    domain backed by a memory mapped file (raw binary or .npy).
+
+    only the index window which matches the visible x-range
+    (plus margin times the visible width on both sides) is copied
+    into host memory and uploaded to the vbo. the window is found
+    by a binary search on the x-component so the x-component must
+    be sorted.
+
+    when the plot camera changes (panning, zooming) the new window
+    is loaded by a background thread. the last loaded window stays
+    visible until the new one is ready.
+
+    host memory is bounded by budget bytes: the current window and
+    the next one (loading or loaded but not uploaded yet) may use
+    budget/2 bytes each. a newer request is read after the loaded
+    window was uploaded. if the window has more rows the rows are
+    strided.
+
+    ..code:
+        domain = MemmapDomain('recording.f32', dimension=2)
+        domain = MemmapDomain('recording.npy', budget=256*1024**2)
+
+    """
+    def __init__(self, path, dimension=2, dtype=np.float32, budget=64*1024**2, margin=0.5, header=0):
+        if path.endswith('.npy'):
+            mmap = np.load(path, mmap_mode='r')
+            if len(mmap.shape) < 2:
+                mmap = mmap.reshape((mmap.shape[0], 1))
+        else:
+            mmap = np.memmap(path, dtype=dtype, mode='r', offset=header)
+            mmap = mmap.reshape((-1, dimension))
+
+        if mmap.shape[1] < 2:
+            raise ValueError('MemmapDomain requires dimension >= 2 (sorted x-component in d0.x), given dimension is {}'.format(
+                mmap.shape[1]))
+
+        self.path = path
+        self.budget = budget
+        self.margin = margin
+        self.offset = 0
+        self.length = None
+        self.window = None
+
+        self._mmap = mmap
+        self._window_data = None
+        self._vbo = None
+        self._lock = threading.Lock()
+        self._requested = None
+        self._loaded = None
+        self._loading = False
+        self._last_request = None
+
+    @property
+    def dimension(self):
+        return self._mmap.shape[1]
+
+    @property
+    def max_rows(self):
+        return max(4, self.budget//(2*self.dimension*4))
+
+    @property
+    def data(self):
+        """
+        host copy of the current window
+        """
+        return self._window_data
+
+    def __len__(self):
+        return self._window_data.shape[0] if self._window_data is not None else 0
+
+    def gl_init(self):
+        if self._window_data is None:
+            window = (0, min(self._mmap.shape[0], self.max_rows), 1)
+            self._loaded = (window, self._read(window))
+            self._flush()
+
+    @property
+    def gl_vbo_id(self):
+        # the window is swapped in update_view, before the
+        # graph computes the draw length from it.
+        return self._vbo.gl_vbo_id
+
+    def has_pending_updates(self):
+        return self._loaded is not None
+
+    def _read(self, window):
+        start, stop, step = window
+        return np.array(self._mmap[start:stop:step], dtype=np.float32)
+
+    def _find_window(self, x_range):
+        """
+        returns (start, stop, step) of the rows within x_range
+        """
+        x = self._mmap[:, 0]
+        n = self._mmap.shape[0]
+        start = max(0, bisect.bisect_left(x, x_range[0]) - 1)
+        stop = min(n, bisect.bisect_right(x, x_range[1]) + 1)
+        step = max(1, int(np.ceil((stop - start)/float(self.max_rows))))
+        return start, stop, step
+
+    def update_view(self, x_range, pixel_width):
+        """
+        requests a new window if the current one does not
+        cover the visible x_range with sufficient resolution.
+        a loaded window is uploaded first.
+        """
+        self._flush()
+        visible = self._find_window(x_range)
+        if self.window is not None:
+            start, stop, step = self.window
+            if start <= visible[0] and stop >= visible[1] and step <= visible[2]:
+                return
+
+        width = x_range[1] - x_range[0]
+        window = self._find_window((x_range[0]-self.margin*width, x_range[1]+self.margin*width))
+        if window != self._last_request:
+            self._request(window)
+
+    def _request(self, window):
+        self._last_request = window
+        with self._lock:
+            self._requested = window
+            if self._loading or self._loaded is not None:
+                # the running loader or the next _flush
+                # picks up the newest request
+                return
+            self._loading = True
+        self._start_loader()
+
+    def _start_loader(self):
+        thread = threading.Thread(target=self._load)
+        thread.daemon = True
+        thread.start()
+
+    def _load(self):
+        while True:
+            with self._lock:
+                window = self._requested
+                if window is None or self._loaded is not None:
+                    # at most one window waits for the upload
+                    self._loading = False
+                    return
+                self._requested = None
+
+            data = self._read(window)
+            with self._lock:
+                self._loaded = (window, data)
+
+    def _flush(self):
+        """
+        uploads a loaded window
+        """
+        with self._lock:
+            loaded = self._loaded
+            self._loaded = None
+
+        if loaded is None:
+            return
+
+        self.window, self._window_data = loaded
+        loaded = None
+        if self._vbo is None:
+            self._vbo = VertexBuffer.from_numpy(self._window_data)
+        else:
+            self._vbo.length = self._window_data.shape[0]
+            self._vbo.buffer_data(self._window_data)
+
+        # a request which came in while the window was waiting
+        with self._lock:
+            start = self._requested is not None and not self._loading
+            if start:
+                self._loading = True
+        if start:
+            self._start_loader()
+
+    def pull_data(self, offset=0, length=None):
+        data = self._window_data[offset:]
+        if length is not None:
+            data = data[:length]
+        return data
+
+
+class ChunkedDomain(Domain, object):
+    """
+    out of core domain for data which does not fit into
+    gpu memory.
+
+    the data (numpy array or memmap) is split into chunks of
+    chunk_size rows. only the chunks which intersect the visible
+    x-range are resident in gpu buffers. the buffers are managed
+    by a least recently used cache which holds at most budget
+    bytes. buffers of evicted chunks are reused by other chunks.
+
+    each chunk buffer holds one row before and two rows after its
+    chunk so Line2d draws the chunks (see get_draw_chunks) as
+    consecutive GL_LINE_STRIP_ADJACENCY strips which connect
+    seamlessly at the chunk boundaries.
+
+    chunks are culled by the x-value of their first row. this
+    requires a sorted x-component in d0.x. if the chunk starts are
+    not sorted all chunks are considered visible. chunks which
+    exceed the budget are skipped.
+
+    ..code:
+        data = np.load('recording.npy', mmap_mode='r')
+        domain = ChunkedDomain(data, chunk_size=2**20, budget=512*1024**2)
+        ...
+        print(domain.hits, domain.misses, domain.evictions)
+
+    """
+    def __init__(self, data, chunk_size=2**20, budget=256*1024**2):
+        if len(data.shape) < 2:
+            data = data.reshape((data.shape[0], 1))
+
+        self.chunk_size = chunk_size
+        self.budget = budget
+        self.offset = 0
+        self.length = None
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._data = data
+        self._slots = []
+        self._resident = OrderedDict()
+        self._visible = []
+        self._bounds = None
+
+    @property
+    def dimension(self):
+        return self._data.shape[1]
+
+    @property
+    def data(self):
+        return self._data
+
+    def __len__(self):
+        return self._data.shape[0]
+
+    @property
+    def nchunks(self):
+        return (self._data.shape[0] + self.chunk_size - 1)//self.chunk_size
+
+    @property
+    def max_resident(self):
+        """
+        number of chunks which fit into the budget
+        """
+        return max(1, self.budget//((self.chunk_size+3)*self.dimension*4))
+
+    def gl_init(self):
+        if not len(self._slots):
+            self._make_resident(list(range(min(self.nchunks, self.max_resident))))
+
+    @property
+    def gl_vbo_id(self):
+        if not len(self._slots):
+            self.gl_init()
+        return self._slots[0].gl_vbo_id
+
+    def _chunk_rows(self, chunk):
+        """
+        rows [start, stop) of the chunk buffer including
+        the rows shared with the neighbour chunks.
+        """
+        start = chunk*self.chunk_size
+        stop = min(self._data.shape[0], start + self.chunk_size)
+        return max(0, start-1), min(self._data.shape[0], stop+2)
+
+    def _find_chunks(self, x_range):
+        if self._bounds is None:
+            bounds = np.array(self._data[::self.chunk_size, 0], dtype=np.float64)
+            self._bounds = bounds if np.all(bounds[1:] >= bounds[:-1]) else False
+
+        if self._bounds is False:
+            return list(range(self.nchunks))
+
+        first = max(0, int(np.searchsorted(self._bounds, x_range[0], side='left')) - 1)
+        last = int(np.searchsorted(self._bounds, x_range[1], side='right'))
+        return list(range(first, last))
+
+    def update_view(self, x_range, pixel_width):
+        """
+        makes the chunks within x_range resident
+        """
+        visible = self._find_chunks(x_range)[:self.max_resident]
+        if visible != self._visible:
+            self._make_resident(visible)
+
+    def _make_resident(self, chunks):
+        protected = set(chunks)
+        for chunk in chunks:
+            if chunk in self._resident:
+                self.hits += 1
+                # move to the most recently used end
+                self._resident[chunk] = self._resident.pop(chunk)
+                continue
+
+            self.misses += 1
+            slot = self._acquire_slot(protected)
+            start, stop = self._chunk_rows(chunk)
+            self._slots[slot].buffer_sub_data(
+                np.ascontiguousarray(self._data[start:stop], dtype=np.float32))
+            self._resident[chunk] = (slot, stop - start)
+
+        self._visible = chunks
+
+    def _acquire_slot(self, protected):
+        """
+        returns a free buffer. if the budget is exhausted
+        the least recently used chunk which is not protected
+        is evicted.
+        """
+        if len(self._slots) < self.max_resident:
+            vbo = VertexBuffer(self.chunk_size+3, self.dimension)
+            vbo.allocate()
+            self._slots.append(vbo)
+            return len(self._slots) - 1
+
+        for chunk in self._resident:
+            if chunk not in protected:
+                slot, count = self._resident.pop(chunk)
+                self.evictions += 1
+                return slot
+
+        raise Exception('ChunkedDomain: no chunk left to evict. more visible chunks than max_resident={}'.format(
+            self.max_resident))
+
+    def get_draw_chunks(self):
+        """
+        returns (gl_vbo_id, first, count) for each visible chunk
+        in index order.
+        """
+        return [
+            (self._slots[self._resident[chunk][0]].gl_vbo_id, 0, self._resident[chunk][1])
+            for chunk in self._visible
+        ]
+
+    def pull_data(self, offset=0, length=None):
+        data = self._data[offset:]
+        if length is not None:
+            data = data[:length]
+        return np.array(data, dtype=np.float32)
@@ -0,0 +1,265 @@
+#-*- coding: utf-8 -*-
+"""
+level of detail utilities for line domains.
+
+a MinMaxPyramid decimates a (n, dimension) array into levels
+where level j groups 2**j samples into one bucket and keeps
+the sample with the minimum and the sample with the maximum
+y-component of each bucket (in index order). So every visible
+peak survives the decimation while level j only holds about
+n/2**(j-1) verticies.
+
+the levels are build from each other: the minimum of a bucket
+on level j is the smaller minimum of its two child buckets
+on level j-1. this keeps the whole build O(n).
+
+    pyramid = MinMaxPyramid(data)
+    pyramid.build()             # or pyramid.build_async()
+    pyramid.invalidate(10, 20)  # rows 10..19 have changed
+    level = pyramid.choose_level(visible_samples=1e6, pixel_width=800)
+    vertex_data = pyramid.get_level(level)
+
+"""
+import numpy as np
+import threading
+
+class MinMaxPyramid():
+    """
+    min/max decimation pyramid of a 2d numpy array.
+    the y component is given by component (default column 1).
+    """
+    # stop building levels when a level has less buckets
+    MIN_BUCKETS = 64
+
+    def __init__(self, data, component=1):
+        self.component = component
+        self.version = 0
+
+        self._data = data
+        self._levels = []
+        self._dirty = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._restart = False
+
+        self.on_ready = None
+
+    @property
+    def data(self):
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        """
+        replaces the data and invalidates the rows
+        which differ from the current data.
+        """
+        with self._lock:
+            old = self._data
+            self._data = data
+
+        if old is None or old.shape[1:] != data.shape[1:]:
+            self.invalidate(0, data.shape[0])
+            return
+
+        common = min(old.shape[0], data.shape[0])
+        if old is data:
+            # same array was mutated inplace. we cannot diff.
+            changed = (0, common)
+        else:
+            rows = np.nonzero(np.any(old[:common] != data[:common], axis=1))[0]
+            changed = (rows[0], rows[-1]+1) if len(rows) else None
+
+        if old.shape[0] != data.shape[0]:
+            start = common if changed is None else changed[0]
+            changed = (start, max(old.shape[0], data.shape[0]))
+
+        if changed is not None:
+            self.invalidate(*changed)
+
+    def __len__(self):
+        """
+        number of available decimation levels (level 0 is the raw data)
+        """
+        return len(self._levels) + 1
+
+    def invalidate(self, start, stop):
+        """
+        marks rows [start, stop) as modified. Only the buckets
+        which contain those rows will be rebuild.
+        """
+        with self._lock:
+            if self._dirty is None:
+                self._dirty = (int(start), int(stop))
+            else:
+                self._dirty = (min(self._dirty[0], int(start)), max(self._dirty[1], int(stop)))
+            self._restart = True
+
+    def is_dirty(self):
+        return self._dirty is not None or not len(self._levels)
+
+    def is_building(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def build_async(self):
+        """
+        builds all dirty levels within a background thread.
+        if the thread is allready running it will pick up
+        new invalidations by itself.
+        """
+        if self.is_building():
+            return
+
+        self._thread = threading.Thread(target=self.build)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def wait(self, timeout=None):
+        """
+        blocks until the background build has finished
+        """
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def build(self):
+        """
+        (re)builds the dirty parts of all levels.
+        """
+        while True:
+            with self._lock:
+                data = self._data
+                dirty = self._dirty
+                self._dirty = None
+                self._restart = False
+                levels = list(self._levels)
+
+            if dirty is None and len(levels):
+                return
+
+            if dirty is None or not len(levels):
+                dirty = (0, data.shape[0])
+
+            new_levels = self._build_levels(data, levels, dirty)
+            with self._lock:
+                if new_levels is None or self._restart:
+                    # data changed while building. keep the
+                    # consumed range dirty and try again.
+                    self._dirty = dirty if self._dirty is None else (
+                        min(self._dirty[0], dirty[0]), max(self._dirty[1], dirty[1]))
+                    self._restart = False
+                    continue
+                self._levels = new_levels
+                self.version += 1
+
+            if self.on_ready is not None:
+                self.on_ready(self)
+
+    def _build_levels(self, data, levels, dirty):
+        y = np.ascontiguousarray(data[:, self.component])
+        n = y.shape[0]
+
+        new_levels = []
+        child_min, child_max = None, None
+        bucket_size = 1
+        j = 0
+        while True:
+            j += 1
+            bucket_size *= 2
+            nbuckets = (n + bucket_size - 1)//bucket_size
+            if nbuckets < self.MIN_BUCKETS and j > 1:
+                break
+
+            # bucket range which has to be rebuild
+            first = dirty[0]//bucket_size
+            last = nbuckets if dirty[1] >= n else (dirty[1] + bucket_size - 1)//bucket_size
+
+            level = levels[j-1] if j-1 < len(levels) else None
+            if level is None:
+                first, last = 0, nbuckets
+
+            imin, imax = self._resize_level(level, nbuckets)
+            if last > first:
+                if child_min is None:
+                    cmin, cmax = self._reduce_raw(y, first, last)
+                else:
+                    cmin, cmax = self._reduce_level(y, child_min, child_max, first, last)
+                imin[first:last] = cmin
+                imax[first:last] = cmax
+
+            new_levels.append((imin, imax))
+            child_min, child_max = imin, imax
+
+            if self._restart:
+                return None
+
+        return new_levels
+
+    def _resize_level(self, level, nbuckets):
+        if level is None:
+            return np.zeros(nbuckets, dtype=np.int64), np.zeros(nbuckets, dtype=np.int64)
+
+        imin, imax = level
+        if imin.shape[0] == nbuckets:
+            return imin.copy(), imax.copy()
+
+        new_min = np.zeros(nbuckets, dtype=np.int64)
+        new_max = np.zeros(nbuckets, dtype=np.int64)
+        common = min(nbuckets, imin.shape[0])
+        new_min[:common] = imin[:common]
+        new_max[:common] = imax[:common]
+        return new_min, new_max
+
+    def _reduce_raw(self, y, first, last):
+        """
+        first level buckets of size 2 from raw data
+        """
+        start, stop = 2*first, min(2*last, y.shape[0])
+        index = np.arange(start, stop)
+        if (stop - start) % 2:
+            index = np.append(index, stop-1)
+        pairs = index.reshape(-1, 2)
+        values = y[pairs]
+        rows = np.arange(pairs.shape[0])
+        return pairs[rows, np.argmin(values, axis=1)], pairs[rows, np.argmax(values, axis=1)]
+
+    def _reduce_level(self, y, child_min, child_max, first, last):
+        """
+        merges two child buckets into one
+        """
+        start, stop = 2*first, min(2*last, child_min.shape[0])
+        cmin, cmax = child_min[start:stop], child_max[start:stop]
+        if (stop - start) % 2:
+            cmin = np.append(cmin, cmin[-1])
+            cmax = np.append(cmax, cmax[-1])
+        cmin, cmax = cmin.reshape(-1, 2), cmax.reshape(-1, 2)
+        rows = np.arange(cmin.shape[0])
+        return (cmin[rows, np.argmin(y[cmin], axis=1)],
+                cmax[rows, np.argmax(y[cmax], axis=1)])
+
+    def get_level(self, level):
+        """
+        returns the vertex data of a level. each bucket
+        emits its min and max sample ordered by index so
+        the line keeps the shape of the raw data.
+        """
+        with self._lock:
+            data = self._data
+            if level == 0 or level > len(self._levels):
+                return data
+            imin, imax = self._levels[level-1]
+
+        index = np.empty(2*imin.shape[0], dtype=np.int64)
+        index[0::2] = np.minimum(imin, imax)
+        index[1::2] = np.maximum(imin, imax)
+        return np.ascontiguousarray(data[index])
+
+    def choose_level(self, visible_samples, pixel_width):
+        """
+        returns the coarsest level which still provides
+        about two verticies (min and max) per pixel.
+        """
+        if pixel_width <= 0 or visible_samples <= pixel_width:
+            return 0
+
+        level = int(np.floor(np.log2(float(visible_samples)/pixel_width)))
+        return max(0, min(level, len(self._levels)))
@@ -0,0 +1,285 @@
+#-*- coding: utf-8 -*-
+"""
+online transformations for streaming domains.
+
+in contrast to the transformations of util.py an online
+transformation keeps a state and only processes the samples
+which were appended since the last call. so the cost per frame
+is proportional to the new samples and not to the history.
+
+    transformation = RunningMean()
+    new_rows = transformation.process(appended_rows)
+
+process() returns one output row for each input row (STFT:
+one spectrum for each complete segment). a transformation with
+replaces=True (WelchPSD) instead updates a result() which
+replaces the whole output.
+
+the layout follows util.py: for 2d data the first component
+is x and the second one is y, 1d data is plain y.
+
+see transformation.OnlineDomain which feeds the transformations
+from a source domain.
+
+:author: Nicolas 'keksnicoh' Heimann
+"""
+import numpy as np
+from scipy.signal import get_window
+
+def _split(rows):
+    if rows.shape[1] not in (1, 2):
+        raise ValueError('online transformations require dimension 1 or 2, given dimension is {}'.format(
+            rows.shape[1]))
+    return rows[:, rows.shape[1]-1].astype(np.float64)
+
+def _window(window, nperseg):
+    if window is None:
+        return np.ones(nperseg)
+    if isinstance(window, str):
+        return get_window(window, nperseg)
+    return np.asarray(window, dtype=np.float64)
+
+def _segments(samples, nperseg, step):
+    """
+    returns (segments, consumed): the complete segments of
+    samples and the number of samples which do not start
+    another segment.
+    """
+    nsegments = 0 if samples.shape[0] < nperseg else (samples.shape[0] - nperseg)//step + 1
+    index = np.arange(nperseg)[None, :] + step*np.arange(nsegments)[:, None]
+    return samples[index], nsegments*step
+
+def _one_sided(psd, nperseg):
+    """
+    doubles the bins which stand for positive and negative frequencies
+    """
+    psd[..., 1:-1 if nperseg % 2 == 0 else None] *= 2
+    return psd
+
+def _sample_rate(rows):
+    if rows.shape[1] == 2 and rows.shape[0] > 1:
+        dt = abs(float(rows[1, 0]) - float(rows[0, 0]))
+        return 1.0/dt if dt > 0 else 1.0
+    return None
+
+def _with_y(rows, y):
+    new_rows = np.empty((y.shape[0], rows.shape[1]), dtype=np.float32)
+    if rows.shape[1] == 2:
+        new_rows[:, 0] = rows[:, 0]
+    new_rows[:, -1] = y
+    return new_rows
+
+class RunningMean():
+    """
+    running mean (or variance) of all samples so far.
+
+    the state (count, mean, M2) is updated by Welford's
+    algorithm. a chunk is merged at once (Chan et al.) while
+    the per sample outputs are derived from cumulative sums
+    of the deviations from the mean before the chunk.
+    """
+    replaces = False
+
+    def __init__(self, variance=False):
+        self.variance = variance
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def process(self, rows):
+        y = _split(rows)
+        if not y.shape[0]:
+            return _with_y(rows, y)
+
+        deviation = y - self.mean
+        c1 = np.cumsum(deviation)
+        c2 = np.cumsum(deviation*deviation)
+        counts = self.count + np.arange(1, y.shape[0]+1)
+
+        means = self.mean + c1/counts
+        m2s = self.m2 + c2 - c1*c1/counts
+
+        self.count = int(counts[-1])
+        self.mean = float(means[-1])
+        self.m2 = float(m2s[-1])
+
+        if self.variance:
+            return _with_y(rows, np.maximum(m2s, 0)/counts)
+        return _with_y(rows, means)
+
+    @property
+    def var(self):
+        return self.m2/self.count if self.count else 0.0
+
+class MovingAverage():
+    """
+    mean of the last nsamples samples. the last nsamples
+    inputs are kept in a circular buffer together with their
+    sum. the sum is recomputed from the buffer every RESYNC
+    samples to avoid drift.
+    """
+    replaces = False
+    RESYNC = 2**20
+
+    def __init__(self, nsamples=50):
+        self.nsamples = nsamples
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.sum = 0.0
+        self._buffer = np.zeros(self.nsamples, dtype=np.float64)
+        self._position = 0
+        self._since_resync = 0
+
+    def process(self, rows):
+        y = _split(rows)
+        k = y.shape[0]
+        n = self.nsamples
+        if not k:
+            return _with_y(rows, y)
+
+        # values which leave the window: first from the
+        # circular buffer (oldest first), then from the chunk.
+        outgoing = np.zeros(k, dtype=np.float64)
+        from_buffer = min(k, n)
+        index = (self._position + np.arange(from_buffer)) % n
+        outgoing[:from_buffer] = self._buffer[index]
+        if k > n:
+            outgoing[n:] = y[:k-n]
+
+        sums = self.sum + np.cumsum(y - outgoing)
+        counts = np.minimum(self.count + np.arange(1, k+1), n)
+
+        # keep the last n inputs
+        tail = y[-n:]
+        index = (self._position + max(0, k-n) + np.arange(tail.shape[0])) % n
+        self._buffer[index] = tail
+        self._position = (self._position + k) % n
+        self.count = min(n, self.count + k)
+        self.sum = float(sums[-1])
+
+        self._since_resync += k
+        if self._since_resync >= self.RESYNC:
+            self.sum = float(np.sum(self._buffer))
+            self._since_resync = 0
+
+        return _with_y(rows, sums/counts)
+
+class WelchPSD():
+    """
+    power spectral density by Welch's method. new samples
+    are cut into segments of nperseg samples overlapping by
+    overlap*nperseg samples. the periodograms of new segments
+    are added into an accumulated spectrum so result() is the
+    mean over all segments so far.
+
+    like scipy.signal.welch the mean of each segment is
+    subtracted before the window is applied (detrend='constant'),
+    so a dc offset does not leak into the low frequency bins.
+    detrend=False keeps the segments as they are.
+
+    the sample rate is taken from the x-component of the
+    first two samples (2d data) or given by sample_rate.
+    dimension is the dimension of the source samples which
+    also defines the layout of result(), OnlineDomain sets it
+    to the dimension of its source domain.
+    """
+    replaces = True
+
+    def __init__(self, nperseg=256, overlap=0.5, window='hann', sample_rate=None, detrend='constant', dimension=2):
+        if detrend not in ('constant', False, None):
+            raise ValueError('unknown detrend "{}", use "constant" or False'.format(detrend))
+        self.nperseg = nperseg
+        self.step = max(1, nperseg - int(overlap*nperseg))
+        self.sample_rate = sample_rate
+        self.window = _window(window, nperseg)
+        self.detrend = detrend
+        self.dimension = dimension
+        self.reset()
+
+    def reset(self):
+        self.segments = 0
+        self._accumulated = np.zeros(self.nperseg//2+1, dtype=np.float64)
+        self._pending = np.zeros(0, dtype=np.float64)
+        self._rate = self.sample_rate
+
+    def process(self, rows):
+        if rows.shape[1] != self.dimension:
+            raise ValueError('WelchPSD expects dimension {}, given dimension is {}'.format(
+                self.dimension, rows.shape[1]))
+        if self._rate is None:
+            self._rate = _sample_rate(rows)
+
+        samples = np.concatenate((self._pending, _split(rows)))
+        segments, consumed = _segments(samples, self.nperseg, self.step)
+        if segments.shape[0]:
+            if self.detrend == 'constant':
+                segments = segments - segments.mean(axis=1)[:, None]
+            spectra = np.abs(np.fft.rfft(segments*self.window, axis=1))**2
+            self._accumulated += spectra.sum(axis=0)
+            self.segments += segments.shape[0]
+
+        # keep the samples which start the next segment
+        self._pending = samples[consumed:]
+
+    def result(self):
+        rate = self._rate or 1.0
+        psd = self._accumulated/max(1, self.segments)/(rate*np.sum(self.window**2))
+        _one_sided(psd, self.nperseg)
+
+        if self.dimension == 1:
+            return psd.astype(np.float32).reshape(-1, 1)
+        return np.column_stack((np.fft.rfftfreq(self.nperseg, 1.0/rate), psd)).astype(np.float32)
+
+class STFT():
+    """
+    short time fourier transform. the samples are cut into
+    segments like in WelchPSD but process() returns the power
+    spectral density of each new segment as one row of
+    nperseg//2+1 frequency bins (see frequencies()).
+
+    with decibel=True the rows are 10*log10(psd) (bounded
+    below by floor).
+    """
+    replaces = False
+
+    def __init__(self, nperseg=256, overlap=0.5, window='hann', sample_rate=None, decibel=True, floor=1e-12):
+        self.nperseg = nperseg
+        self.step = max(1, nperseg - int(overlap*nperseg))
+        self.sample_rate = sample_rate
+        self.window = _window(window, nperseg)
+        self.decibel = decibel
+        self.floor = floor
+        self.reset()
+
+    @property
+    def bins(self):
+        return self.nperseg//2+1
+
+    def reset(self):
+        self.segments = 0
+        self._pending = np.zeros(0, dtype=np.float64)
+        self._rate = self.sample_rate
+
+    def process(self, rows):
+        if self._rate is None:
+            self._rate = _sample_rate(rows)
+
+        samples = np.concatenate((self._pending, _split(rows)))
+        segments, consumed = _segments(samples, self.nperseg, self.step)
+        self._pending = samples[consumed:]
+        self.segments += segments.shape[0]
+
+        rate = self._rate or 1.0
+        psd = np.abs(np.fft.rfft(segments*self.window, axis=1))**2/(rate*np.sum(self.window**2))
+        _one_sided(psd, self.nperseg)
+        if self.decibel:
+            psd = 10*np.log10(np.maximum(psd, self.floor))
+        return psd.astype(np.float32).reshape(-1, self.bins)
+
+    def frequencies(self):
+        return np.fft.rfftfreq(self.nperseg, 1.0/(self._rate or 1.0))
@@ -0,0 +1,339 @@
+#-*- coding: utf-8 -*-
+"""
+opencl transformations for domains.
+
+the transformations compute the same results as their
+counterparts in util.py but run as cllib Blockwise kernels
+on a float32 (n, dimension) device buffer:
+
+    transformation = MovingAverage(50)
+    transformation.enqueue(queue, src, dst, n, dimension)
+
+src and dst may be plain cl.Buffer or cl.GLBuffer (acquired
+by the caller). for host arrays __call__ copies the data to
+the device and returns the result:
+
+    new_data = transformation(queue, data)
+
+see transformation.OpenCLDomain which runs them on the vbos
+of a domain.
+
+:author: Nicolas 'keksnicoh' Heimann
+"""
+from cllib.algorithm.map import Blockwise
+from gllib.plot.domain import util
+
+import pyopencl as cl
+import numpy as np
+
+_LIBRARY = """
+#define DIMENSION {dimension}
+#define Y (DIMENSION-1)
+#define ACC {acc}
+#if DIMENSION == 2
+#define TIME_AXIS(a, b, i) b[(i)*2] = (i) == 0 ? 0.0f : (float)(((ACC)a[(i)*2] - (ACC)a[(i)*2-2])*(i))
+#else
+#define TIME_AXIS(a, b, i)
+#endif
+{extra}
+"""
+
+def accumulator_dtype(device):
+    """
+    float64 if the device supports it, float32 otherwise
+    """
+    return np.float64 if 'cl_khr_fp64' in device.extensions else np.float32
+
+class OpenCLTransformation(object):
+    """
+    base class. subclasses implement build(ctx, dimension)
+    which returns the kernels and enqueue().
+    """
+    def __init__(self):
+        self._kernels = {}
+
+    def output_length(self, n):
+        return n
+
+    def output_dimension(self, dimension):
+        return dimension
+
+    def supports(self, n):
+        """
+        whether the kernels can transform n samples
+        """
+        return True
+
+    def kernels(self, ctx, dimension):
+        key = (ctx.int_ptr, dimension)
+        if key not in self._kernels:
+            self._kernels[key] = self.build(ctx, dimension)
+        return self._kernels[key]
+
+    def library(self, ctx, dimension, extra=''):
+        acc = accumulator_dtype(ctx.devices[0])
+        return _LIBRARY.format(
+            dimension=dimension,
+            acc='double' if acc == np.float64 else 'float',
+            extra=extra)
+
+    def blockwise(self, ctx, dimension, map_expr, arguments, in_blocksize=1, extra=''):
+        kernel = Blockwise(ctx,
+            map_expr=map_expr,
+            arguments=arguments,
+            in_blocksize=in_blocksize,
+            libraries=self.library(ctx, dimension, extra))
+        kernel.build()
+        return kernel
+
+    def __call__(self, queue, data):
+        """
+        host staging: copies data to the device, runs the
+        transformation and returns the result.
+        """
+        data = np.ascontiguousarray(data, dtype=np.float32)
+        n, dimension = data.shape
+        shape = (self.output_length(n), self.output_dimension(dimension))
+        result = np.zeros(shape, dtype=np.float32)
+        if not result.size:
+            return result
+
+        src = cl.Buffer(queue.context, cl.mem_flags.READ_ONLY | cl.mem_flags.COPY_HOST_PTR, hostbuf=data)
+        dst = cl.Buffer(queue.context, cl.mem_flags.WRITE_ONLY, result.nbytes)
+        self.enqueue(queue, src, dst, n, dimension)
+        cl.enqueue_copy(queue, result, dst)
+        return result
+
+class MapExpression(OpenCLTransformation):
+    """
+    applies an opencl c expression to each sample. the
+    expression reads and writes the float variables x
+    and y (x is the sample index for 1d data).
+
+        MapExpression('y = 2.0f*y + 1.0f')
+    """
+    def __init__(self, expression):
+        super(MapExpression, self).__init__()
+        self.expression = expression
+
+    def build(self, ctx, dimension):
+        if dimension == 2:
+            map_expr = """
+                float x = a[__in_offset];
+                float y = a[__in_offset+1];
+                {expression};
+                b[__in_offset] = x;
+                b[__in_offset+1] = y;
+            """
+        elif dimension == 1:
+            map_expr = """
+                float x = (float)__id;
+                float y = a[__in_offset];
+                {expression};
+                b[__in_offset] = y;
+            """
+        else:
+            raise ValueError('invalid dimension {}'.format(dimension))
+
+        return self.blockwise(ctx, dimension, map_expr.format(expression=self.expression), [
+            ('a', 'global const', np.float32, '*a'),
+            ('b', 'global', np.float32, '*b'),
+        ], in_blocksize=dimension)
+
+    def enqueue(self, queue, src, dst, n, dimension):
+        self.kernels(queue.context, dimension)(queue, n, src, dst)
+
+class MovingAverage(OpenCLTransformation):
+    """
+    util.moving_avarage: each work item sums its last
+    nsamples samples.
+    """
+    def __init__(self, nsamples=50):
+        super(MovingAverage, self).__init__()
+        self.nsamples = nsamples
+
+    def build(self, ctx, dimension):
+        return self.blockwise(ctx, dimension, """
+            ACC s = 0;
+            for (int j = max(1, __id-NSAMPLES+1); j <= __id; ++j) {
+                s += a[j*DIMENSION+Y];
+            }
+            b[__id*DIMENSION+Y] = __id == 0 ? 0.0f : (float)(s/NSAMPLES);
+            TIME_AXIS(a, b, __id);
+        """, [
+            ('a', 'global const', np.float32, '*a'),
+            ('b', 'global', np.float32, '*b'),
+        ], extra='#define NSAMPLES {}'.format(int(self.nsamples)))
+
+    def enqueue(self, queue, src, dst, n, dimension):
+        self.kernels(queue.context, dimension)(queue, n, src, dst)
+
+class TotalMean(OpenCLTransformation):
+    """
+    util.total_mean as a blocked prefix sum:
+
+      1. the sum of each block of BLOCK_SIZE samples
+      2. exclusive scan of the block sums (one work item)
+      3. each block accumulates its samples starting
+         from the sum of the blocks before.
+    """
+    BLOCK_SIZE = 1024
+
+    def build(self, ctx, dimension):
+        acc = accumulator_dtype(ctx.devices[0])
+        block_sums = self.blockwise(ctx, dimension, """
+            ACC s = 0;
+            int stop = min(__in_offset + IN_BLOCK_SIZE, n);
+            for (int i = max(__in_offset, 1); i < stop; ++i) {
+                s += a[i*DIMENSION+Y];
+            }
+            sums[__id] = s;
+        """, [
+            ('a', 'global const', np.float32, '*a'),
+            ('sums', 'global', acc, '*sums'),
+            ('n', '', np.int32, 'n'),
+        ], in_blocksize=self.BLOCK_SIZE)
+
+        scan = self.blockwise(ctx, dimension, """
+            ACC s = 0;
+            for (int i = 0; i < nblocks; ++i) {
+                ACC v = sums[i];
+                sums[i] = s;
+                s += v;
+            }
+        """, [
+            ('sums', 'global', acc, '*sums'),
+            ('nblocks', '', np.int32, 'nblocks'),
+        ])
+
+        mean = self.blockwise(ctx, dimension, """
+            ACC s = sums[__id];
+            int stop = min(__in_offset + IN_BLOCK_SIZE, n);
+            for (int i = __in_offset; i < stop; ++i) {
+                if (i > 0) {
+                    s += a[i*DIMENSION+Y];
+                }
+                b[i*DIMENSION+Y] = i == 0 ? 0.0f : (float)(s/(i+1));
+                TIME_AXIS(a, b, i);
+            }
+        """, [
+            ('a', 'global const', np.float32, '*a'),
+            ('b', 'global', np.float32, '*b'),
+            ('sums', 'global const', acc, '*sums'),
+            ('n', '', np.int32, 'n'),
+        ], in_blocksize=self.BLOCK_SIZE)
+
+        return block_sums, scan, mean, np.dtype(acc)
+
+    def enqueue(self, queue, src, dst, n, dimension):
+        block_sums, scan, mean, acc = self.kernels(queue.context, dimension)
+        nblocks = (n + self.BLOCK_SIZE - 1)//self.BLOCK_SIZE
+        sums = cl.Buffer(queue.context, cl.mem_flags.READ_WRITE, nblocks*acc.itemsize)
+        block_sums(queue, nblocks, src, sums, np.int32(n))
+        scan(queue, 1, sums, np.int32(nblocks))
+        mean(queue, nblocks, src, dst, sums, np.int32(n))
+
+class FFTMagnitude(OpenCLTransformation):
+    """
+    util.fft1d (power=False) and util.psd (power=True) by
+    a radix-2 stockham fft. the kernels only transform power
+    of two number of samples, other lengths are transformed by
+    the numpy fallback (see supports()) so no samples are
+    dropped.
+
+    the sample spacing is read from the x-component of the
+    first two samples (2d data), 1d data has spacing 1.
+    """
+    def __init__(self, power=False):
+        super(FFTMagnitude, self).__init__()
+        self.power = power
+        self.fallback = util.psd() if power else util.fft1d()
+
+    def supports(self, n):
+        return n > 1 and not n & (n-1)
+
+    def output_length(self, n):
+        return n//2
+
+    def __call__(self, queue, data):
+        if not self.supports(len(data)):
+            data = np.asarray(data, dtype=np.float32)
+            if data.shape[1] == 1:
+                data = np.column_stack((np.arange(len(data), dtype=np.float32), data[:, 0]))
+            return self.fallback(data)
+        return super(FFTMagnitude, self).__call__(queue, data)
+
+    def output_dimension(self, dimension):
+        return 2
+
+    def build(self, ctx, dimension):
+        pack = self.blockwise(ctx, dimension, """
+            c[__id] = (float2)(a[__id*DIMENSION+Y], 0.0f);
+        """, [
+            ('a', 'global const', np.float32, '*a'),
+            ('c', 'global', 'float2', '*c'),
+        ])
+
+        stage = self.blockwise(ctx, dimension, """
+            int k = __id & (ns-1);
+            float2 u = c_in[__id];
+            float2 v = c_in[__id+nhalf];
+            ACC angle = -PI*(ACC)k/(ACC)ns;
+            float cs = (float)cos(angle);
+            float sn = (float)sin(angle);
+            v = (float2)(v.x*cs - v.y*sn, v.x*sn + v.y*cs);
+            int j = ((__id-k) << 1) + k;
+            c_out[j] = u + v;
+            c_out[j+ns] = u - v;
+        """, [
+            ('c_in', 'global const', 'float2', '*c_in'),
+            ('c_out', 'global', 'float2', '*c_out'),
+            ('ns', '', np.int32, 'ns'),
+            ('nhalf', '', np.int32, 'nhalf'),
+        ], extra='#define PI {}'.format('M_PI' if accumulator_dtype(ctx.devices[0]) == np.float64 else 'M_PI_F'))
+
+        magnitude = self.blockwise(ctx, dimension, """
+            float2 v = c[__id];
+            float p = v.x*v.x + v.y*v.y;
+            b[__id*2] = __id*x_step;
+            b[__id*2+1] = power ? scale*p : scale*sqrt(p);
+        """, [
+            ('c', 'global const', 'float2', '*c'),
+            ('b', 'global', np.float32, '*b'),
+            ('x_step', '', np.float32, 'x_step'),
+            ('scale', '', np.float32, 'scale'),
+            ('power', '', np.int32, 'power'),
+        ])
+
+        return pack, stage, magnitude
+
+    def enqueue(self, queue, src, dst, n, dimension):
+        if not self.supports(n):
+            raise ValueError('FFTMagnitude kernels need a power of two number of samples, got {}'.format(n))
+
+        pack, stage, magnitude = self.kernels(queue.context, dimension)
+
+        time_step = 1.0
+        if dimension == 2:
+            head = np.empty(4, dtype=np.float32)
+            cl.enqueue_copy(queue, head, src)
+            time_step = abs(float(head[2]) - float(head[0])) or 1.0
+
+        c_in = cl.Buffer(queue.context, cl.mem_flags.READ_WRITE, n*8)
+        c_out = cl.Buffer(queue.context, cl.mem_flags.READ_WRITE, n*8)
+        pack(queue, n, src, c_in)
+
+        ns = 1
+        while ns < n:
+            stage(queue, n//2, c_in, c_out, np.int32(ns), np.int32(n//2))
+            c_in, c_out = c_out, c_in
+            ns *= 2
+
+        if self.power:
+            x_step = 1.0/(n*time_step)
+            scale = 1.0/(n*time_step)
+        else:
+            x_step = 1.0/time_step/(n//2-1) if n > 2 else 0.0
+            scale = 2.0/n
+
+        magnitude(queue, n//2, c_in, dst, np.float32(x_step), np.float32(scale), np.int32(self.power))
@@ -1,27 +1,48 @@
 from gllib.buffer import VertexBuffer
-from gllib.plot.domain import util
+from gllib.plot.domain import util, online, opencl, worker
+from gllib.plot.domain import Domain, NumpyDomain, RingBufferDomain
 from OpenGL.GL import * 
 import numpy as np 
 from functools import partial
-from gllib.plot import get_opencl_queue, plot_warn
+from collections import OrderedDict
+from gllib import texture
+from gllib.plot import get_opencl_queue, plot_warn, plot_info
+import pyopencl as cl
 
 # registred transfromations
 total_mean = lambda d: _find_transformation('total_mean')(d)
 fft1d = lambda d: _find_transformation('fft1d')(d)
 psd = lambda d: _find_transformation('psd')(d)
-moving_avarage = lambda d: _find_transformation('moving_avarage')(d)
+moving_avarage = lambda d, *args, **kwargs: _find_transformation('moving_avarage')(d, *args, **kwargs)
+ema = lambda d, *args, **kwargs: _find_transformation('ema')(d, *args, **kwargs)
+variance = lambda d: _find_transformation('variance')(d)
+moving_variance = lambda d, *args, **kwargs: _find_transformation('moving_variance')(d, *args, **kwargs)
+decimate = lambda d, *args, **kwargs: _find_transformation('decimate')(d, *args, **kwargs)
+diff = lambda d: _find_transformation('diff')(d)
+map_expression = lambda d, expression: _find_transformation('map_expression')(d, expression)
+
+# online transformations (see OnlineDomain)
+running_mean = lambda d, **kwargs: OnlineDomain(d, online.RunningMean(), **kwargs)
+running_variance = lambda d, **kwargs: OnlineDomain(d, online.RunningMean(variance=True), **kwargs)
+online_moving_avarage = lambda d, nsamples=50, **kwargs: OnlineDomain(d, online.MovingAverage(nsamples), **kwargs)
+welch_psd = lambda d, nperseg=256, overlap=0.5, detrend='constant', **kwargs: OnlineDomain(d, online.WelchPSD(nperseg, overlap, detrend=detrend), **kwargs)
+
+# transformations which are routed to OpenCLDomain if an opencl
+# queue is configured. the fft kernels (fft1d, psd) are not verified
+# on a device yet, use OpenCLDomain.fft1d/psd explicitly.
+OPENCL_TRANSFORMATIONS = ('total_mean', 'moving_avarage', 'map_expression')
 
 def _find_transformation(transformation):
     """
     finds a transformation domain by checking
     if there are gpu devices available and if so 
-    then check if there is an implementation on the gpu.
-    otherwise use PythonDomain
+    then check if there is an implementation on the gpu
+    (see OPENCL_TRANSFORMATIONS). otherwise use PythonDomain
     """
     had_gpu_device = False
     cl_queue = get_opencl_queue()
-    if cl_queue is not None and hasattr(OpenCLDomain, transformation):
-        return partial(getattr(OpenCLDomain, transformation), opencl_device)
+    if cl_queue is not None and transformation in OPENCL_TRANSFORMATIONS:
+        return partial(getattr(OpenCLDomain, transformation), cl_queue)
 
     had_gpu_device = cl_queue is not None 
     if not had_gpu_device:
@@ -34,20 +55,72 @@ def _find_transformation(transformation):
 
     raise NameError('unkown transformation "{}"'.format(transformation))
 
+def _apply_stages(data, transformations):
+    """
+    applies the transformations one after another and
+    returns the list of intermediate results
+    """
+    results = []
+    for transformation in transformations:
+        data = transformation(data)
+        results.append(data)
+    return results
+
 class PythonDomain(object):
     """
     domain which enables to define a python
     transformation for a given domain. This domain
     enables to quickly use existing transformations
     like FFT from the scipy library and so on.
+
+    transformations are lazy: the result is memoized per
+    (source version, offset, length) in a small lru cache
+    (cache_size entries) and only uploaded when it changed.
+    the source version is taken from
+
+      - another PythonDomain: the chain is evaluated on the host
+        (fused), no stage between is uploaded or read back.
+            psd(moving_avarage(domain))
+      - a domain with version and host data (e.g. NumpyDomain,
+        RingBufferDomain): the host data is used directly.
+      - any other domain is read back from its vbo. if it
+        supports pull_data_async() the readback is asynchronous:
+        transform() issues a readback and consumes it on a later
+        frame, so rendering never waits for the gpu. the first
+        transform() blocks since there is no data yet. a readback
+        which differs from the last one is a new version.
+
+    with workers (a gllib.plot.domain.worker.TransformWorkers or
+    True for the shared worker.WORKERS) the transformations are
+    evaluated by worker threads. the last result stays visible
+    until the job of the newest request is done. only the first
+    transform() waits for its job.
+
+        graph = Line2d(PythonDomain.psd(domain, workers=True))
     """
-    def __init__(self, domain, transformation):
+    CACHE_SIZE = 4
+
+    def __init__(self, domain, transformation, async_readback=True, cache_size=None, workers=None):
         self.domain = domain 
         self.transformation = transformation
+        self.workers = worker.WORKERS if workers is True else workers
         self.offset = 0
+        self.async_readback = async_readback and hasattr(domain, 'pull_data_async')
+        self.cache_size = cache_size or self.CACHE_SIZE
+        # incremented when the transformed data changes
+        self.version = 0
         self._vbo = None
         self._transformed = False 
         self._transformed_data = None 
+        self._uploaded_key = None
+        self._cache = OrderedDict()
+        self._future = None
+        self._domain_data = None
+        self._readback_version = 0
+        self._host_source = False
+        # version of the source when it was last resolved
+        self._source_version = None
+        self._jobs = []
 
         self.dimension = domain.dimension
 
@@ -63,38 +136,563 @@ class PythonDomain(object):
         
         return self._vbo.gl_vbo_id
 
+    @property
+    def data(self):
+        return self._transformed_data
+
+    def has_pending_updates(self):
+        """
+        whether the source (or a source of it) changed since
+        the last transform() or a result is still pending
+        """
+        if self._jobs:
+            return True
+        if isinstance(self.domain, PythonDomain):
+            return self.domain.has_pending_updates()
+        if getattr(self.domain, 'version', None) != self._source_version:
+            return True
+        if hasattr(self.domain, 'has_pending_updates') and self.domain.has_pending_updates():
+            return True
+        return self._future is not None
+
     def transform(self, offset=0, length=None):
-        domain_data = self.domain.pull_data(offset, length)
+        """
+        evaluates the transformation and uploads the
+        result if it has changed.
+        """
+        if self.workers is not None:
+            self._transform_async(offset, length)
+            return
+
+        key, data = self.evaluate(offset, length)
+        self._upload(key, data)
+
+    def _transform_async(self, offset, length):
+        """
+        uploads the newest finished job and submits
+        a job if the requested key is not available.
+        """
+        self._consume_jobs()
+
+        key, load, stages = self._resolve(offset, length)
+        if not stages:
+            self._upload(key, load())
+            return
+
+        if key == self._uploaded_key or any(job.key == key for job in self._jobs):
+            return
+
+        data = load()
+        if not isinstance(stages[0][0].domain, PythonDomain):
+            # source host data may be changed in place (e.g. NumpyDomain.update)
+            data = np.array(data)
+
+        job = self.workers.submit(self, key, _apply_stages, data, [stage.transformation for stage, _ in stages])
+        job.stages = stages
+        self._jobs.append(job)
+
+        if self._transformed_data is None:
+            # nothing to draw yet
+            job.result()
+            self._consume_jobs()
+
+    def _consume_jobs(self):
+        jobs = self._jobs
+        self._jobs = [job for job in jobs if not job.done()]
+        finished = [job for job in jobs if job.done() and not job.dropped]
+        if not finished:
+            return
+
+        # results of older jobs are still cached
+        for job in finished:
+            for (stage, stage_key), data in zip(job.stages, job.result()):
+                stage._store(stage_key, data)
+
+        job = finished[-1]
+        self._upload(job.key, job.result()[-1])
+
+    def _upload(self, key, data):
+        if key == self._uploaded_key:
+            return
+
+        self._uploaded_key = key
         self._transformed = True
-        self._transformed_data = self.transformation(domain_data)
+        self._transformed_data = data
+        self.version += 1
 
         if self._vbo is None:
             self._vbo = VertexBuffer.from_numpy(self._transformed_data)
+        else:
+            self._vbo.buffer_data(self._transformed_data)
+
+    def evaluate(self, offset=0, length=None):
+        """
+        returns (key, data) of the transformed host data
+        where key identifies the source version and window.
+        """
+        key, load, stages = self._resolve(offset, length)
+        data = load()
+        for stage, stage_key in stages:
+            data = stage._store(stage_key, stage.transformation(data))
+        return key, data
+
+    def _resolve(self, offset, length):
+        """
+        returns (key, load, stages). stages is the list of
+        (PythonDomain, key) which are not cached, innermost
+        first. load() returns the input of the first stage or
+        the result if there is nothing left to evaluate. the
+        source data is only materialized by load().
+        """
+        if isinstance(self.domain, PythonDomain):
+            source_key, load, stages = self.domain._resolve(offset, length)
+        else:
+            (source_key, load), stages = self._source(offset, length), []
+
+        key = (source_key, offset, length)
+        if key in self._cache:
+            data = self._cache.pop(key)
+            self._cache[key] = data
+            return key, lambda: data, []
+        return key, load, stages + [(self, key)]
+
+    def _store(self, key, data):
+        self._cache[key] = data
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return data
+
+    def _source(self, offset, length):
+        """
+        returns (key, load) of the source. domain.data may
+        copy the data (RingBufferDomain) so it is not touched
+        until load() is called on a cache miss.
+        """
+        domain = self.domain
+        self._source_version = getattr(domain, 'version', None)
+        if not self._host_source:
+            # a domain without host data is read back until it has some
+            self._host_source = hasattr(domain, 'version') and getattr(domain, 'data', None) is not None
+
+        if self._host_source:
+            def load():
+                data = domain.data[offset:]
+                return data[:length] if length is not None else data
+            return (id(domain), domain.version), load
+
+        key, data = self._read_source(offset, length)
+        return key, lambda: data
+
+    def _read_source(self, offset, length):
+        """
+        reads the source vbo back. a readback which differs
+        from the last one increments the readback version.
+        """
+        if not self.async_readback:
+            self._accept_readback(self.domain.pull_data(offset, length))
+            return ('readback', self._readback_version), self._domain_data
 
-        self._vbo.buffer_data(self._transformed_data)
+        if self._future is None:
+            self._future = self.domain.pull_data_async(offset, length)
+
+        if self._domain_data is None or self._future.done():
+            domain_data = self._future.result()
+            self._future = None
+            if self._accept_readback(domain_data):
+                # data is changing. keep reading back.
+                self._future = self.domain.pull_data_async(offset, length)
+
+        return ('readback', self._readback_version), self._domain_data
+
+    def _accept_readback(self, domain_data):
+        if self._domain_data is not None and np.array_equal(domain_data, self._domain_data):
+            return False
+        self._domain_data = domain_data
+        self._readback_version += 1
+        return True
 
     @classmethod
-    def total_mean(cls, domain):
-        return cls(domain, util.total_mean()) 
+    def total_mean(cls, domain, **kwargs):
+        return cls(domain, util.total_mean(), **kwargs)
 
     @classmethod
-    def fft1d(cls, domain):
-        return cls(domain, util.fft1d()) 
+    def fft1d(cls, domain, **kwargs):
+        return cls(domain, util.fft1d(), **kwargs)
 
     @classmethod
-    def psd(cls, domain):
-        return cls(domain, util.psd()) 
+    def psd(cls, domain, **kwargs):
+        return cls(domain, util.psd(), **kwargs)
 
     @classmethod
-    def moving_avarage(cls, domain):
-        return cls(domain, util.moving_avarage()) 
+    def moving_avarage(cls, domain, nsamples=50, **kwargs):
+        return cls(domain, util.moving_avarage(nsamples), **kwargs)
 
+    @classmethod
+    def ema(cls, domain, alpha=0.1, **kwargs):
+        return cls(domain, util.ema(alpha), **kwargs)
 
+    @classmethod
+    def variance(cls, domain, **kwargs):
+        return cls(domain, util.variance(), **kwargs)
+
+    @classmethod
+    def moving_variance(cls, domain, nsamples=50, **kwargs):
+        return cls(domain, util.moving_variance(nsamples), **kwargs)
+
+    @classmethod
+    def decimate(cls, domain, factor=10, **kwargs):
+        return cls(domain, util.decimate(factor), **kwargs)
 
     @classmethod
-    def map_domain(cls, domain, mapper):
-        return cls(domain, util.map_domain(mapper))
+    def diff(cls, domain, **kwargs):
+        return cls(domain, util.diff(), **kwargs)
+
+    @classmethod
+    def map_domain(cls, domain, mapper, vectorized=False, **kwargs):
+        return cls(domain, util.domain_mapper(mapper, vectorized), **kwargs)
+
+class OnlineDomain(object):
+    """
+    domain which feeds the samples appended to its source
+    since the last frame into an online transformation
+    (see gllib.plot.domain.online). so the cost per frame
+    only depends on the number of new samples.
+
+    the new samples are taken from
+      - domains with tail() (RingBufferDomain)
+      - domains with version and data (NumpyDomain). the data
+        is assumed to be append only: if the data did not grow
+        but changed or shrank the transformation is reset.
+
+    streaming outputs are appended to a RingBufferDomain of
+    capacity samples (default: capacity of the source or
+    DEFAULT_CAPACITY). outputs which replace the whole result
+    (WelchPSD) are stored in a NumpyDomain.
+
+    ..code:
+        live = RingBufferDomain(100000)
+        graph = Line2d(transformation.welch_psd(live, nperseg=1024))
+
+    """
+    DEFAULT_CAPACITY = 2**20
+
+    def __init__(self, domain, transformation, capacity=None):
+        self.domain = domain
+        self.transformation = transformation
+        self.offset = 0
+        self._processed = 0
+        self._source_version = None
+        self.output = self._create_output(capacity)
+
+    def _create_output(self, capacity):
+        if self.transformation.replaces:
+            # the layout of result() must be known before
+            # the first samples arrive.
+            self.transformation.dimension = self.domain.dimension
+            return NumpyDomain(self.transformation.result())
+        capacity = capacity or getattr(self.domain, 'capacity', None) or self.DEFAULT_CAPACITY
+        return RingBufferDomain(capacity, dimension=self.domain.dimension)
+
+    def __len__(self):
+        return len(self.output)
+
+    def __getattr__(self, name):
+        # gl_vbo_id, dimension, data, get_draw_ranges, ...
+        if name == 'output':
+            raise AttributeError(name)
+        return getattr(self.output, name)
+
+    def has_pending_updates(self):
+        """
+        True if the source has samples which were not processed
+        """
+        if hasattr(self.domain, 'tail'):
+            return self.domain.total != self._processed
+        return self.domain.version != self._source_version
+
+    def transform(self, offset=0, length=None):
+        rows = self._tail()
+        if rows is None or not rows.shape[0]:
+            return
+
+        if self.transformation.replaces:
+            self.transformation.process(rows)
+            self.output.data = self.transformation.result()
+        else:
+            self.output.append(self.transformation.process(rows))
+
+    def _reset(self):
+        self.transformation.reset()
+        self._processed = 0
+        if not self.transformation.replaces:
+            self.output.clear()
+
+    def _tail(self):
+        """
+        returns the samples which were not processed yet
+        """
+        domain = self.domain
+        if hasattr(domain, 'tail'):
+            if domain.total < self._processed:
+                self._reset()
+            rows = domain.tail(self._processed)
+            self._processed = domain.total
+            return rows
+
+        if domain.version == self._source_version:
+            return None
 
-class OpenCLDomain():
-    def __init__(self, queue, transformation):
-        pass
\ No newline at end of file
+        data = domain.data
+        if data.shape[0] < self._processed or data.shape[0] == self._processed:
+            self._reset()
+
+        self._source_version = domain.version
+        rows = data[self._processed:]
+        self._processed = data.shape[0]
+        return rows
+
+class SpectrogramDomain(OnlineDomain):
+    """
+    field domain (see gllib.plot.field.Field) of the short
+    time fourier transform (online.STFT) of a streaming domain.
+
+    the spectra are the columns of a CircularTexture of
+    columns x (nperseg//2+1) texels: each transform() uploads
+    the spectra of the new segments only. the data_kernel of
+    the domain scrolls the texture so the newest spectrum is at
+    the right edge and low frequencies are at the bottom.
+
+    ..code:
+        live = RingBufferDomain(2**20, dimension=1)
+        spectrogram = SpectrogramDomain(live, nperseg=512, columns=1024)
+        plotter.graphs['stft'] = Field(spectrogram,
+            top_left=(0, 1), bottom_right=(1, 0),
+            color_scheme=ColorMap('IDL_Hardcandy', colorrange=[-120, 0]))
+    """
+    def __init__(self, domain, nperseg=256, overlap=0.5, columns=512, window='hann', sample_rate=None, decibel=True):
+        self.columns = columns
+        stft = online.STFT(nperseg, overlap, window, sample_rate, decibel)
+        OnlineDomain.__init__(self, domain, stft)
+        self.data_kernel = ScrollingDataKernel(self.output)
+
+    def _create_output(self, capacity):
+        fill = 10*np.log10(self.transformation.floor) if self.transformation.decibel else 0.0
+        return texture.CircularTexture(self.columns, self.transformation.bins, fill=fill)
+
+    @property
+    def gl_texture_id(self):
+        return self.output.gl_texture_id
+
+    @property
+    def dimensions(self):
+        return (self.output.width, self.output.height)
+
+    @property
+    def channels(self):
+        return 1
+
+    def gl_init(self):
+        self.output.gl_init()
+
+    def get_transformation_matrix(self, axis, origin):
+        return np.identity(3).flatten()
+
+    def frequencies(self):
+        return self.transformation.frequencies()
+
+    def transform(self, offset=0, length=None):
+        rows = self._tail()
+        if rows is not None and rows.shape[0]:
+            self.output.write(self.transformation.process(rows))
+
+    def _reset(self):
+        self.transformation.reset()
+        self._processed = 0
+        self.output.clear()
+
+class ScrollingDataKernel():
+    """
+    Field data kernel which samples a CircularTexture such that
+    its newest column is at the right edge. the texture rows
+    are flipped (row 0 at the bottom).
+    """
+    glsl_uniforms = [('float', 'scroll_offset')]
+
+    def __init__(self, circular_texture):
+        self.texture = circular_texture
+
+    def get_uniform_data(self):
+        return {'scroll_offset': float(self.texture.position)/self.texture.width}
+
+    def __str__(self):
+        return 'fragment_color = texture(tex[0], vec2(x.x + scroll_offset, 1.0 - x.y))'
+
+class OpenCLDomain(Domain, object):
+    """
+    domain which runs a transformation of gllib.plot.domain.opencl
+    on the opencl device of queue.
+
+      - gl sharing: if the opencl context shares objects with the
+        gl context the source vbo and the result vbo are acquired
+        by opencl, so the data never leaves the gpu.
+      - host staging otherwise: the host data of the source (or a
+        readback of its vbo) is copied to the device and the result
+        is uploaded into the result vbo.
+
+    the transformation is only evaluated if the source version
+    (see NumpyDomain.version) or the window changed.
+
+    ..code:
+        queue = get_opencl_queue()
+        graph = Line2d(OpenCLDomain.moving_avarage(queue, domain, 100))
+    """
+    def __init__(self, queue, domain, transformation):
+        self.queue = getattr(queue, 'queue', queue)
+        self.domain = domain
+        self.transformation = transformation
+        self.offset = 0
+        self.dimension = transformation.output_dimension(domain.dimension)
+        # incremented when the transformed data changes
+        self.version = 0
+        # None until the first transform() checked for gl sharing
+        self.gl_sharing = None
+        self._vbo = None
+        self._data = None
+        self._length = 0
+        self._key = None
+        self._gl_buffers = {}
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def gl_vbo_id(self):
+        if self._vbo is None:
+            return None
+        return self._vbo.gl_vbo_id
+
+    @property
+    def data(self):
+        """
+        the transformed host data (host staging only)
+        """
+        return self._data
+
+    def has_pending_updates(self):
+        """
+        whether the source (or a source of it) changed
+        since the last transform()
+        """
+        if self._key is None:
+            return True
+        if hasattr(self.domain, 'has_pending_updates') and self.domain.has_pending_updates():
+            return True
+        return getattr(self.domain, 'version', None) != self._key[0]
+
+    def transform(self, offset=0, length=None):
+        domain = self.domain
+        if hasattr(domain, 'transform'):
+            domain.transform(offset, length)
+
+        version = getattr(domain, 'version', None)
+        key = (version, offset, length)
+        if version is not None and key == self._key:
+            return
+        self._key = key
+
+        if self.gl_sharing is None:
+            self.gl_sharing = self._check_gl_sharing()
+
+        full = not offset and (length is None or length >= len(domain))
+        if (self.gl_sharing and full and self.transformation.supports(len(domain))
+            and np.dtype(getattr(domain, 'dtype', np.float32)) == np.float32):
+            self._transform_shared(len(domain))
+        else:
+            self._transform_staged(offset, length)
+        self.version += 1
+
+    def _check_gl_sharing(self):
+        if not cl.have_gl() or self.domain.gl_vbo_id is None:
+            return False
+        try:
+            self._gl_buffer(self.domain.gl_vbo_id, cl.mem_flags.READ_ONLY)
+        except (cl.Error, cl.LogicError, cl.RuntimeError):
+            plot_info('PERFORMANCE', 'no opencl gl sharing, OpenCLDomain uses host staging.')
+            return False
+        return True
+
+    def _gl_buffer(self, gl_vbo_id, flags):
+        key = (int(gl_vbo_id), flags)
+        if key not in self._gl_buffers:
+            self._gl_buffers[key] = cl.GLBuffer(self.queue.context, flags, int(gl_vbo_id))
+        return self._gl_buffers[key]
+
+    def _result_vbo(self, length):
+        if self._vbo is None:
+            self._vbo = VertexBuffer(length, self.dimension)
+            self._vbo.allocate()
+        elif self._vbo.gl_buffer_length != length:
+            self._release_gl_buffers()
+            self._vbo.allocate(length)
+        self._length = length
+
+    def _release_gl_buffers(self):
+        """
+        the cl objects must be released before the
+        storage of a vbo is reallocated.
+        """
+        for gl_buffer in self._gl_buffers.values():
+            gl_buffer.release()
+        self._gl_buffers = {}
+
+    def _transform_shared(self, n):
+        src_vbo_id = self.domain.gl_vbo_id
+        self._result_vbo(self.transformation.output_length(n))
+        self._data = None
+
+        # all gl commands on the buffers must be done before
+        # opencl acquires them (no cl_khr_gl_event).
+        glFinish()
+        src = self._gl_buffer(src_vbo_id, cl.mem_flags.READ_ONLY)
+        dst = self._gl_buffer(self._vbo.gl_vbo_id, cl.mem_flags.WRITE_ONLY)
+        cl.enqueue_acquire_gl_objects(self.queue, [src, dst])
+        self.transformation.enqueue(self.queue, src, dst, n, self.domain.dimension)
+        cl.enqueue_release_gl_objects(self.queue, [src, dst])
+        self.queue.finish()
+
+    def _transform_staged(self, offset, length):
+        data = getattr(self.domain, 'data', None)
+        if data is None:
+            data = self.domain.pull_data()
+        data = data[offset:]
+        if length is not None:
+            data = data[:length]
+
+        self._data = self.transformation(self.queue, data)
+        if self._vbo is None:
+            self._vbo = VertexBuffer.from_numpy(self._data)
+        else:
+            if self._data.shape[0] > self._vbo.gl_buffer_length:
+                self._release_gl_buffers()
+            self._vbo.buffer_data(self._data)
+        self._length = self._data.shape[0]
+
+    @classmethod
+    def total_mean(cls, queue, domain):
+        return cls(queue, domain, opencl.TotalMean())
+
+    @classmethod
+    def fft1d(cls, queue, domain):
+        return cls(queue, domain, opencl.FFTMagnitude())
+
+    @classmethod
+    def psd(cls, queue, domain):
+        return cls(queue, domain, opencl.FFTMagnitude(power=True))
+
+    @classmethod
+    def moving_avarage(cls, queue, domain, nsamples=50):
+        return cls(queue, domain, opencl.MovingAverage(nsamples))
+
+    @classmethod
+    def map_expression(cls, queue, domain, expression):
+        return cls(queue, domain, opencl.MapExpression(expression))
\ No newline at end of file
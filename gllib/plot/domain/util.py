@@ -1,55 +1,166 @@
 #-*- coding: utf-8 -*-
 """
 domain utilities
-:author: Nicolas 'keksnicoh' Heimann 
+
+each function returns a transformation which maps a (n, dimension)
+numpy array to a new array. the transformations are vectorized
+(cumulative sums, linear filters, reshapes) so they are cheap
+enough to run on every render (domain_mapper only with
+vectorized=True).
+
+for 2d data the first component is x and the second one is y,
+1d data is plain y. the transformations act on y and keep x
+(except decimate and diff which change the sampling).
+
+:author: Nicolas 'keksnicoh' Heimann
 """
-import numpy as np 
+import numpy as np
 from scipy.fftpack import fft
+from scipy.signal import lfilter
+
+def _y(data):
+    """
+    returns the y column as float64 for accurate accumulation
+    """
+    if data.shape[1] not in (1, 2):
+        raise ValueError('invalid shape ...')
+    return data[:, data.shape[1]-1].astype(np.float64)
+
+def _with_y(data, y, x=None):
+    """
+    returns a new array like data with y as last column
+    """
+    new_data = np.empty((y.shape[0], data.shape[1]), dtype=data.dtype)
+    if data.shape[1] == 2:
+        new_data[:, 0] = data[:, 0] if x is None else x
+    new_data[:, -1] = y
+    return new_data
+
+def _time_axis(data):
+    """
+    the x-component of total_mean and moving_avarage:
+    (x[i]-x[i-1])*i with x[0] = 0
+    """
+    x = np.zeros(data.shape[0], dtype=np.float64)
+    x[1:] = np.diff(data[:, 0].astype(np.float64))*np.arange(1, data.shape[0])
+    return x
 
 def total_mean():
+    """
+    running mean of all samples. note that the first
+    sample is zero and does not contribute to the mean.
+    """
     def _transform(data):
-        mean_data = np.zeros_like(data)
-        if mean_data.shape[1] == 2:
-            for i, point in enumerate(data):
-                if i == 0:
-                    mean_data[i][0] = 0
-                    mean_data[i][1] = 0
-                else:
-                    time_step = data[i][0] - data[i-1][0]
-                    mean_data[i][0] = time_step*i
-                    mean_data[i][1] = float(i)/(i+1.0)*mean_data[i-1][1] + 1.0/(i+1.0)*data[i][1];
-            return mean_data 
-        elif mean_data.shape[1] == 1:
-            
-            for i, point in enumerate(data):
-
-                if i == 0:
-                    mean_data[i][0] = 0
-                else:
-                    mean_data[i][0] = float(i)/(i+1.0)*mean_data[i-1][0] + 1.0/(i+1.0)*data[i][0];
-            return mean_data 
-        else:
-            raise ValueError('invalid shape ...')
+        y = _y(data)
+        mean = np.zeros(y.shape[0], dtype=np.float64)
+        mean[1:] = np.cumsum(y[1:])/np.arange(2, y.shape[0]+1)
+        return _with_y(data, mean, _time_axis(data) if data.shape[1] == 2 else None)
     return _transform
 
 def moving_avarage(nsamples=50):
+    """
+    mean of the last nsamples samples. the first sample
+    is zero and the window fills up during the first
+    nsamples samples.
+    """
+    def _transform(data):
+        y = _y(data)
+        y[0] = 0
+        csum = np.cumsum(y)
+        mean = csum.copy()
+        mean[nsamples:] -= csum[:-nsamples]
+        return _with_y(data, mean/nsamples, _time_axis(data))
+    return _transform
+
+def ema(alpha=0.1):
+    """
+    exponential moving average
+    ema[i] = alpha*y[i] + (1-alpha)*ema[i-1]
+    """
+    def _transform(data):
+        y = _y(data)
+        if not y.shape[0]:
+            return data.copy()
+        # the filter has unit gain so starting from
+        # y[0] is a shift of the filtered signal.
+        return _with_y(data, lfilter([alpha], [1, alpha-1], y - y[0]) + y[0])
+    return _transform
+
+def variance():
+    """
+    cumulative variance of all samples up to i
+    """
     def _transform(data):
-        mean_data = np.zeros_like(data)
-        for i, point in enumerate(data):
-            if i == 0:
-                mean_data[i][0] = 0
-                mean_data[i][1] = 0
-            else:
-                time_step = data[i][0] - data[i-1][0]
-                mean_data[i][0] = time_step*i
-                mean_data[i][1] = mean_data[i-1][1] + data[i][1]/nsamples - mean_data[max(0,i-nsamples)][1]/nsamples;
-                #mean_data[i][1] = float(i)/(i+1.0)*mean_data[i-1][1] + 1.0/(i+1.0)*data[i][1];
-        return mean_data 
+        y = _y(data)
+        y -= y.mean() if y.shape[0] else 0
+        count = np.arange(1, y.shape[0]+1)
+        mean = np.cumsum(y)/count
+        return _with_y(data, np.maximum(np.cumsum(y*y)/count - mean*mean, 0))
     return _transform
 
+def moving_variance(nsamples=50):
+    """
+    variance of the last nsamples samples. the first
+    samples use the samples available so far.
+    """
+    def _transform(data):
+        y = _y(data)
+        y -= y.mean() if y.shape[0] else 0
+        csum = np.cumsum(y)
+        csum2 = np.cumsum(y*y)
+        csum[nsamples:] -= csum[:-nsamples].copy()
+        csum2[nsamples:] -= csum2[:-nsamples].copy()
+        count = np.minimum(np.arange(1, y.shape[0]+1), nsamples)
+        mean = csum/count
+        return _with_y(data, np.maximum(csum2/count - mean*mean, 0))
+    return _transform
+
+def decimate(factor=10):
+    """
+    reduces the samples by factor. each block of factor
+    samples is replaced by its mean (boxcar anti aliasing).
+    """
+    def _transform(data):
+        n = data.shape[0]//factor
+        blocks = data[:n*factor].astype(np.float64).reshape(n, factor, data.shape[1])
+        return blocks.mean(axis=1).astype(data.dtype)
+    return _transform
+
+def diff():
+    """
+    derivative dy/dx (2d data) or differences of y (1d data).
+    x is the midpoint of two samples.
+    """
+    def _transform(data):
+        y = _y(data)
+        if data.shape[1] == 1:
+            return _with_y(data, np.diff(y))
+
+        x = data[:, 0].astype(np.float64)
+        dx = np.diff(x)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dydx = np.where(dx != 0, np.diff(y)/dx, 0)
+        return _with_y(data, dydx, 0.5*(x[1:] + x[:-1]))
+    return _transform
 
-def domain_mapper(mapper):
+def domain_mapper(mapper, vectorized=False):
+    """
+    applies mapper to each row. if vectorized is True mapper
+    is called once with the transposed data (row[0] is the
+    whole x-column, ...) so numpy expressions are evaluated
+    vectorized. the mapper must then return the columns:
+
+    ..code:
+        domain_mapper(lambda row: (row[0], 2*row[1] + 1), vectorized=True)
+    """
     def _mapper(data):
+        if vectorized:
+            new_data = np.asarray(mapper(data.T))
+            if new_data.shape != data.T.shape:
+                raise ValueError('vectorized mapper returned shape {} but expected {}'.format(
+                    new_data.shape, data.T.shape))
+            return new_data.T.astype(data.dtype)
+
         new_data = np.zeros_like(data)
         for i, row in enumerate(data):
             new_data[i] = mapper(row)
@@ -63,10 +174,10 @@ def fft1d():
         time_step = np.abs(data[1][0]-data[0][0])
         nsamples = len(data)
 
-        yf = 2.0/nsamples * np.abs(fft(data[:,1])[0:0.5*nsamples])
-        xf = np.linspace(0.0, 1.0/time_step, nsamples/2)
+        yf = 2.0/nsamples * np.abs(fft(data[:,1])[0:nsamples//2])
+        xf = np.linspace(0.0, 1.0/time_step, nsamples//2)
 
-        fft_data = np.empty((nsamples/2,2),dtype=np.float32)
+        fft_data = np.empty((nsamples//2,2),dtype=np.float32)
         fft_data[:,0] = xf
         fft_data[:,1] = yf
 
@@ -81,15 +192,15 @@ def psd():
         time_step = np.abs(data[1][0]-data[0][0])
         nsamples = len(data)
 
-        yf = fft(data[:,1])        
-        yf = 1.0/(nsamples*time_step)*(np.abs(yf)**2)[0:0.5*nsamples]
-        xf = np.fft.fftfreq(nsamples, time_step)[0:0.5*nsamples]
+        yf = fft(data[:,1])
+        yf = 1.0/(nsamples*time_step)*(np.abs(yf)**2)[0:nsamples//2]
+        xf = np.fft.fftfreq(nsamples, time_step)[0:nsamples//2]
 
         #np.linspace(0.0, 1.0/time_step, nsamples/2)
 
-        fft_data = np.empty((nsamples/2,2),dtype=np.float32)
+        fft_data = np.empty((nsamples//2,2),dtype=np.float32)
         fft_data[:,0] = xf
         fft_data[:,1] = yf
 
         return fft_data
-    return _transform
\ No newline at end of file
+    return _transform
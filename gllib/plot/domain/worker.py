@@ -0,0 +1,165 @@
+#-*- coding: utf-8 -*-
+"""
+worker threads which evaluate domain transformations
+off the render thread.
+
+    job = WORKERS.submit(owner, key, function, *args)
+    ...
+    if job.done():
+        data = job.result()
+
+jobs are queued per owner (e.g. a PythonDomain). a job which
+is submitted while the last job of the same owner is still
+queued replaces it (the queued job is dropped), so a fast
+stream of requests (panning) does not pile up.
+
+threads are used instead of processes: the transformations
+are closures (not picklable) and numpy/scipy release the GIL
+in the expensive parts (fft, cumsum, lfilter).
+
+:author: Nicolas 'keksnicoh' Heimann
+"""
+from collections import OrderedDict, deque
+from time import time
+import threading
+
+class TransformJob():
+    """
+    pending result of TransformWorkers.submit(). done() does not
+    block, result() waits for the job and raises its exception.
+    a dropped job is done and its result is None.
+    """
+    def __init__(self, key, function, args):
+        self.key = key
+        self.issued = time()
+        self.started = None
+        self.resolved = None
+        self.dropped = False
+        self._function = function
+        self._args = args
+        self._event = threading.Event()
+        self._data = None
+        self._error = None
+
+    def done(self):
+        return self._event.is_set()
+
+    def result(self):
+        self._event.wait()
+        if self._error is not None:
+            raise self._error
+        return self._data
+
+    @property
+    def latency(self):
+        """
+        seconds from submit() until the result was available
+        """
+        if self.resolved is None:
+            return None
+        return self.resolved - self.issued
+
+    def _run(self):
+        self.started = time()
+        try:
+            self._data = self._function(*self._args)
+        except Exception as e:
+            self._error = e
+        self._resolve()
+
+    def _resolve(self):
+        self.resolved = time()
+        self._function = None
+        self._args = None
+        self._event.set()
+
+class TransformWorkers():
+    """
+    pool of daemon threads. the threads are started on the
+    first submit().
+
+    metrics:
+      - queue_depth: number of queued (not running) jobs
+      - running: number of running jobs
+      - submitted, completed, failed, dropped: job counters
+      - latency: mean latency of the last LATENCY_SAMPLES jobs
+    """
+    LATENCY_SAMPLES = 100
+
+    def __init__(self, threads=2):
+        self.threads = threads
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.running = 0
+        self.latencies = deque(maxlen=self.LATENCY_SAMPLES)
+        self._lock = threading.Condition()
+        self._queue = OrderedDict()
+        self._workers = []
+
+    @property
+    def queue_depth(self):
+        return len(self._queue)
+
+    @property
+    def latency(self):
+        latencies = list(self.latencies)
+        return sum(latencies)/len(latencies) if latencies else None
+
+    def stats(self):
+        return {
+            'queue_depth': self.queue_depth,
+            'running': self.running,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'dropped': self.dropped,
+            'latency': self.latency,
+        }
+
+    def submit(self, owner, key, function, *args):
+        """
+        queues function(*args). a queued job of the
+        same owner is dropped.
+        """
+        job = TransformJob(key, function, args)
+        with self._lock:
+            stale = self._queue.pop(id(owner), None)
+            if stale is not None:
+                stale.dropped = True
+                stale._resolve()
+                self.dropped += 1
+
+            self._queue[id(owner)] = job
+            self.submitted += 1
+            self._start()
+            self._lock.notify()
+        return job
+
+    def _start(self):
+        while len(self._workers) < self.threads:
+            thread = threading.Thread(target=self._work)
+            thread.daemon = True
+            thread.start()
+            self._workers.append(thread)
+
+    def _work(self):
+        while True:
+            with self._lock:
+                while not self._queue:
+                    self._lock.wait()
+                _, job = self._queue.popitem(last=False)
+                self.running += 1
+
+            job._run()
+
+            with self._lock:
+                self.running -= 1
+                if job._error is not None:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+                self.latencies.append(job.latency)
+
+WORKERS = TransformWorkers()
@@ -6,8 +6,8 @@ contains classes that plots 2d fields of data
 
 :author: Nicolas 'keksnicoh' Heimann
 """
-from gllib.shader import Program, Shader
-from gllib.buffer import VertexArray, VertexBuffer
+from gllib.shader import Program, Shader, PROGRAMS
+from gllib.buffer import VertexArray, VertexBuffer, ALLOCATION_COUNTER
 from gllib.helper import load_lib_file
 
 import pystache
@@ -42,7 +42,7 @@ class Field():
         self.color_scheme        = color_scheme or ''
         self.initialized         = False
         self.program             = None
-        self.data_kernel         = data_kernel or 'fragment_color = texture(tex[0], x);'
+        self.data_kernel         = data_kernel or getattr(domain, 'data_kernel', None) or 'fragment_color = texture(tex[0], x);'
         self._np_vertex_data     = None
         self._np_texture_data    = None
         self._coord_top_left     = None
@@ -128,10 +128,10 @@ class Field():
         })
 
 
-        self.program = Program()
-        self.program.shaders.append(Shader(GL_VERTEX_SHADER, load_lib_file('glsl/plot2d/field.vert.glsl')))
-        self.program.shaders.append(Shader(GL_FRAGMENT_SHADER, frag_src))
-        self.program.link()
+        self.program = PROGRAMS.program([
+            Shader(GL_VERTEX_SHADER, load_lib_file('glsl/plot2d/field.vert.glsl')),
+            Shader(GL_FRAGMENT_SHADER, frag_src),
+        ])
 
         if hasattr(self.color_scheme, 'get_uniform_data'):
             for uniform in self.color_scheme.get_uniform_data().items():
@@ -143,16 +143,25 @@ class Field():
 
     def update_plotmeta(self, plot_cam, outer_cam, *args, **kwargs):
         # not so nice ... but later refactoring ...
+        # the cameras are set by the plot_camera uniform block
         self.program.uniform('mat_domain', np.identity(3))
-        self.program.uniform('mat_camera', plot_cam)
-        self.program.uniform('mat_outer_camera', outer_cam)
         if hasattr(self.color_scheme, 'get_uniform_data'):
             for uniform in self.color_scheme.get_uniform_data().items():
                 self.program.uniform(*uniform)
         if hasattr(self.data_kernel, 'get_uniform_data'):
             for uniform in self.data_kernel.get_uniform_data().items():
                 self.program.uniform(*uniform)
+    def has_pending_updates(self):
+        return hasattr(self.domain, 'has_pending_updates') and self.domain.has_pending_updates()
+
     def render(self, plotter):
+        # streaming domains (e.g. SpectrogramDomain) upload new data
+        if hasattr(self.domain, 'transform'):
+            self.domain.transform()
+        if hasattr(self.data_kernel, 'get_uniform_data'):
+            for uniform in self.data_kernel.get_uniform_data().items():
+                self.program.uniform(*uniform)
+
         # final rendering
         glActiveTexture(GL_TEXTURE0);
         if self.domain is not None:
@@ -169,6 +178,7 @@ class Field():
     @classmethod
     def create_texture1f(cls, size):
         texture = glGenTextures(1)
+        ALLOCATION_COUNTER.count('texture')
         glBindTexture(GL_TEXTURE_2D, texture);
         glTexImage2D(GL_TEXTURE_2D, 0, GL_RED, size[0], size[1], 0, GL_RED, GL_FLOAT, np.zeros(size[0]*size[1], dtype=np.float32))
         glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
@@ -24,6 +24,22 @@ import re
 #   + cleaner api
 #   - more abstract usage, not so easy in real life ...
 
+# std140 layout of the plot_camera uniform block
+# (see glsl/plot2d/line.geom.glsl)
+PLOT_CAMERA_DTYPE = np.dtype([
+    ('mat_camera', np.float32, 16),
+    ('mat_outer_camera', np.float32, 16),
+])
+
+def plot_camera_buffer():
+    """
+    uniform buffer of the plot_camera block. the plotter
+    updates it once per frame and binds it before the
+    graphs are rendered, so the graphs do not upload the
+    camera matrices themselves.
+    """
+    return UniformBuffer(PLOT_CAMERA_DTYPE, UNIFORM_BLOCK_BINDINGS['plot_camera'])
+
 class Line2d():
     GEOMETRY_SHADER_WIDTH = 1
     """
@@ -39,7 +55,8 @@ class Line2d():
         dotsize=None,
         shift=(0.0,0.0),
         color_scheme='fragment_color=point_color;',
-        label=None):
+        label=None,
+        cull=True):
 
         self.domains = domains
         self.program = None
@@ -63,11 +80,40 @@ class Line2d():
         # all defined domains.
         self._max_offset  = 0
         self._min_length  = 0
+        # visible x-range of the plot camera. domains with
+        # update_view() method are informed about it on render.
+        self._x_range      = None
+        # one vao for each combination of domain vbos. domains
+        # may switch their vbo (e.g. lod levels).
+        self._vertex_arrays = {}
+        # draw only the visible index range if the x-component
+        # is taken from a domain with sorted x values.
+        self.cull = cull
+        self._x_domain_index = None
+        # plot camera axis/origin and plot frame size in pixels
+        self._view = None
+        self._frame_size = None
+        # transform feedback evaluation of the kernel for
+        # adaptive domains (see RealAxis.apply_refinement)
+        self._feedback_program = None
+        self._feedback_arrays = {}
+        self._feedback_buffer = None
+        self._refinement = None
+        self._vertex_source = None
+        self._plotmeta = None
+        # graphs which draw the legend symbols
+        self._legend_graphs = {}
+        self._legend_camera = None
 
     def update_plotmeta(self, plot_cam, outer_cam, axis, origin):
+        self._plotmeta = (plot_cam, outer_cam, axis, origin)
+        self._x_range = (-origin[0], -origin[0]+axis[0])
+        self._view = (tuple(axis), tuple(origin))
+
         # not so nice ... but later refactoring ...
+        # field domains (StructuredDomain) have no trans_d uniform
         for i, domain in enumerate(self.domains):
-            if hasattr(domain, 'get_transformation_matrix'):
+            if hasattr(domain, 'get_transformation_matrix') and not hasattr(domain, 'fields'):
                 matrix = domain.get_transformation_matrix(
                     axis=(axis[0], axis[1]),
                     origin=(origin[0],origin[1]),
@@ -77,45 +123,66 @@ class Line2d():
                 if hasattr(self, 'dot_program'):
                     self.dot_program.uniform('trans_d{}'.format(i), matrix)
 
-        self.program.uniform('mat_camera', plot_cam)
-        self.program.uniform('mat_outer_camera', outer_cam)
-
-
-        if hasattr(self, 'dot_program'):
-            self.dot_program.uniform('mat_camera', plot_cam)
-            self.dot_program.uniform('mat_outer_camera', outer_cam)
-
+                if self._feedback_program is not None:
+                    self._feedback_program.uniform('trans_d{}'.format(i), matrix)
 
     def render_legend_graph(self, plotter, plot_cam, inner_cam, tl, br):
+        if self._legend_camera is None:
+            self._legend_camera = plot_camera_buffer()
+        self._legend_camera.update(mat_camera=inner_cam.get_matrix(), mat_outer_camera=plot_cam.get_matrix())
+        self._legend_camera.bind()
+
         if self.draw_dots == True:
-            domain = NumpyDomain(np.array([
+            graph = self._legend_graph('dots', np.array([
                 float(br[0] - tl[0]) / 2.0 , tl[1] + float(br[1] - tl[1]) / 2.0,
 
 
-            ], dtype=np.float32).reshape(1,2))
-            cls = self.__class__
-            graph = cls(domain, draw_lines=False, draw_dots=True, dotcolor=self.dotcolor, dotsize=8*self.dotsize)
-            graph.init()
+            ], dtype=np.float32).reshape(1,2), draw_lines=False, draw_dots=True, dotcolor=self.dotcolor, dotsize=8*self.dotsize)
             axis        = inner_cam.screensize
             origin      = plot_cam.get_position()
             graph.update_plotmeta(inner_cam.get_matrix(), plot_cam.get_matrix(), inner_cam.screensize, origin)
             graph.render(plotter)
 
         if self.draw_lines == True:
-            domain = NumpyDomain(np.array([
+            graph = self._legend_graph('lines', np.array([
                 -25 + float(br[0] - tl[0]) / 2.0 , 1.000*tl[1] + 1.000*float(br[1] - tl[1]) / 2.0,
                 -24 + float(br[0] - tl[0]) / 2.0 , 1.000*tl[1] + 1.000*float(br[1] - tl[1]) / 2.0,
                 float(br[0] - tl[0]) / 2.0 , 1.000*tl[1] + 1.000*float(br[1] - tl[1]) / 2.0,
                 +24 + float(br[0] - tl[0]) / 2.0 , 1.000*tl[1] + 1.000*float(br[1] - tl[1]) / 2.0,
                 +25 + float(br[0] - tl[0]) / 2.0 , 1.000*tl[1] + 1.000*float(br[1] - tl[1]) / 2.0,
 
-            ], dtype=np.float32).reshape(5,2))
-            cls = self.__class__
-            graph = cls(domain, draw_lines=True, draw_dots=False, color=self.color, width=4*self._width)
-            graph.init()
+            ], dtype=np.float32).reshape(5,2), draw_lines=True, draw_dots=False, color=self.color, width=4*self._width)
             graph.update_plotmeta(inner_cam.get_matrix(), plot_cam.get_matrix(), inner_cam.scaling, (0, 0))
             graph.render(plotter)
 
+    def _legend_graph(self, kind, data, **kwargs):
+        """
+        graph which draws a legend symbol. it is created on
+        the first call, later calls only upload the new data
+        and take over changed colors and sizes.
+        """
+        if kind not in self._legend_graphs:
+            graph = self.__class__(NumpyDomain(data), cull=False, **kwargs)
+            graph.init()
+            self._legend_graphs[kind] = graph
+        else:
+            graph = self._legend_graphs[kind]
+            graph.domains[0].data = data
+            for name, value in kwargs.items():
+                setattr(graph, name, value)
+            graph._init_program_uniforms()
+        return graph
+
+    @property
+    def width(self):
+        return self._width
+
+    @width.setter
+    def width(self, width):
+        self._width = width
+        if self.program is not None:
+            self.program.uniform('width', Line2d.GEOMETRY_SHADER_WIDTH*width)
+
     def set_time(self, time):
         # urgh ... we need a uniform manager :(
 
@@ -123,6 +190,8 @@ class Line2d():
             self.program.uniform('time', time)
         if hasattr(self, 'dot_program') and self.dot_program is not None:
             self.dot_program.uniform('time', time)
+        if self._feedback_program is not None:
+            self._feedback_program.uniform('time', time)
 
     def init(self):
         """
@@ -131,6 +200,45 @@ class Line2d():
         if not type(self.domains) is list:
             self.domains = [self.domains]
 
+        vertex_array, self._vertex_source = self._prepare_domains()
+        self._compile_glsl_programs(self._vertex_source)
+        self._init_program_uniforms()
+
+        self.register_domains(vertex_array)
+        self.initialized = True
+
+    def set_domains(self, domains):
+        """
+        replaces the domains. if the new domains have the same
+        layout (dimensions, fields, transformations) the programs
+        are kept and only the vertex arrays are rebuilt.
+        """
+        if not type(domains) is list:
+            domains = [domains]
+
+        self.domains = domains
+        self._vertex_arrays = {}
+        self._feedback_arrays = {}
+        self._refinement = None
+        self._max_offset = 0
+        if not self.initialized:
+            return
+
+        vertex_array, vertex_source = self._prepare_domains()
+        if vertex_source != self._vertex_source or (self._feedback_program is not None) != self._needs_feedback():
+            self._vertex_source = vertex_source
+            self._compile_glsl_programs(vertex_source)
+            self._init_program_uniforms()
+
+        self.register_domains(vertex_array)
+        if self._plotmeta is not None:
+            self.update_plotmeta(*self._plotmeta)
+
+    def _prepare_domains(self):
+        """
+        initializes the domains and returns the vertex
+        array attributes and the vertex shader source.
+        """
         vertex_array = {}
         shader_pre_compile_vbo = ''
         shader_pre_compile_transformations = ''
@@ -148,8 +256,17 @@ class Line2d():
             if not hasattr(domain, 'gl_vbo_id'):
                 raise TypeError('any domain passed to graph must have gl_vbo_id attribute')
 
+            vertex_array.update(self._domain_attributes(i, domain, domain.gl_vbo_id))
+            if hasattr(domain, 'fields'):
+                # interleaved domain: one attribute per field
+                for name, dimension in domain.fields:
+                    vec_f = ('vec'+str(dimension)) if dimension > 1 else 'float'
+                    shader_pre_compile_vbo += 'in {} in_d{}_{};\n'.format(vec_f, i, name)
+                    shader_pre_compile_transformations += '{vec} d{i}_{name} = in_d{i}_{name};\n'.format(
+                        vec=vec_f, i=i, name=name)
+                continue
+
             vec_d = ('vec'+str(domain.dimension)) if domain.dimension > 1 else 'float'
-            vertex_array['in_d{}'.format(i)] = VertexBuffer(dimension=domain.dimension, gl_vbo_id=domain.gl_vbo_id)
             shader_pre_compile_vbo += 'in {} in_d{};\n'.format(vec_d, i)
 
             if hasattr(domain, 'get_transformation_matrix'):
@@ -180,20 +297,209 @@ class Line2d():
             'COLOR_SCHEME'   : self.color_scheme,
             'COLOR_FUNCTIONS': color_functions
         })
-
-        self._compile_glsl_programs(vertex_source)
-        self._init_program_uniforms()
-
-        self.register_domains(vertex_array)
-        self.initialized = True
+        return vertex_array, vertex_source
 
     def register_domains(self, vertex_array=None):
         if vertex_array is None:
-            vertex_array = dict([
-                ('in_d{}'.format(i), VertexBuffer(dimension=d.dimension, gl_vbo_id=d.gl_vbo_id)) 
-                for i, d in enumerate(self.domains)
-            ])
+            vertex_array = {}
+            for i, domain in enumerate(self.domains):
+                vertex_array.update(self._domain_attributes(i, domain, domain.gl_vbo_id))
         self.vao = VertexArray(vertex_array, self.program.attributes)
+        self._vertex_arrays[self._domain_vbo_ids()] = self.vao
+
+    def _domain_vertex_buffer(self, domain, gl_vbo_id):
+        """
+        vertex buffer description of a domain vbo. domains
+        may store integer components (see NumpyDomain).
+        """
+        return VertexBuffer(
+            dimension=domain.dimension,
+            gl_vbo_id=gl_vbo_id,
+            dtype=getattr(domain, 'dtype', np.float32),
+            normalized=getattr(domain, 'normalized', False))
+
+    def _domain_attributes(self, i, domain, gl_vbo_id):
+        """
+        list of (attribute name, vertex buffer) of domain i.
+        interleaved domains (see StructuredDomain) have one
+        attribute in_d<i>_<field> for each field.
+        """
+        if hasattr(domain, 'get_attribute_buffers'):
+            return [('in_d{}_{}'.format(i, name), buffer)
+                for name, buffer in domain.get_attribute_buffers(gl_vbo_id)]
+        return [('in_d{}'.format(i), self._domain_vertex_buffer(domain, gl_vbo_id))]
+
+    def _domain_vbo_ids(self):
+        return tuple(domain.gl_vbo_id for domain in self.domains)
+
+    def _update_vertex_array(self):
+        """
+        selects the vao which matches the current domain
+        vbos. a new vao is only created for an unkown
+        combination of vbos.
+        """
+        vbo_ids = self._domain_vbo_ids()
+        if vbo_ids in self._vertex_arrays:
+            self.vao = self._vertex_arrays[vbo_ids]
+        else:
+            self.register_domains()
+
+    def _get_vertex_array(self, vbo_ids):
+        """
+        returns the cached vao for a given combination of vbos
+        """
+        if vbo_ids not in self._vertex_arrays:
+            vertex_array = {}
+            for i, (domain, vbo_id) in enumerate(zip(self.domains, vbo_ids)):
+                vertex_array.update(self._domain_attributes(i, domain, vbo_id))
+            self._vertex_arrays[vbo_ids] = VertexArray(vertex_array, self.program.attributes)
+        return self._vertex_arrays[vbo_ids]
+
+    def _draw_batches(self, offset, length):
+        """
+        returns a list of (vao, ranges) to draw. a domain which
+        is split into several vbos (e.g. ChunkedDomain) provides
+        (gl_vbo_id, first, count) by get_draw_chunks(). each chunk
+        is drawn with a vao which binds the chunk vbo.
+        """
+        for i, domain in enumerate(self.domains):
+            if hasattr(domain, 'get_draw_chunks'):
+                vbo_ids = list(self._domain_vbo_ids())
+                batches = []
+                for gl_vbo_id, first, count in domain.get_draw_chunks():
+                    if count > 0:
+                        vbo_ids[i] = gl_vbo_id
+                        batches.append((self._get_vertex_array(tuple(vbo_ids)), [(first, count)]))
+                return batches
+
+        self._update_vertex_array()
+        return [(self.vao, self._draw_ranges(offset, length))]
+
+    def has_pending_updates(self):
+        """
+        whether a domain has new data which was not rendered
+        yet (e.g. a window which was loaded in background).
+        """
+        if self._refinement is not None:
+            return True
+        for domain in self.domains:
+            if hasattr(domain, 'has_pending_updates') and domain.has_pending_updates():
+                return True
+        return False
+
+    def _draw_ranges(self, offset, length):
+        """
+        returns a list of (first, count) ranges to draw.
+        domains which are not stored contiguous (e.g. ring buffers)
+        provide their ranges by get_draw_ranges().
+        """
+        for domain in self.domains:
+            if hasattr(domain, 'get_draw_ranges'):
+                return [r for r in domain.get_draw_ranges() if r[1] > 0]
+
+        return [self._visible_range(offset, length)]
+
+    def _visible_range(self, offset, length):
+        """
+        restricts (offset, length) to the visible x-range if the
+        x-component is plain dX.x of a domain which can find the
+        index range of a x-interval (see NumpyDomain.get_visible_range).
+        a user kernel may modify x so culling is disabled then.
+        """
+        if not self.cull or self._x_range is None or self._x_domain_index is None or self._kernel.strip():
+            return offset, length
+
+        domain = self.domains[self._x_domain_index]
+        if not hasattr(domain, 'get_visible_range'):
+            return offset, length
+
+        x_range = (self._x_range[0] - self.shift[0], self._x_range[1] - self.shift[0])
+        visible = domain.get_visible_range(x_range)
+        if visible is None:
+            return offset, length
+
+        first = max(offset, visible[0])
+        stop = min(offset + length, visible[1])
+        return first, max(0, stop - first)
+
+    def _update_domain_views(self, plotter):
+        """
+        tells the domains which x-range is visible
+        and how many pixels the plot frame has.
+        """
+        if self._x_range is None:
+            return
+
+        pixel_width = None
+        if hasattr(plotter, 'plotframe_size'):
+            self._frame_size = tuple(plotter.plotframe_size)
+            pixel_width = self._frame_size[0]
+
+        for domain in self.domains:
+            if hasattr(domain, 'update_view'):
+                domain.update_view(self._x_range, pixel_width)
+            if hasattr(domain, 'update_frame') and self._frame_size is not None:
+                domain.update_frame(self._frame_size, self._view)
+
+    def _refine_domains(self):
+        """
+        refinement of an adaptive domain (see RealAxis). the kernel
+        is evaluated at the domain samples by transform feedback, the
+        positions are read back asynchronously and passed to the
+        domain when they are available (usually the next frame).
+        only a single domain may be refined since its length changes.
+        """
+        if self._feedback_program is None:
+            return
+
+        domain = self.domains[0]
+        if self._refinement is not None:
+            generation, future, units_per_pixel = self._refinement
+            if not future.done():
+                return
+            self._refinement = None
+            domain.apply_refinement(generation, future.result(), units_per_pixel)
+
+        generation = domain.refinement_request()
+        if generation is not None:
+            units_per_pixel = (
+                float(self._view[0][0])/self._frame_size[0],
+                float(self._view[0][1])/self._frame_size[1])
+            self._refinement = (generation, self._evaluate_kernel(domain), units_per_pixel)
+
+    def _evaluate_kernel(self, domain):
+        """
+        captures gl_Position (x, y, 0, c) of each sample by transform
+        feedback and returns a ReadbackFuture of the (n, 4) positions.
+        """
+        length = len(domain)
+        if self._feedback_buffer is None:
+            self._feedback_buffer = VertexBuffer(length, 4)
+        if self._feedback_buffer.gl_buffer_length < length:
+            self._feedback_buffer.allocate(length)
+
+        vbo_ids = self._domain_vbo_ids()
+        if vbo_ids not in self._feedback_arrays:
+            vertex_array = {}
+            for i, source in enumerate(self.domains):
+                vertex_array.update(self._domain_attributes(i, source, source.gl_vbo_id))
+            self._feedback_arrays[vbo_ids] = VertexArray(vertex_array, self._feedback_program.attributes)
+        vao = self._feedback_arrays[vbo_ids]
+
+        glEnable(GL_RASTERIZER_DISCARD)
+        self._feedback_program.use()
+        self._feedback_program.uniform('shift', self.shift)
+        vao.bind()
+        glBindBufferBase(GL_TRANSFORM_FEEDBACK_BUFFER, 0, self._feedback_buffer.gl_vbo_id)
+        glBeginTransformFeedback(GL_POINTS)
+        glDrawArrays(GL_POINTS, 0, length)
+        glEndTransformFeedback()
+        glBindBufferBase(GL_TRANSFORM_FEEDBACK_BUFFER, 0, 0)
+        vao.unbind()
+        self._feedback_program.unuse()
+        glDisable(GL_RASTERIZER_DISCARD)
+
+        return READBACK.read(self._feedback_buffer.gl_vbo_id, length*16, np.float32, (length, 4))
 
 
     def render(self, plotter):
@@ -206,30 +512,38 @@ class Line2d():
         if GlApplication.DEBUG == True:
             glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
 
-        self._calc_length_offset()
-        length = self.length if self.length is not None else self._min_length
-        offset = self.offset if self.offset is not None else self._max_offset
+        self._update_domain_views(plotter)
+        self._refine_domains()
 
+        # the source window of transformations is only restricted
+        # by an explicit offset/length. the drawn length depends
+        # on the transformed data (e.g. fft halves it).
         for domain in self.domains:
             if hasattr(domain, 'transform'):
-                domain.transform(offset, length)
+                domain.transform(self.offset or 0, self.length)
 
         self._calc_length_offset()
         length = self.length if self.length is not None else self._min_length
         offset = self.offset if self.offset is not None else self._max_offset
 
-        self.vao.bind()
+        draw_batches = self._draw_batches(offset, length)
         if self.draw_lines:
             self.program.use()
             self.program.uniform('shift', self.shift)
-            glDrawArrays(GL_LINE_STRIP_ADJACENCY, offset, length)
+            for vao, draw_ranges in draw_batches:
+                vao.bind()
+                for first, count in draw_ranges:
+                    glDrawArrays(GL_LINE_STRIP_ADJACENCY, first, count)
             self.program.unuse()
 
 
         if self.draw_dots:
             self.dot_program.use()
             self.dot_program.uniform('shift', self.shift)
-            glDrawArrays(GL_POINTS, offset, length)
+            for vao, draw_ranges in draw_batches:
+                vao.bind()
+                for first, count in draw_ranges:
+                    glDrawArrays(GL_POINTS, first, count)
             self.dot_program.unuse()
 
         self.vao.unbind()
@@ -263,7 +577,9 @@ class Line2d():
             #
             self._data_layout = ('d0.x', 'd0.y')
 
-            if len(self.domains) == 1:
+            if hasattr(self.domains[0], 'fields'):
+                self._data_layout = self._default_field_layout(self.domains[0])
+            elif len(self.domains) == 1:
                 if self.domains[0].dimension == 1:
                     self._data_layout = ('d0.x', )
                 else:
@@ -279,7 +595,16 @@ class Line2d():
 
         pre_compiled_code = ''
         data_layout_match = re.compile('^d(\d)\.([xyzw]{0,1})$')
+        field_layout_match = re.compile('^d(\d)\.([A-Za-z_]\w*)(?:\.([xyzw]))?$')
         for i, source in enumerate(self._data_layout):
+            match = field_layout_match.match(source)
+            if match is not None and int(match.group(1)) < len(self.domains) \
+               and hasattr(self.domains[int(match.group(1))], 'fields'):
+                if i == 0:
+                    self._x_domain_index = None
+                pre_compiled_code += '{} = {};\n'.format(['x','y'][i], self._field_source(i, source, match))
+                continue
+
             match = data_layout_match.match(source)
             if match is None:
                 raise ValueError(
@@ -325,10 +650,55 @@ class Line2d():
             if domain_dim == 1:
                 source = 'd{}'.format(domain_id)
 
+            if i == 0:
+                self._x_domain_index = domain_id if glsl_component == 'x' else None
+
             pre_compiled_code += '{} = {};\n'.format(['x','y'][i], source)
 
         return pre_compiled_code
 
+    def _default_field_layout(self, domain):
+        """
+        default data_layout of an interleaved domain: fields x
+        and y, the first two components of the first field or
+        the first two fields.
+        """
+        fields = domain.fields
+        names = [name for name, _ in fields]
+        if 'x' in names and 'y' in names:
+            return ('d0.x', 'd0.y')
+        if fields[0][1] > 1:
+            return ('d0.{}.x'.format(fields[0][0]), 'd0.{}.y'.format(fields[0][0]))
+        if len(fields) > 1:
+            return ('d0.{}'.format(fields[0][0]), 'd0.{}'.format(fields[1][0]))
+        return ('d0.{}'.format(fields[0][0]), )
+
+    def _field_source(self, i, source, match):
+        """
+        glsl expression of d<i>.<field>[.<xyzw>]
+        """
+        domain_id, name, glsl_component = int(match.group(1)), match.group(2), match.group(3)
+        fields = dict(self.domains[domain_id].fields)
+        if name not in fields:
+            raise ValueError(
+                ('Line2d.data_layout {}-component "{}": domain d{} has no field "{}".'
+                + ' available fields: {}').format(
+                ['x','y'][i], source, domain_id, name, ', '.join(fields.keys())))
+
+        dimension = fields[name]
+        if dimension == 1:
+            if glsl_component not in (None, 'x'):
+                raise ValueError('Line2d.data_layout {}-component "{}": field "{}" has only one component.'.format(
+                    ['x','y'][i], source, name))
+            return 'd{}_{}'.format(domain_id, name)
+
+        glsl_component = glsl_component or 'x'
+        if 'xyzw'.index(glsl_component) >= dimension:
+            raise ValueError(
+                ('Line2d.data_layout {}-component "{}": field "{}" with dimension {} has only "{}" available.').format(
+                ['x','y'][i], source, name, dimension, 'xyzw'[0:dimension]))
+        return 'd{}_{}.{}'.format(domain_id, name, glsl_component)
+
     def _calc_length_offset(self):
         lengths = []
         for domain in self.domains:
@@ -353,9 +723,14 @@ class Line2d():
             for uniform in self.color_scheme.get_uniform_data().items():
                 self.program.uniform(*uniform)
 
+    def _needs_feedback(self):
+        return len(self.domains) == 1 and getattr(self.domains[0], 'refine', False)
+
     def _compile_glsl_programs(self, vertex_source):
         """
-        compiles glsl programs
+        compiles glsl programs. graphs with the same vertex
+        source and kernel share the linked programs (see
+        gllib.shader.PROGRAMS).
         """
         vertex_shader = Shader(GL_VERTEX_SHADER, vertex_source, substitutions={
             'KERNEL' : self._kernel+';', #user friendly semicolon :)
@@ -364,7 +739,7 @@ class Line2d():
         fragment_shader = Shader(GL_FRAGMENT_SHADER, load_lib_file('glsl/plot2d/line.frag.glsl'))
 
         try:
-            vertex_shader.compile()
+            self.program = PROGRAMS.program([vertex_shader, geometry_shader, fragment_shader])
 
         except ShaderError as e:
             # try to compile shader without kernel to see whether
@@ -376,21 +751,11 @@ class Line2d():
             except ShaderError as e2:
                 raise e
 
-        program = Program()
-        program.shaders.append(vertex_shader)
-        program.shaders.append(geometry_shader)
-        program.shaders.append(fragment_shader)
-        program.link()
-
-        self.program = program
-
         geometry_shader = Shader(GL_GEOMETRY_SHADER, load_lib_file('glsl/plot2d/dot.geom.glsl'))
         fragment_shader = Shader(GL_FRAGMENT_SHADER, load_lib_file('glsl/plot2d/dot.frag.glsl'))
-        program = Program()
-        program.shaders.append(vertex_shader)
-        program.shaders.append(geometry_shader)
-        program.shaders.append(fragment_shader)
-        program.link()
+        self.dot_program = PROGRAMS.program([vertex_shader, geometry_shader, fragment_shader])
 
-        self.dot_program = program
+        self._feedback_program = None
+        if self._needs_feedback():
+            self._feedback_program = PROGRAMS.program([vertex_shader], feedback_varyings=['gl_Position'])
 
@@ -17,6 +17,7 @@ from gllib.font import FontRenderer as FontRenderer2, AlignedLayout
 from gllib.renderer.font import FontRenderer, RelativeLayout, Text, AbsoluteLayout, SCALE
 from gllib.buffer import VertexBuffer, VertexArray
 from gllib.plot.field import Field
+from gllib.plot.graph import plot_camera_buffer
 from gllib.renderer.shape import ShapeInstance, ShapeRenderer, Rectangle
 import numpy as np
 from collections import OrderedDict
@@ -164,6 +165,8 @@ class Plotter(Controller, object):
         # dstates
         self.render_graphs          = True
         self._graphs_initialized    = False
+        # graph ids and domain versions of the last graph rendering
+        self._rendered_versions     = None
         self._has_rendered          = False
         self._state                 = 0
         self._select_area           = [0,0,0,0]
@@ -173,6 +176,11 @@ class Plotter(Controller, object):
         self._colorlegend_graph     = None
         self._colorlegend_texts = []
 
+        # plot_camera uniform blocks of the graphs
+        # and of the colorlegend
+        self._camera_buffer         = plot_camera_buffer()
+        self._colorlegend_camera    = plot_camera_buffer()
+
         self.xlabel_text = None
         self.ylabel_text = None
         self.title_text = None
@@ -682,8 +690,9 @@ class Plotter(Controller, object):
             )
             self._colorlegend_graph.init()
             plot_camera = self._colorlegend_frame.inner_camera;
-            self._colorlegend_graph.program.uniform('mat_camera', plot_camera.get_matrix())
-            self._colorlegend_graph.program.uniform('mat_outer_camera', self._plotframe.camera.get_matrix())
+            self._colorlegend_camera.update(
+                mat_camera=plot_camera.get_matrix(),
+                mat_outer_camera=self._plotframe.camera.get_matrix())
             self._colorlegend_graph.program.uniform('mat_domain', np.identity(3))
 
             self._colorlegend_axis = axis.Fixed(
@@ -698,6 +707,7 @@ class Plotter(Controller, object):
             self._colorlegend_axis.init()
             self._update_measure_axis()
             self._colorlegend_frame.use()
+            self._colorlegend_camera.bind()
             self._colorlegend_graph.render(self)
             self._colorlegend_frame.unuse()
             length = colorrange_length*(1+2*factor)
@@ -727,7 +737,9 @@ class Plotter(Controller, object):
     def init_graphs(self):
         """
         initializes the graphs if neccessary and
-        updates graph matricies
+        updates graph matricies. the initialization of many
+        graphs is spread over several frames if the window
+        has a frame budget (see GlApplication.within_budget).
         """
         colors = self.color_scheme['graph-colors']
         colors_length = len(colors)
@@ -740,15 +752,22 @@ class Plotter(Controller, object):
             self._plotframe.camera.get_matrix()[0],
             self._plotframe.camera.get_matrix()[5]
         ]
-        for graph in [g for g in self.graphs.values() if not g.initialized]:
+        pending = [g for g in self.graphs.values() if not getattr(g, 'initialized', True)]
+        # colors are assigned to all pending graphs at once so
+        # they do not depend on how the initialization is split.
+        for graph in pending:
             if hasattr(graph, 'color') and graph.color is None:
                 graph.color = hex_to_rgba(colors[graph_color_index%colors_length])
                 graph_color_index+=1
 
+        for i, graph in enumerate(pending):
+            if i > 0 and not GlApplication.within_budget():
+                break
             graph.init()
 
         self._update_graph_matricies()
-        self._graphs_initialized = True
+        self._graphs_initialized = all(getattr(g, 'initialized', True) for g in self.graphs.values())
+        self.render_graphs = True
 
     def _update_xaxis(self):
         """
@@ -870,8 +889,13 @@ class Plotter(Controller, object):
         self._plotframe.inner_camera.set_screensize(self.plotframe_size)
 
     def _update_colorlegend(self):
+        # rebuilt once per frame, after the frame was rendered
         if self.colorlegend is not None:
-            self.init_colorlegend()
+            GlApplication.defer((id(self), 'colorlegend'), self._rebuild_colorlegend)
+
+    def _rebuild_colorlegend(self):
+        self.init_colorlegend()
+        self.invalidate()
 
     def camera_updated(self, camera):
         """
@@ -893,18 +917,25 @@ class Plotter(Controller, object):
         Controller.camera_updated(self, camera)
 
     def _update_graph_matricies(self):
+        # the camera matrices are shared by all graphs through
+        # the plot_camera uniform block. it is uploaded once
+        # when the graphs are rendered next time.
+        plot_camera = self._plotframe.inner_camera;
+        plot_matrix = plot_camera.get_matrix()
+        outer_matrix = self._plotframe.camera.get_matrix()
+        self._camera_buffer.update(mat_camera=plot_matrix, mat_outer_camera=outer_matrix)
+
         for graph in self.graphs.values():
-            if hasattr(graph, 'update_plotmeta'):
+            if hasattr(graph, 'update_plotmeta') and getattr(graph, 'initialized', True):
                 # strech domain a little bit over plot plane boundaries
                 # XXX
                 # check this for static domains
-                plot_camera = self._plotframe.inner_camera;
                 axis        = plot_camera.get_screen_scaling()
                 origin      = plot_camera.get_position()
 
                 graph.update_plotmeta(
-                    plot_camera.get_matrix(),
-                    self._plotframe.camera.get_matrix(),
+                    plot_matrix,
+                    outer_matrix,
                     axis,
                     origin
                 )
@@ -922,21 +953,56 @@ class Plotter(Controller, object):
         self._has_rendered = True
 
     def check_graphs(self):
-        if not self._graphs_initialized:
+        if not self._graphs_initialized or any(not getattr(g, 'initialized', True) for g in self.graphs.values()):
             self.init_graphs()
 
+        if self._graphs_changed():
+            self.render_graphs = True
+
+    def needs_render(self):
+        """
+        whether the plot has changed since the last rendering:
+        camera, input, data of the graphs or the widget.
+        """
+        if Controller.needs_render(self) or self.render_graphs or not self._graphs_initialized \
+           or self._graphs_changed():
+            return True
+        return self.widget is not None and hasattr(self.widget, 'has_pending_updates') \
+            and self.widget.has_pending_updates()
+
+    def _graph_versions(self):
+        """
+        graph ids and the data versions of their domains
+        """
+        versions = []
+        for gid, graph in self.graphs.items():
+            domains = getattr(graph, 'domains', None) or [getattr(graph, 'domain', None)]
+            versions.append((gid, tuple(getattr(domain, 'version', None) for domain in domains)))
+        return versions
+
+    def _graphs_changed(self):
+        # graphs may get new data in background (e.g. async
+        # loading domains). rerender when it arrives.
+        for graph in self.graphs.values():
+            if hasattr(graph, 'has_pending_updates') and graph.has_pending_updates():
+                return True
+        return self._rendered_versions != self._graph_versions()
+
     def render(self):
 
         if self.render_graphs:
             # only render graphs if neccessary
             self._plotframe.use()
+            self._camera_buffer.bind()
 
             if self._debug:
                 glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
 
-            # graph rendering
+            # graph rendering. graphs which are initialized
+            # in a later frame (see init_graphs) are skipped.
             for id, graph in self.graphs.items():
-                graph.render(self)
+                if getattr(graph, 'initialized', True):
+                    graph.render(self)
 
             if self._debug:
                 glPolygonMode(GL_FRONT_AND_BACK, GL_FILL);
@@ -944,6 +1010,7 @@ class Plotter(Controller, object):
             self._plotframe.unuse()
 
             self.render_graphs = False
+            self._rendered_versions = self._graph_versions()
         if self.state == self.STATE_SELECT_AREA:
             cursor = list(self.cursor)
             frame_pos = self.plotframe_position
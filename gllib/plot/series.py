@@ -0,0 +1,228 @@
+#-*- coding: utf-8 -*-
+"""
+multi series plotting.
+
+draws many series of the same length (e.g. the channels of a
+multi channel recorder) with one program and one instanced
+draw call. the y values of all series are stored in one
+buffer which the vertex shader reads as buffer texture, the
+x values are shared by all series.
+
+    graph = MultiLine2d(channels_x_samples, offsets=np.arange(64))
+    graph.update_series(slice(0, 8), color=[1, 0, 0, 1])
+    graph.update_series(3, visible=False)
+
+each series has a color, an offset (x, y) which is added to
+its samples and a visibility. the visible series are stored
+as per instance attributes (see SERIES_DTYPE) and uploaded
+when they change.
+
+:author: Nicolas 'keksnicoh' Heimann
+"""
+from gllib.shader import Shader, PROGRAMS
+from gllib.buffer import VertexArray, VertexBuffer, STREAM_ORPHAN, coalesce_ranges
+from gllib.texture import BufferTexture
+from gllib.helper import load_lib_file
+from gllib.plot.domain import _row_range
+
+import numpy as np
+from OpenGL.GL import *
+
+# per instance attributes of a visible series
+SERIES_DTYPE = np.dtype([
+    ('color', np.float32, 4),
+    ('offset', np.float32, 2),
+    ('index', np.float32),
+])
+
+class MultiLine2d():
+    """
+    instanced line plot of many series.
+
+    data is either an array of shape (series, samples) or a
+    list of domains with the same shape (samples, dimension).
+    for 2d domains the x values are taken from the first domain.
+    x defaults to the sample index.
+    """
+    GEOMETRY_SHADER_WIDTH = 1
+
+    def __init__(self, data, x=None, colors=None, offsets=None, visible=None, width=1, color=None, label=None):
+        if type(data) is list:
+            if not len(data):
+                raise ValueError('MultiLine2d requires at least one series')
+            shapes = set(domain.data.shape for domain in data)
+            if len(shapes) > 1:
+                raise ValueError('all domains must have the same shape, given shapes: {}'.format(
+                    ', '.join(str(shape) for shape in shapes)))
+            if x is None and data[0].data.shape[1] > 1:
+                x = data[0].data[:, 0]
+            data = np.array([domain.data[:, -1] for domain in data])
+
+        if len(data.shape) != 2:
+            raise ValueError('data must have shape (series, samples), given shape: {}'.format(data.shape))
+
+        self.data = np.ascontiguousarray(data, dtype=np.float32)
+        self.x = np.arange(self.samples, dtype=np.float32) if x is None else np.asarray(x, dtype=np.float32)
+        if self.x.shape[0] != self.samples:
+            raise ValueError('x has {} values but the series have {} samples'.format(self.x.shape[0], self.samples))
+
+        self.series = np.zeros(len(self.data), dtype=[
+            ('color', np.float32, 4),
+            ('offset', np.float32, 2),
+            ('visible', np.bool_),
+        ])
+        self.series['visible'] = True
+        self._colors = colors
+        if offsets is not None:
+            offsets = np.asarray(offsets, dtype=np.float32)
+            if len(offsets.shape) == 1:
+                # y offsets
+                self.series['offset'][:, 1] = offsets
+            else:
+                self.series['offset'] = offsets
+        if visible is not None:
+            self.series['visible'] = visible
+
+        self.color = color
+        self.label = label
+        self.draw_lines = True
+        self.draw_dots = False
+        self.initialized = False
+        self.program = None
+        self._width = width
+        self._y_buffer = None
+        self._y_texture = None
+        self._x_buffer = None
+        self._instance_buffer = None
+        self._instances = 0
+        self._series_dirty = True
+        self._dirty_series = []
+        self.vao = None
+
+    @property
+    def samples(self):
+        return self.data.shape[1]
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    @property
+    def width(self):
+        return self._width
+
+    @width.setter
+    def width(self, width):
+        self._width = width
+        if self.program is not None:
+            self.program.uniform('width', MultiLine2d.GEOMETRY_SHADER_WIDTH*width)
+
+    def update_series(self, index, color=None, offset=None, visible=None):
+        """
+        changes color, offset or visibility of the series index
+        (int, slice or index array)
+        """
+        if color is not None:
+            self.series['color'][index] = color
+        if offset is not None:
+            self.series['offset'][index] = offset
+        if visible is not None:
+            self.series['visible'][index] = visible
+        self._series_dirty = True
+
+    def update(self, index, values):
+        """
+        replaces the samples of the series index. the series
+        are stored one after another so a contiguous range of
+        series is uploaded by a single glBufferSubData.
+        """
+        self.data[index] = values
+        self._dirty_series.append(_row_range(index, len(self)))
+
+    def init(self):
+        """
+        creates the program, the buffers and the vao
+        """
+        if self._colors is not None:
+            self.series['color'] = self._colors
+        else:
+            self.series['color'] = self.color or [0, 0, 0, 1]
+
+        self._compile_glsl_program()
+
+        self._y_buffer = VertexBuffer.from_numpy(self.data.reshape((self.data.size, 1)))
+        self._y_texture = BufferTexture(self._y_buffer)
+        self._y_texture.gl_init()
+        self._x_buffer = VertexBuffer.from_numpy(self.x.reshape((self.samples, 1)))
+        self._instance_buffer = VertexBuffer.from_numpy(np.zeros(len(self), dtype=SERIES_DTYPE),
+            streaming=STREAM_ORPHAN)
+        self._upload_series()
+
+        self.vao = VertexArray({
+            'x_value': self._x_buffer,
+            'series_color': self._instance_buffer.field('color', divisor=1),
+            'series_offset': self._instance_buffer.field('offset', divisor=1),
+            'series_index': self._instance_buffer.field('index', divisor=1),
+        }, self.program.attributes)
+
+        self.program.uniform('samples', self.samples)
+        self.program.uniform('y_values', 0)
+        self.program.uniform('width', MultiLine2d.GEOMETRY_SHADER_WIDTH*self._width)
+        self.initialized = True
+
+    def _compile_glsl_program(self):
+        self.program = PROGRAMS.program([
+            Shader(GL_VERTEX_SHADER, load_lib_file('glsl/plot2d/series.vert.glsl')),
+            Shader(GL_GEOMETRY_SHADER, load_lib_file('glsl/plot2d/line.geom.glsl')),
+            Shader(GL_FRAGMENT_SHADER, load_lib_file('glsl/plot2d/line.frag.glsl')),
+        ])
+
+    def _upload_series(self):
+        """
+        uploads the attributes of the visible series
+        """
+        index = np.flatnonzero(self.series['visible'])
+        instances = np.zeros(len(index), dtype=SERIES_DTYPE)
+        instances['color'] = self.series['color'][index]
+        instances['offset'] = self.series['offset'][index]
+        instances['index'] = index
+        if len(instances):
+            self._instance_buffer.buffer_data(instances.reshape((len(index), 1)))
+        self._instances = len(instances)
+        self._series_dirty = False
+
+    def _upload_data(self):
+        for start, stop in coalesce_ranges(self._dirty_series):
+            self._y_buffer.buffer_sub_data(
+                self.data[start:stop].reshape(((stop-start)*self.samples, 1)), start*self.samples)
+        self._dirty_series = []
+
+    def update_plotmeta(self, plot_cam, outer_cam, axis, origin):
+        # the cameras are set by the plot_camera uniform block
+        pass
+
+    def has_pending_updates(self):
+        return self._series_dirty or len(self._dirty_series) > 0
+
+    def render(self, plotter):
+        """
+        draws all visible series by one glDrawArraysInstanced
+        """
+        if not self.initialized:
+            self.init()
+
+        if self._series_dirty:
+            self._upload_series()
+        if self._dirty_series:
+            self._upload_data()
+
+        if not self.draw_lines or not self._instances:
+            return
+
+        self.program.use()
+        glActiveTexture(GL_TEXTURE0)
+        self._y_texture.bind()
+        self.vao.bind()
+        glDrawArraysInstanced(GL_LINE_STRIP_ADJACENCY, 0, self.samples, self._instances)
+        self.vao.unbind()
+        self._y_texture.unbind()
+        self.program.unuse()
@@ -2,7 +2,9 @@ from gllib.util import Event
 from gllib.renderer.shape import ShapeRenderer, ShapeInstance, Rectangle
 from gllib.font import FontRenderer
 from gllib.renderer.window import Framebuffer
-from gllib.renderer.shape import ShapeRenderer, Rectangle, ShapeInstance
+from OpenGL.GL import *
+from collections import OrderedDict
+
 class PlotterWidget():
 
     def attach(self, plotter):
@@ -18,24 +20,39 @@ class PlotterWidget():
         pass
 
 class LegendWidget(PlotterWidget):
+    """
+    legend of the plotter graphs.
+
+    the swatches and labels are rendered into the texture of
+    a framebuffer which is drawn as one textured quad. each
+    entry keeps a signature of what it shows (label, colors,
+    width, lines/dots). run() compares the signatures: the row
+    of a changed entry is cleared and rendered again (scissor),
+    added or removed graphs or a changed legend size render the
+    whole texture. a steady state frame only draws the quad.
+    """
     INNER_SCALING = 16
+    OFFSET_X = 50
+    SKIP_Y = 4
+    FONT_SIZE = 12
     def __init__(self, *args, **kwargs):
         self.font_renderer = None
-        self.graphs = []
+        self.entries = None
         self.size = (400, 100)
         self.framebuffer = None
-        self.shape_renderer = None
+        self.graph_shape_render = None
         self.position = (100, 100) if 'position' not in kwargs else kwargs['position']
-        self.grid = None
-        self.plane = None
+        self._border = []
         self._render_frame = False
+        self._dirty_rows = []
         self._is_clicked = False
         self._relative = (0, 0)
 
     def cursor(self, cursor):
         if self._is_clicked:
             self.position = (cursor[0] - self._relative[0], cursor[1] - self._relative[1])
-            self.plane.position = self.position
+            self.framebuffer.modelview.set_position(*self.position)
+            self.framebuffer.update_modelview()
     def mouse(self, cursor, button, action, mod):
         if not self._is_clicked:
             is_clicked = (
@@ -60,112 +77,191 @@ class LegendWidget(PlotterWidget):
             self.size,
             capture_size=(self.INNER_SCALING * self.size[0], self.INNER_SCALING * self.size[1]),
             clear_color=[1,1,1,1],
+            record_mode=Framebuffer.RECORD_TRACK,
             multisampling = 8,
-            blit_texture=True
-
         )
         self.framebuffer.init()
         self.framebuffer.inner_camera.set_scaling((self.size[0], self.size[1]))
         self.framebuffer.inner_camera.set_screensize((self.INNER_SCALING * self.size[0], self.INNER_SCALING * self.size[1]))
+        self.framebuffer.modelview.set_position(*self.position)
+        self.framebuffer.update_modelview()
         self.font_renderer = FontRenderer()
         self.font_renderer.set_camera(self.framebuffer.inner_camera)
         self.font_renderer.init()
 
-        self.shape_renderer = ShapeRenderer(self.plotter.camera)
-        self.shape_renderer.shapes['default_rectangle'] = Rectangle()
-        self.shape_renderer.gl_init()
-
-        self.plane = ShapeInstance('default_rectangle', **{
-            'size': self.size,
-            'position': self.position,
-            'border': {
-                'size': 1,
-                'color': [0,0,0,1]
-            },
-            'color': [1,1,1,1],
-            'texture': self.framebuffer
-        })
-        self.shape_renderer.draw_instance(self.plane)
-
-    def _create_shape(self):
-        self.font_renderer.clear_texts()
-
-        if len(self.graphs) == 0:
-            self.size = (10, 10)
-            self._render_frame = True
-            return
-
-
-        offsetx = 50
-        yskip = 4
-        maxx = 0
-        y = 0
-        self.grid = []
-        gridy = 0
-        dirty = []
-        for gid, graph in self.graphs.items():
-            label = graph.label if hasattr(graph, 'label') and graph.label is not None else gid
-            text = self.font_renderer.create_text(label, 12, (offsetx, y), enable_simple_tex=True)
-
-            w, h = text.get_boxsize()
-
-            self.grid.append([(0, gridy), (45, gridy + h)])
-            gridy += h
-            dirty.append([graph, y, h+2])
-
-            y += h + yskip
-            maxx = max(maxx, w)
-
-
-        self.size = (maxx + offsetx, y+3+yskip)
-        self.plane.size = self.size
-
-        self.framebuffer.screensize = self.size
-        self.framebuffer.capture_size = (int(self.INNER_SCALING * self.size[0]), int(self.INNER_SCALING * self.size[1]))
-        self.framebuffer.init()
-
-
-        self.font_renderer.set_camera(self.framebuffer.inner_camera)
-
+        # swatches and border. all instances share one
+        # rectangle so there is only one vao.
         self.graph_shape_render = ShapeRenderer(self.framebuffer.inner_camera)
+        self.graph_shape_render.shapes['default_rectangle'] = Rectangle()
         self.graph_shape_render.gl_init()
+        self._border = [ShapeInstance('default_rectangle', color=[0,0,0,1]) for i in range(4)]
+        for instance in self._border:
+            self.graph_shape_render.draw_instance(instance)
+
+    def _label(self, gid, graph):
+        return graph.label if hasattr(graph, 'label') and graph.label is not None else gid
+
+    def _signature(self, gid, graph):
+        """
+        everything an entry shows of a graph
+        """
+        color = getattr(graph, 'color', None)
+        dotcolor = getattr(graph, 'dotcolor', None) or color
+        return (
+            self._label(gid, graph),
+            tuple(color) if color is not None else None,
+            tuple(dotcolor) if dotcolor is not None else None,
+            getattr(graph, 'width', None),
+            getattr(graph, 'draw_lines', True),
+            getattr(graph, 'draw_dots', False),
+        )
 
-        rect = Rectangle()
-
-        for g, y, h in dirty:
-            if g.draw_lines:
-                self.graph_shape_render.draw_instance(ShapeInstance(rect, position=(10,y+6), size=(30,3), color=g.color, ))
-            if g.draw_dots:
-                self.graph_shape_render.draw_instance(ShapeInstance(rect, position=(22,y+4), size=(6,7), color=g.color, ))
+    def _create_entries(self, graphs):
+        """
+        creates the texts and swatches of all graphs
+        """
+        self.font_renderer.clear_texts()
+        for entry in (self.entries or {}).values():
+            self.graph_shape_render.erase_instance(entry['line'])
+            self.graph_shape_render.erase_instance(entry['dot'])
+
+        self.entries = OrderedDict()
+        for gid, graph in graphs.items():
+            signature = self._signature(gid, graph)
+            entry = {
+                'signature': signature,
+                'text': self.font_renderer.create_text(signature[0], self.FONT_SIZE, (self.OFFSET_X, 0), enable_simple_tex=True),
+                'line': ShapeInstance('default_rectangle'),
+                'dot': ShapeInstance('default_rectangle'),
+            }
+            entry['width'], entry['height'] = entry['text'].get_boxsize()
+            self.graph_shape_render.draw_instance(entry['line'])
+            self.graph_shape_render.draw_instance(entry['dot'])
+            self.entries[gid] = entry
+
+        self._layout()
+
+    def _layout(self):
+        """
+        places the entries below each other and
+        resizes the framebuffer to fit them
+        """
+        y = 0
+        maxx = 0
+        for entry in self.entries.values():
+            entry['y'] = y
+            entry['text'].position = (self.OFFSET_X, y)
+            self._update_swatch(entry)
+            y += entry['height'] + self.SKIP_Y
+            maxx = max(maxx, entry['width'])
+
+        size = (maxx + self.OFFSET_X, y+3+self.SKIP_Y) if len(self.entries) else (10, 10)
+        if size != tuple(self.size):
+            self.size = size
+            self.framebuffer.screensize = self.size
+            self.framebuffer.capture_size = (int(self.INNER_SCALING * self.size[0]), int(self.INNER_SCALING * self.size[1]))
+            self.framebuffer.init_capturing()
+            self.font_renderer.set_camera(self.framebuffer.inner_camera)
+            self.graph_shape_render.update_camera()
 
+        width, height = self.size
+        for instance, position, size in zip(self._border,
+            [(0, 0), (0, height-1), (0, 0), (width-1, 0)],
+            [(width, 1), (width, 1), (1, height), (1, height)]):
+            instance.position = position
+            instance.size = size
 
         self._render_frame = True
+        self._dirty_rows = []
+
+    def _update_swatch(self, entry):
+        label, color, dotcolor, width, draw_lines, draw_dots = entry['signature']
+        y, h = entry['y'], entry['height']
+        line_height = min(h, 3*(width or 1))
+        entry['line'].position = (10, y + (h - line_height)/2.0)
+        entry['line'].size = (30, line_height) if draw_lines else (0, 0)
+        entry['line'].color = list(color or [0,0,0,1])
+        entry['dot'].position = (22, y + (h - 7)/2.0)
+        entry['dot'].size = (6, 7) if draw_dots else (0, 0)
+        entry['dot'].color = list(dotcolor or [0,0,0,1])
+
+    def _update_entry(self, entry, signature):
+        """
+        takes over the signature of an entry. returns
+        False if the entry does not fit into its row.
+        """
+        if signature[0] != entry['signature'][0]:
+            entry['text'].chars = signature[0]
+            width, height = entry['text'].get_boxsize()
+            if height != entry['height'] or width + self.OFFSET_X > self.size[0]:
+                entry['width'], entry['height'] = width, height
+                return False
+            entry['width'] = width
+
+        entry['signature'] = signature
+        self._update_swatch(entry)
+        return True
 
     def run(self):
         graphs = self.plotter.graphs
-        if graphs != self.graphs:
-            self.graphs = graphs
-            self._create_shape()
-
-    def update_camera(self):
-        self.shape_renderer.update_camera()
-    def draw(self):
-
-        if self._render_frame:
-            self.font_renderer.set_camera(self.framebuffer.inner_camera)
-
+        if self.entries is None or list(graphs.keys()) != list(self.entries.keys()):
+            self._create_entries(graphs)
+            return
 
-            self.framebuffer.use()
+        relayout = False
+        for gid, graph in graphs.items():
+            entry = self.entries[gid]
+            signature = self._signature(gid, graph)
+            if signature == entry['signature']:
+                continue
+            if self._update_entry(entry, signature):
+                self._dirty_rows.append(entry)
+            else:
+                entry['signature'] = signature
+                relayout = True
+
+        if relayout:
+            self._layout()
+
+    def has_pending_updates(self):
+        """
+        whether an entry differs from its graph
+        """
+        graphs = self.plotter.graphs
+        if self.entries is None or list(graphs.keys()) != list(self.entries.keys()):
+            return True
+        return any(self._signature(gid, graph) != self.entries[gid]['signature']
+            for gid, graph in graphs.items())
 
+    def update_camera(self):
+        self.framebuffer.update_camera(self.plotter.camera)
+
+    def _render_rows(self, rows):
+        """
+        renders the rows (y, height) of the legend into
+        the framebuffer. everything outside is kept.
+        """
+        self.framebuffer.use()
+        glEnable(GL_SCISSOR_TEST)
+        glClearColor(*self.framebuffer.clear_color)
+        capture_height = self.framebuffer.capture_size[1]
+        for y, height in rows:
+            glScissor(
+                0, int(capture_height - self.INNER_SCALING*(y + height)),
+                int(self.framebuffer.capture_size[0]), int(self.INNER_SCALING*height))
+            glClear(GL_COLOR_BUFFER_BIT)
             self.font_renderer.render()
-
             self.graph_shape_render.render()
- #           for i, graph in enumerate(self.graphs.values()):
-
-#                graph.render_legend_graph(self.plotter, self.plotter._plotframe.camera, self.framebuffer.inner_camera, *self.grid[i])
-
-            self.framebuffer.unuse()
+        glDisable(GL_SCISSOR_TEST)
+        self.framebuffer.unuse()
 
+    def draw(self):
+        if self._render_frame:
+            self._render_rows([(0, self.size[1])])
             self._render_frame = False
+            self._dirty_rows = []
+        elif len(self._dirty_rows):
+            self._render_rows([(entry['y'], entry['height'] + self.SKIP_Y) for entry in self._dirty_rows])
+            self._dirty_rows = []
 
-        self.shape_renderer.render()
+        self.framebuffer.render()
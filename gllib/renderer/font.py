@@ -10,6 +10,7 @@ from gllib.helper import load_lib_file
 from gllib.application import GlApplication
 from gllib.matrix import ModelView
 from gllib.util import Event
+from gllib.buffer import ALLOCATION_COUNTER
 
 from OpenGL.GL import *
 from PIL import ImageFont
@@ -179,6 +180,7 @@ class Text():
         """
         if (id(self.font), char) not in Text._TEXTURE_CACHE:
             ID = glGenTextures (1)
+            ALLOCATION_COUNTER.count('texture')
             glBindTexture (GL_TEXTURE_2D, ID)
             glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
             glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
@@ -422,8 +424,11 @@ class FontRenderer(renderer.Renderer):
                 text_coord_data = text.txt_data
 
                 length = len(vertex_data)
-                vao = vao or glGenVertexArrays(1)
+                if vao is None:
+                    vao = glGenVertexArrays(1)
+                    ALLOCATION_COUNTER.count('vertex_array')
                 vbo = glGenBuffers(2)
+                ALLOCATION_COUNTER.count('buffer', 2)
                 glBindVertexArray(vao)
 
                 glBindBuffer(GL_ARRAY_BUFFER, vbo[0])
@@ -14,6 +14,7 @@ from gllib.application import GlApplication
 from gllib.errors import GlError
 from gllib.matrix import ModelView
 from gllib.gltype import *
+from gllib.buffer import ALLOCATION_COUNTER
 from OpenGL.GL import *
 import numpy
 import logging
@@ -208,6 +209,8 @@ class Framebuffer(renderer.Renderer):
         if self._vao is None:
             self._vao = glGenVertexArrays(1)
             self._vbo = glGenBuffers(2)
+            ALLOCATION_COUNTER.count('vertex_array')
+            ALLOCATION_COUNTER.count('buffer', 2)
             self.link_program_to_vbo()
 
         glBindVertexArray(self._vao)
@@ -248,6 +251,7 @@ class Framebuffer(renderer.Renderer):
 
         if self._framebuffer_id is None:
             self._framebuffer_id = glGenFramebuffers(1);
+            ALLOCATION_COUNTER.count('framebuffer')
 
         glBindFramebuffer(GL_DRAW_FRAMEBUFFER, self._framebuffer_id)
         glDrawBuffer(GL_COLOR_ATTACHMENT0)
@@ -264,6 +268,7 @@ class Framebuffer(renderer.Renderer):
 
     def _multisample_texture(self, width, height):
         textid = glGenTextures(1);
+        ALLOCATION_COUNTER.count('texture')
         glBindTexture(GL_TEXTURE_2D_MULTISAMPLE, textid);
         try:
             glTexImage2DMultisample(GL_TEXTURE_2D_MULTISAMPLE, self.multisampling, GL_RGBA, numpy.int32(self.capture_size[0]), numpy.int32(self.capture_size[1]), True );
@@ -288,6 +293,7 @@ class Framebuffer(renderer.Renderer):
             self._record_texture_id = glutil.simple_texture(self.capture_size)
             if self._record_framebuffer_id is None:
                 self._record_framebuffer_id = glGenFramebuffers(1);
+                ALLOCATION_COUNTER.count('framebuffer')
 
             glBindFramebuffer(GL_READ_FRAMEBUFFER, self._record_framebuffer_id)
             glReadBuffer(GL_COLOR_ATTACHMENT0)
@@ -306,6 +312,8 @@ class Framebuffer(renderer.Renderer):
             if self._record_vao is None:
                 self._record_vao = glGenVertexArrays(1)
                 self._record_vbo = glGenBuffers(2)
+                ALLOCATION_COUNTER.count('vertex_array')
+                ALLOCATION_COUNTER.count('buffer', 2)
                 self.link_record_program_to_vbo()
 
             glBindVertexArray(self._record_vao)
@@ -16,6 +16,14 @@ shader library
 programs find out which attributes and uniforms are present in 
 given shaders.
 
+programs of equal shaders (same sources and substitutions) can
+be shared by the process wide cache PROGRAMS:
+
+    program = PROGRAMS.program([vertex_shader, fragment_shader])
+
+each call returns a Program of its own uniform values which uses
+the linked gl program of the first call.
+
 XXX
 - interface blocks
 - register dtypes in some way?
@@ -24,11 +32,20 @@ XXX
 """
 from gllib.errors import GlError
 from gllib.gltype import *
+from gllib.buffer import ALLOCATION_COUNTER
 
 import re
 from OpenGL.GL import * 
 import numpy as np 
 from copy import deepcopy
+import ctypes
+# binding points of uniform blocks which are shared by the
+# programs (see UniformBuffer). the font renderer binds its
+# glyph block to 0.
+UNIFORM_BLOCK_BINDINGS = {
+    'plot_camera': 1,
+}
+
 class ShaderError(GlError): 
     """
     error indicates problems with shaders and programs
@@ -39,6 +56,9 @@ class Shader():
     """
     shader representation
     """
+    # number of compiled shaders
+    compiles = 0
+
     def __init__(self, type, source, substitutions={}):
         """
         initializes shader by given source.
@@ -60,6 +80,17 @@ class Shader():
         matches = re.findall(r'(in|out)\s+(\w+)\s+([\w]+).*?;', source, flags=re.MULTILINE)
         self.attributes = {k: (s, t) for s, t, k in matches}
 
+        self.uniform_blocks = re.findall(r'uniform\s+(\w+)\s*\{', source)
+
+    @property
+    def key(self):
+        """
+        identifies the compiled shader: type,
+        source and substitutions
+        """
+        return (int(self.type), self.source, tuple(sorted(
+            (name, str(code)) for name, code in self.substitutions.items())))
+
     def delete(self):
         """
         deletes gl shader if exists
@@ -77,6 +108,7 @@ class Shader():
             if self.gl_id < 1:
                 self.gl_id = None
                 raise ShaderError('glCreateShader returns an invalid id.')
+            ALLOCATION_COUNTER.count('shader')
 
             source = self.source
             for name, code in self.substitutions.items():
@@ -84,6 +116,7 @@ class Shader():
 
             glShaderSource(self.gl_id, source)
             glCompileShader(self.gl_id)
+            Shader.compiles += 1
 
             error_log = glGetShaderInfoLog(self.gl_id)
             if error_log:
@@ -95,8 +128,23 @@ class Shader():
 class Program():
     """
     opengl render program representation 
+
+    several Program objects may share one linked gl program
+    (see share() and ProgramCache). each of them keeps its own
+    uniform values. when a Program uses the gl program after
+    another one did, all its uniforms are uploaded again. the
+    uniforms it has never set are reset to the defaults of the
+    glsl source.
+
+    uniform blocks listed in UNIFORM_BLOCK_BINDINGS are bound to
+    their binding point when the program is linked. so all programs
+    read the same buffer which is bound once to that point.
     """
     __LAST_USE_GL_ID = None
+    # gl program id -> Program whose uniforms are uploaded
+    __UNIFORM_OWNER = {}
+    # number of linked programs
+    links = 0
 
     def __init__(self):
         """
@@ -106,8 +154,13 @@ class Program():
         self.gl_id      = None
         self.attributes = {}
         self.uniforms   = {}
+        self.uniform_blocks = {}
         self._uniform_changes = {}
         self._uniform_values = {}
+        # outputs captured by transform feedback, e.g. ['gl_Position']
+        self.feedback_varyings = []
+        self._uniform_defaults = {}
+        self._shared = False
 
     def use(self, flush_uniforms=True):
         """
@@ -121,6 +174,11 @@ class Program():
         if self.gl_id != Program.__LAST_USE_GL_ID:
             glUseProgram(self.gl_id)
             Program.__LAST_USE_GL_ID = self.gl_id
+
+        if Program.__UNIFORM_OWNER.get(self.gl_id) is not self:
+            Program.__UNIFORM_OWNER[self.gl_id] = self
+            self._restore_uniforms()
+        else:
             self.flush_uniforms()
 
     def unuse(self):
@@ -135,12 +193,32 @@ class Program():
 
     def delete(self):
         """
-        deletes gl program if exists 
+        deletes gl program if exists. a shared gl
+        program is only deleted by its cache.
         """
         if self.gl_id is not None:
-            glDeleteProgram(self.gl_id)
+            if not self._shared:
+                glDeleteProgram(self.gl_id)
+            Program.__UNIFORM_OWNER.pop(self.gl_id, None)
             self.gl_id = None
 
+    def share(self):
+        """
+        returns a new Program which uses the linked gl
+        program of this one with its own uniform values.
+        """
+        program = Program()
+        program.shaders = self.shaders
+        program.feedback_varyings = self.feedback_varyings
+        program.gl_id = self.gl_id
+        program.attributes = self.attributes
+        program.uniforms = self.uniforms
+        program.uniform_blocks = self.uniform_blocks
+        program._uniform_values = {name: None for name in self.uniforms}
+        program._uniform_defaults = self._uniform_defaults
+        program._shared = True
+        return program
+
     def link(self):
         """
         links all shaders together
@@ -151,11 +229,21 @@ class Program():
         if self.gl_id < 1:
             self.gl_id = None
             raise ShaderError('glCreateProgram returns an invalid id')
+        ALLOCATION_COUNTER.count('program')
 
         for shader in self.shaders:
             shader.compile()
             glAttachShader(self.gl_id, shader.gl_id)
+
+        if self.feedback_varyings:
+            varyings = (ctypes.c_char_p*len(self.feedback_varyings))(
+                *[name.encode('ascii') for name in self.feedback_varyings])
+            glTransformFeedbackVaryings(self.gl_id, len(varyings),
+                ctypes.cast(varyings, ctypes.POINTER(ctypes.POINTER(GLchar))),
+                GL_INTERLEAVED_ATTRIBS)
+
         glLinkProgram(self.gl_id)
+        Program.links += 1
 
         error_log = glGetProgramInfoLog(self.gl_id)
         if error_log:
@@ -164,6 +252,7 @@ class Program():
 
         self._configure_attributes()
         self._configure_uniforms()
+        self._configure_uniform_blocks()
 
         return self.gl_id
 
@@ -171,7 +260,7 @@ class Program():
         if not name in self.uniforms:
             raise ShaderError('unkown uniform "{}"'.format(name))
 
-        if flush or self.gl_id == Program.__LAST_USE_GL_ID:
+        if flush or (self.gl_id == Program.__LAST_USE_GL_ID and Program.__UNIFORM_OWNER.get(self.gl_id) is self):
             self._uniform(name, value)
         else:
             self._uniform_changes[name] = deepcopy(value)
@@ -190,6 +279,37 @@ class Program():
                 self._uniform(name, value)
         self._uniform_changes = {} 
 
+    def _restore_uniforms(self):
+        """
+        uploads all uniform values, the defaults
+        for the uniforms which were never set.
+        """
+        values = dict(self._uniform_defaults)
+        values.update((name, value) for name, value in self._uniform_values.items() if value is not None)
+        values.update(self._uniform_changes)
+        for name, value in values.items():
+            self._uniform(name, value)
+        self._uniform_changes = {}
+
+    def read_uniform_defaults(self):
+        """
+        reads the initial uniform values of the
+        linked program (see _restore_uniforms)
+        """
+        sizes = {'float': 1, 'vec2': 2, 'vec3': 3, 'vec4': 4, 'mat2': 4, 'mat3': 9, 'mat4': 16}
+        self._uniform_defaults = {}
+        for name, (location, type, _) in self.uniforms.items():
+            if location < 0:
+                continue
+            if type in sizes:
+                value = np.zeros(sizes[type], dtype=np.float32)
+                glGetUniformfv(self.gl_id, location, value)
+                self._uniform_defaults[name] = float(value[0]) if type == 'float' else value
+            elif type in ('int', 'bool') or type.startswith('sampler'):
+                value = np.zeros(1, dtype=np.int32)
+                glGetUniformiv(self.gl_id, location, value)
+                self._uniform_defaults[name] = int(value[0])
+
     def _uniform(self, name, value):
         type = self.uniforms[name][1]
         location = self.uniforms[name][0]
@@ -207,7 +327,7 @@ class Program():
         elif type == 'vec2':
             glUniform2f(location, *value)
         elif type == 'vec3':
-            glUniform3f(location, value)
+            glUniform3f(location, *value)
         elif type == 'vec4':
             glUniform4f(location, *value)
         elif type == 'sampler2D':
@@ -216,6 +336,8 @@ class Program():
             glUniform1i(location, value)
         elif type == 'sampler2DArray':
             glUniform1i(location, value)
+        elif type == 'samplerBuffer':
+            glUniform1i(location, value)
         elif type == 'bool':
             glUniform1i(location, value)
         else:
@@ -272,3 +394,85 @@ class Program():
                 self.uniforms[k] = (glGetUniformLocation(self.gl_id, k), u[0], u[1])
                 self._uniform_values[k] = None
 
+    def _configure_uniform_blocks(self):
+        """
+        binds the active uniform blocks to the
+        binding points of UNIFORM_BLOCK_BINDINGS
+        """
+        self.uniform_blocks = {}
+        for shader in self.shaders:
+            for name in shader.uniform_blocks:
+                index = glGetUniformBlockIndex(self.gl_id, name)
+                if index == GL_INVALID_INDEX:
+                    continue
+                self.uniform_blocks[name] = index
+                if name in UNIFORM_BLOCK_BINDINGS:
+                    glUniformBlockBinding(self.gl_id, index, UNIFORM_BLOCK_BINDINGS[name])
+
+
+class ProgramCache():
+    """
+    process wide cache of linked programs keyed by the
+    shader keys (type, source, substitutions) and the
+    transform feedback varyings.
+
+    program() returns a shared Program (see Program.share)
+    so equal graphs, axes and legends compile and link their
+    shaders only once.
+
+    the linked programs belong to the share group of the
+    context they were linked in. the windows of a GlApplication
+    share the gl objects of the first window, so one cache serves
+    all of them. a context outside of that group must not use it.
+
+    metrics:
+      - hits, misses: program() calls which found / did
+        not find a linked program
+      - hit_rate: hits/(hits+misses)
+      - compiles, links: Shader.compiles and Program.links
+        (all shaders and programs, not only cached ones)
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._programs = {}
+
+    @property
+    def hit_rate(self):
+        calls = self.hits + self.misses
+        return float(self.hits)/calls if calls else None
+
+    def stats(self):
+        return {
+            'programs': len(self._programs),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+            'compiles': Shader.compiles,
+            'links': Program.links,
+        }
+
+    def program(self, shaders, feedback_varyings=()):
+        key = tuple(shader.key for shader in shaders) + (tuple(feedback_varyings), )
+        linked = self._programs.get(key)
+        if linked is None:
+            linked = Program()
+            linked.shaders = list(shaders)
+            linked.feedback_varyings = list(feedback_varyings)
+            linked.link()
+            linked.read_uniform_defaults()
+            self._programs[key] = linked
+            self.misses += 1
+        else:
+            self.hits += 1
+        return linked.share()
+
+    def clear(self):
+        """
+        deletes all cached gl programs
+        """
+        for linked in self._programs.values():
+            linked.delete()
+        self._programs = {}
+
+PROGRAMS = ProgramCache()
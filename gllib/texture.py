@@ -11,6 +11,7 @@ opengl texture:
 :author: Nicolas 'keksnicoh' Heimann 
 """
 import numpy as np 
+from gllib.buffer import UPLOAD_COUNTER, ALLOCATION_COUNTER
 from OpenGL.GL import * 
 
 def map_channels(channels):
@@ -28,6 +29,7 @@ def map_channels(channels):
 
 def create_texture(size, texture_format, type=GL_UNSIGNED_BYTE, data=None, gl_texture_parameters=[]):
     gl_texture_id = glGenTextures(1);
+    ALLOCATION_COUNTER.count('texture')
     glBindTexture(GL_TEXTURE_2D, gl_texture_id);
     glTexImage2D(GL_TEXTURE_2D, 0, texture_format, size[0], size[1], 0, texture_format, type, data);
     glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
@@ -70,6 +72,7 @@ class NumpyTexture():
 
     def gl_init(self):
         self.gl_texture_id = glGenTextures(1);
+        ALLOCATION_COUNTER.count('texture')
 
         shape = self.np_data.shape
         if len(shape) == 2:
@@ -106,3 +109,107 @@ class NumpyTexture():
 
 
 
+class CircularTexture():
+    """
+    single channel float texture (width x height) whose
+    columns are written circularly. write() uploads only the
+    new columns by glTexSubImage2D.
+
+    position is the index of the oldest column which is the
+    next one to be written. the texture repeats in s so a
+    shader scrolls the newest column to the right edge by
+    sampling at s + position/width.
+    """
+    def __init__(self, width, height, fill=0.0):
+        self.width = width
+        self.height = height
+        self.fill = fill
+        self.channels = 1
+        self.position = 0
+        self.columns = 0
+        self.gl_texture_id = None
+
+    def gl_init(self):
+        if self.gl_texture_id is not None:
+            return
+
+        self.gl_texture_id = glGenTextures(1)
+        ALLOCATION_COUNTER.count('texture')
+        glBindTexture(GL_TEXTURE_2D, self.gl_texture_id)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_R32F, self.width, self.height, 0, GL_RED, GL_FLOAT,
+            np.full(self.width*self.height, self.fill, dtype=np.float32))
+        glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glTexParameterf(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_REPEAT)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+    def write(self, columns):
+        """
+        writes columns (shape (n, height)) at position. if
+        there are more than width columns only the last
+        width ones are uploaded.
+        """
+        n = columns.shape[0]
+        if not n:
+            return
+
+        self.columns = min(self.width, self.columns + n)
+        if n > self.width:
+            self.position = (self.position + n - self.width) % self.width
+            columns = columns[-self.width:]
+            n = self.width
+
+        glBindTexture(GL_TEXTURE_2D, self.gl_texture_id)
+        written = 0
+        while written < n:
+            count = min(n - written, self.width - self.position)
+            # texel rows are frequency bins: upload the transposed block
+            block = np.ascontiguousarray(columns[written:written+count].T, dtype=np.float32)
+            glTexSubImage2D(GL_TEXTURE_2D, 0, self.position, 0, count, self.height, GL_RED, GL_FLOAT, block)
+            UPLOAD_COUNTER.count(block.nbytes)
+            self.position = (self.position + count) % self.width
+            written += count
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+    def clear(self):
+        self.position = 0
+        self.columns = 0
+        if self.gl_texture_id is not None:
+            glBindTexture(GL_TEXTURE_2D, self.gl_texture_id)
+            glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, self.width, self.height, GL_RED, GL_FLOAT,
+                np.full(self.width*self.height, self.fill, dtype=np.float32))
+            glBindTexture(GL_TEXTURE_2D, 0)
+
+class BufferTexture():
+    """
+    texture view of a VertexBuffer which a shader reads by
+    texelFetch from a samplerBuffer. the data stays in the
+    buffer object so buffer_data() and buffer_sub_data() of
+    the vertex buffer update the texture too.
+
+        values = BufferTexture(VertexBuffer.from_numpy(data))
+        ...
+        glActiveTexture(GL_TEXTURE0)
+        values.bind()
+    """
+    def __init__(self, buffer, internal_format=GL_R32F):
+        self.buffer = buffer
+        self.internal_format = internal_format
+        self.gl_texture_id = None
+
+    def gl_init(self):
+        if self.gl_texture_id is not None:
+            return
+
+        self.gl_texture_id = glGenTextures(1)
+        ALLOCATION_COUNTER.count('texture')
+        glBindTexture(GL_TEXTURE_BUFFER, self.gl_texture_id)
+        glTexBuffer(GL_TEXTURE_BUFFER, self.internal_format, self.buffer.gl_vbo_id)
+        glBindTexture(GL_TEXTURE_BUFFER, 0)
+
+    def bind(self):
+        glBindTexture(GL_TEXTURE_BUFFER, self.gl_texture_id)
+
+    def unbind(self):
+        glBindTexture(GL_TEXTURE_BUFFER, 0)
@@ -21,6 +21,7 @@ XXX
 :author: Nicolas 'keksnicoh' Heimann 
 """
 from gllib.errors import GlError
+from gllib.buffer import BufferRing, STREAM_ORPHAN, STREAM_ROUND_ROBIN, ALLOCATION_COUNTER
 
 from OpenGL.GL import * 
 
@@ -55,6 +56,13 @@ class BufferObject():
     and glGetBufferSubData. TODO: what if one wants to read/update
     only a part of the buffer.
 
+    For buffers which are rewritten every frame (e.g. a uniform
+    buffer) a streaming mode avoids that set() waits for pending
+    draws: streaming=STREAM_ORPHAN orphans the storage on every
+    set(), streaming=STREAM_ROUND_ROBIN writes into one of
+    buffers vbos in turn (see gllib.buffer.BufferRing). In the
+    latter case gl_vbo_id changes after each set().
+
     This class requires an OpenGL context to be active.
     """
     TARGET_TO_STR = {
@@ -112,7 +120,7 @@ class BufferObject():
         data = numpy.arange(*args, **kwargs)
         return cls.to_device(data, target=target)
 
-    def __init__(self, shape=None, dtype=None, target=GL_ARRAY_BUFFER, usage=GL_STATIC_DRAW, allocator=None):
+    def __init__(self, shape=None, dtype=None, target=GL_ARRAY_BUFFER, usage=GL_STATIC_DRAW, allocator=None, streaming=None, buffers=3):
 
         self.shape = shape if type(shape) is tuple else (shape, )
         self.dtype = np.dtype(dtype)
@@ -124,12 +132,20 @@ class BufferObject():
             import functools
             self.nbytes = self.itemsize*functools.reduce(mul, self.shape)
 
+        if streaming not in (None, STREAM_ORPHAN, STREAM_ROUND_ROBIN):
+            raise GlError('unknown streaming mode "{}"'.format(streaming))
+
         self._target = target
-        self._usage = usage
+        self._usage = usage if streaming is None else GL_STREAM_DRAW
         self._cl_array = None
         self._allocator = allocator or _create_new_vbo_allocator()
+        self.streaming = streaming
+        self.ring = None
 
         self.gl_vbo_id = self._allocator(self.nbytes, self._target, self._usage)
+        if streaming == STREAM_ROUND_ROBIN:
+            self.ring = BufferRing([self.gl_vbo_id] + [
+                self._allocator(self.nbytes, self._target, self._usage) for i in range(buffers-1)])
 
         self.sync_with_vbo(True)
 
@@ -182,10 +198,22 @@ class BufferObject():
         self.shape = ndarray.shape 
         self.nbytes = ndarray.nbytes
 
+        if self.ring is not None:
+            self.ring.advance()
+            self.gl_vbo_id = self.ring.current
+
         glBindBuffer(self._target, self.gl_vbo_id)
-        glBufferData(self._target, self.nbytes, ndarray, self._usage)
+        if self.streaming == STREAM_ORPHAN:
+            glBufferData(self._target, self.nbytes, None, self._usage)
+            glBufferSubData(self._target, 0, self.nbytes, ndarray)
+        else:
+            glBufferData(self._target, self.nbytes, ndarray, self._usage)
         glBindBuffer(self._target, 0)
 
+        if self.ring is not None and self.gl_buffer_base is not None:
+            # keep the binding point pointing to the current buffer
+            glBindBufferBase(self._target, self.gl_buffer_base, self.gl_vbo_id)
+
     def get(self):
         """
         loads data from gpu to host memory and maps
@@ -260,6 +288,7 @@ def validate_nbytes_dtype(nbytes, itemsize):
 def _create_new_vbo_allocator(data=None):
     def _alloc(nbytes, target, usage):
         vbo = glGenBuffers(1)
+        ALLOCATION_COUNTER.count('buffer')
         glBindBuffer(target, vbo)
         glBufferData(target, nbytes, data, usage)
         glBindBuffer(target, 0)